@@ -0,0 +1,114 @@
+"""
+Cold-start comparison of the xp build profiles.
+
+Builds xp with each profile of build_script.BUILD_PROFILES into dist/bench/,
+then times `xp list` from each build, and from source with the current
+interpreter, against a throwaway home directory:
+
+- first: the first launch of the build, after dropping the page cache if
+  --drop-caches is given (needs root)
+- best, median: wall time over --runs further launches
+- size: disk space taken by the build
+
+    python benchmarks/bench_build.py [--profiles onefile fast] [--runs N]
+                                     [--no-build] [--drop-caches]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIST = Path("dist") / "bench"
+
+sys.path.insert(0, str(ROOT))
+
+from build_script import BUILD_PROFILES, BuildError, build_executable
+
+COMMAND = ["list"]
+
+def executable(profile):
+    """Return the executable of an earlier build of a profile, or None."""
+    path = ROOT / BENCH_DIST / profile / "xp"
+    if path.is_dir():
+        path = path / "xp"
+    return path if path.exists() else None
+
+def disk_size(path):
+    """Return the bytes taken by a file, or by everything under a directory."""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file() and not f.is_symlink())
+
+def drop_caches():
+    """Flush the page cache so the next launch reads the build from disk."""
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+def wall_time(command, home):
+    """Run a command with a temporary HOME and return its wall time in milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(
+        command + COMMAND,
+        env=dict(os.environ, HOME=home),
+        stdout=subprocess.DEVNULL,
+        check=True
+    )
+    return (time.perf_counter() - start) * 1000
+
+def measure(command, home, runs, cold):
+    """Return (first, best, median) wall times of a command in milliseconds."""
+    if cold:
+        drop_caches()
+    first = wall_time(command, home)
+    timings = [wall_time(command, home) for _ in range(runs)]
+    return first, min(timings), statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--profiles', nargs='+', choices=BUILD_PROFILES, default=list(BUILD_PROFILES),
+        help=f'Build profiles to compare (default: {" ".join(BUILD_PROFILES)})'
+    )
+    parser.add_argument('--runs', type=int, default=10, help='Timed launches after the first (default: 10)')
+    parser.add_argument('--no-build', action='store_true', help='Reuse the builds in dist/bench/')
+    parser.add_argument(
+        '--drop-caches', action='store_true',
+        help='Drop the page cache before each first launch (needs root)'
+    )
+    args = parser.parse_args()
+
+    # build_script works with paths relative to the repository
+    os.chdir(ROOT)
+
+    variants = []
+    for profile in args.profiles:
+        if not args.no_build:
+            print(f"Building {profile}...", file=sys.stderr)
+            try:
+                build_executable(profile, str(BENCH_DIST / profile))
+            except BuildError as e:
+                sys.exit(f"Building {profile} failed: {e}")
+        path = executable(profile)
+        if path is None:
+            sys.exit(f"No {profile} build in {BENCH_DIST}; run without --no-build")
+        variants.append((profile, [str(path)], ROOT / BENCH_DIST / profile))
+    variants.append(("source", [sys.executable, str(ROOT / "src" / "xp" / "main.py")], ROOT / "src" / "xp"))
+
+    print(f"{'xp ' + ' '.join(COMMAND):<12} {'first':>9} {'best':>9} {'median':>9} {'size':>9}")
+    with tempfile.TemporaryDirectory() as home:
+        # The first launch creates the database; keep it out of the timings
+        subprocess.run(variants[-1][1] + COMMAND, env=dict(os.environ, HOME=home), stdout=subprocess.DEVNULL, check=True)
+
+        for name, command, path in variants:
+            first, best, median = measure(command, home, args.runs, args.drop_caches)
+            size = disk_size(path) / 2 ** 20
+            print(f"{name:<12} {first:6.1f} ms {best:6.1f} ms {median:6.1f} ms {size:5.1f} MiB")
+
+if __name__ == "__main__":
+    main()
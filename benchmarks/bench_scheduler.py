@@ -0,0 +1,304 @@
+"""
+End-to-end scheduler benchmark against a local fake X API.
+
+For each table size, fills a throwaway database with that many scheduled threads
+and measures:
+
+- add_tweet: mean seconds per call
+- list: time to fetch the first page of pending threads and to stream every row
+  as ndjson, in-process
+- cold start: best wall time of `xp list --limit 20` in a fresh interpreter
+- post_pending_tweets: throughput and lag (start of the call to posted) of a batch
+  of due threads posted through benchmarks/fake_x_api.py
+
+Results are appended to a JSON lines file and compared with the previous run
+of the same size and settings; the script exits 1 if any metric got worse by
+more than the tolerance.
+
+    python benchmarks/bench_scheduler.py [--sizes 1000 100000 1000000] [--due N]
+                                         [--latency-ms MS] [--concurrency N]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+SOURCE = BENCHMARKS.parent / "src" / "xp"
+RESULTS_FILE = BENCHMARKS / "results.jsonl"
+
+# Metrics where a larger value is better; for every other metric smaller is better
+HIGHER_IS_BETTER = {"posts_per_second"}
+
+def free_port():
+    """Return a TCP port that is free on localhost."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def fake_api(latency_ms, error_rate, *options):
+    """
+    Run benchmarks/fake_x_api.py in a subprocess and yield its base URL.
+
+    `options` are passed on to it, e.g. "--connect-ms", "150".
+    """
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, str(BENCHMARKS / "fake_x_api.py"),
+        "--port", str(port), "--latency-ms", str(latency_ms), "--error-rate", str(error_rate), *options
+    ])
+    try:
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("fake X API did not start")
+                time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+def reset_database():
+    """Drop the benchmark database and recreate an empty one."""
+    from db import DB_FILE, close_connection, init_db
+
+    close_connection()
+    for suffix in ("", "-wal", "-shm"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(DB_FILE + suffix)
+    init_db()
+
+def populate(size, due, now):
+    """
+    Insert `size` scheduled threads: `due` of them due at `now`, and the rest split
+    between posted history and pending threads in the future.
+    """
+    from db import Status, get_connection
+
+    conn = get_connection()
+    history = size - due
+    rows = (
+        (
+            json.dumps([f"Benchmark thread {i}", f"Reply {i}"]),
+            now - 86400 + i % 86400 if i < history // 2 else now + 3600 + i,
+            Status.POSTED if i < history // 2 else Status.PENDING,
+            now - 86400,
+        )
+        for i in range(history)
+    )
+    with conn:
+        conn.executemany("""
+            INSERT INTO scheduled_tweets (post, scheduled_time, status, created_at)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+        conn.executemany("""
+            INSERT INTO scheduled_tweets (post, scheduled_time, status, created_at)
+            VALUES (?, ?, ?, ?)
+        """, ((json.dumps([f"Due thread {i}"]), now, Status.PENDING, now) for i in range(due)))
+    conn.execute("ANALYZE")
+
+def bench_add_tweet(calls):
+    """Return the mean seconds per add_tweet call."""
+    from db import add_tweet
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for i in range(calls):
+            add_tweet([f"Added thread {i}"], "in 2 hours")
+        return (time.perf_counter() - start) / calls
+
+def bench_list():
+    """Return the seconds to fetch the first page of pending rows, and to stream all rows."""
+    from db import list_scheduled_tweets
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        list_scheduled_tweets(status="pending", output_format="ndjson", limit=100)
+        first_page = time.perf_counter() - start
+
+        start = time.perf_counter()
+        list_scheduled_tweets(output_format="ndjson")
+        full = time.perf_counter() - start
+    return first_page, full
+
+def bench_cold_start(runs):
+    """Return the best wall time of `xp list --limit 20` in a fresh interpreter."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(SOURCE / "main.py"), "list", "--limit", "20"],
+            capture_output=True,
+            check=True
+        )
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def bench_posting(concurrency):
+    """Post the due threads through the fake API; return throughput and lag quantiles."""
+    import api
+    from ratelimit import RateGovernor
+
+    # Time each row's first posted tweet, which is when it went live
+    posted_at = {}
+    record_segment = api.record_segment
+
+    def timed_record_segment(scheduled_id, position, tweet_id):
+        posted_at.setdefault(scheduled_id, time.time())
+        record_segment(scheduled_id, position, tweet_id)
+
+    async def run():
+        clients = api.ClientPool(RateGovernor())
+        try:
+            await api.post_pending_tweets(clients, concurrency, clients.governor)
+        finally:
+            await clients.close()
+
+    api.record_segment = timed_record_segment
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.time()
+            asyncio.run(run())
+            elapsed = time.time() - start
+    finally:
+        api.record_segment = record_segment
+
+    lags = sorted(moment - start for moment in posted_at.values())
+    if not lags:
+        raise RuntimeError("no threads were posted; is the fake X API reachable?")
+    return {
+        "posted": len(lags),
+        "posts_per_second": len(lags) / elapsed,
+        "lag_p50_s": statistics.median(lags),
+        "lag_p95_s": lags[int(0.95 * (len(lags) - 1))],
+    }
+
+def git_commit():
+    """Return the current commit hash, or None outside a git checkout."""
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS, capture_output=True, text=True
+    )
+    return result.stdout.strip() or None
+
+def previous_results(path, settings):
+    """Return the last recorded results for each size run with the same settings."""
+    previous = {}
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["settings"] == settings:
+                    previous[record["size"]] = record["results"]
+    return previous
+
+def regressions(results, baseline, tolerance):
+    """Return a description of every metric that is worse than the baseline by more than tolerance."""
+    found = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not old or name == "posted":
+            continue
+        change = value / old - 1
+        if name in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            found.append(f"{name} {old:.4g} -> {value:.4g} ({change:+.0%})")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+        help='Rows in the table for each run (default: 1000 100000 1000000)'
+    )
+    parser.add_argument('--due', type=int, default=1000, help='Due threads posted per run (default: 1000)')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Fake API latency (default: 50)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fake API 503 rate (default: 0)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Posting concurrency (default: 8)')
+    parser.add_argument('--add-calls', type=int, default=200, help='add_tweet calls timed (default: 200)')
+    parser.add_argument('--runs', type=int, default=5, help='Cold start runs (default: 5)')
+    parser.add_argument(
+        '--results', type=Path, default=RESULTS_FILE,
+        help='JSON lines file results are appended to (default: benchmarks/results.jsonl)'
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=0.25,
+        help='Allowed slowdown against the previous run before failing (default: 0.25)'
+    )
+    parser.add_argument('--no-record', action='store_true', help='Do not append the results')
+    args = parser.parse_args()
+
+    settings = {
+        "due": args.due,
+        "latency_ms": args.latency_ms,
+        "error_rate": args.error_rate,
+        "concurrency": args.concurrency,
+    }
+    baseline = previous_results(args.results, settings)
+
+    records = []
+    failures = []
+    with tempfile.TemporaryDirectory() as home, fake_api(args.latency_ms, args.error_rate) as api_url:
+        # xp reads its paths and API host from the environment at import time
+        os.environ["HOME"] = home
+        os.environ["XP_API_URL"] = api_url
+        sys.path.insert(0, str(SOURCE))
+
+        from setup import CREDENTIALS_FILE, ensure_home_dir
+
+        ensure_home_dir()
+        with open(CREDENTIALS_FILE, "w") as f:
+            for key in ("consumer_key", "consumer_secret", "access_token", "access_token_secret"):
+                f.write(f"{key}=benchmark\n")
+
+        for size in args.sizes:
+            reset_database()
+            start = time.perf_counter()
+            populate(size, min(args.due, size), int(time.time()))
+            print(f"\n{size:,} rows (populated in {time.perf_counter() - start:.1f}s)")
+
+            results = bench_posting(args.concurrency)
+            results["add_tweet_s"] = bench_add_tweet(args.add_calls)
+            results["list_first_page_s"], results["list_all_s"] = bench_list()
+            results["cold_start_s"] = bench_cold_start(args.runs)
+
+            for name, value in results.items():
+                print(f"  {name:<20} {value:12.4g}")
+            for regression in regressions(results, baseline.get(size, {}), args.tolerance):
+                failures.append(f"{size:,} rows: {regression}")
+
+            records.append({
+                "size": size,
+                "settings": settings,
+                "results": results,
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "recorded_at": int(time.time()),
+            })
+
+    if not args.no_record:
+        with open(args.results, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Startup regression check for local-only xp commands.
+
+Runs `xp list` against a throwaway home directory and fails if it imports any of
+the network or date parsing libraries. The best wall time over several runs is
+reported, and only fails the check when a budget is given; wall time is too
+noisy for a fixed limit, so the import check also runs as a test in
+tests/test_startup.py.
+
+    python benchmarks/bench_startup.py [--runs N] [--budget-ms MS]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "xp" / "main.py"
+
+# Modules that local commands must never pay for; tests/test_startup.py checks these too
+HEAVY_MODULES = ["tweepy", "aiohttp", "requests", "dateparser", "oauthlib"]
+
+COMMANDS = [
+    ["list"],
+    ["list", "--format", "ndjson"],
+]
+
+def run_xp(args, home, *extra_flags):
+    """Run xp with a temporary HOME and return the completed process."""
+    env = dict(os.environ, HOME=home)
+    return subprocess.run(
+        [sys.executable, *extra_flags, str(MAIN), *args],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+def imported_modules(args, home):
+    """Return the top-level modules imported while running a command."""
+    result = run_xp(args, home, "-X", "importtime")
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            modules.add(name.split(".")[0])
+    return modules
+
+def best_wall_time(args, home, runs):
+    """Return the fastest of `runs` wall-clock timings of a command, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_xp(args, home)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Timed runs per command (default: 10)')
+    parser.add_argument('--budget-ms', type=float, help='Fail if a command is slower than this (default: no limit)')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as home:
+        # The first run creates the database; keep it out of the timings
+        run_xp(["list"], home)
+
+        for command in COMMANDS:
+            label = "xp " + " ".join(command)
+
+            heavy = sorted(imported_modules(command, home).intersection(HEAVY_MODULES))
+            if heavy:
+                failures.append(f"{label} imported {', '.join(heavy)}")
+
+            elapsed = best_wall_time(command, home, args.runs)
+            print(f"{label:<28} {elapsed:7.1f} ms")
+            if args.budget_ms is not None and elapsed > args.budget_ms:
+                failures.append(f"{label} took {elapsed:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the fast-path time parser with plain dateparser.
+
+Parses a corpus of typical --time strings with both `timeparse.parse_time` and
+`dateparser.parse`, checks that they agree, and reports the cost per call for
+the first (cold) pass and for repeated (warm) passes.
+
+    python benchmarks/bench_timeparse.py [--rounds N]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "xp"))
+
+import timeparse  # noqa: E402
+
+CORPUS = [
+    "2030-12-25 15:30:00",
+    "2030-12-25T15:30",
+    "2030-12-25T15:30:00Z",
+    "2030-12-25",
+    "now",
+    "in 5 minutes",
+    "in 2 hours",
+    "in 3 days",
+    "tomorrow",
+    "tomorrow at 3pm",
+    "tomorrow at 9:30 am",
+    "today at noon",
+    "3pm tomorrow",
+    # Fallback path
+    "next friday at noon",
+    "November 1st at 3:30pm",
+]
+
+def time_calls(parse, texts, rounds):
+    """Return the mean seconds per call of `parse` over `rounds` passes of `texts`."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            parse(text)
+    return (time.perf_counter() - start) / (rounds * len(texts))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200, help='Warm passes over the corpus (default: 200)')
+    args = parser.parse_args()
+
+    # Import cost is part of what the fast path avoids, so measure it separately
+    start = time.perf_counter()
+    import dateparser
+    import_ms = (time.perf_counter() - start) * 1000
+
+    now = datetime.now().replace(microsecond=0)
+    fast_texts = [text for text in CORPUS if timeparse.parse_time(text, now, fast_only=True)]
+    mismatches = []
+    for text in fast_texts:
+        fast = timeparse.parse_time(text, now)
+        slow = dateparser.parse(text, settings={'RELATIVE_BASE': now})
+        if slow is None or abs(fast.timestamp() - slow.timestamp()) > 1:
+            mismatches.append((text, fast, slow))
+
+    timeparse._compile.cache_clear()
+    timeparse._parse_with_dateparser.cache_clear()
+    cold_fast = time_calls(timeparse.parse_time, CORPUS, 1)
+    cold_dateparser = time_calls(dateparser.parse, CORPUS, 1)
+    warm_fast = time_calls(timeparse.parse_time, CORPUS, args.rounds)
+    warm_dateparser = time_calls(dateparser.parse, CORPUS, max(args.rounds // 20, 1))
+
+    print(f"dateparser import:         {import_ms:8.1f} ms")
+    print(f"fast path coverage:        {len(fast_texts)}/{len(CORPUS)} strings")
+    print(f"{'':<26} {'cold':>10} {'warm':>10}")
+    print(f"{'timeparse.parse_time':<26} {cold_fast * 1e6:8.1f}us {warm_fast * 1e6:8.1f}us")
+    print(f"{'dateparser.parse':<26} {cold_dateparser * 1e6:8.1f}us {warm_dateparser * 1e6:8.1f}us")
+
+    for text, fast, slow in mismatches:
+        print(f"MISMATCH {text!r}: fast={fast} dateparser={slow}", file=sys.stderr)
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Time-to-post of widely spaced posts, with and without connection warm-up.
+
+Schedules threads a few seconds apart, further apart than the fake X API keeps
+an idle connection open, and runs the dispatcher of `xp run` until they are all
+posted, once without and once with its warm-up job. The fake API delays the
+first request on every new connection by --connect-ms, standing in for DNS, TCP
+and TLS setup. Reports, for each run:
+
+- time to post: from a thread's scheduled time to its first tweet going live
+- connections: how many the fake API accepted, per thread; replies reuse the
+  connection of the first tweet, so this stays at one
+
+    python benchmarks/bench_warmup.py [--threads N] [--gap SECONDS] [--replies N]
+                                      [--connect-ms MS] [--latency-ms MS]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+
+from bench_scheduler import SOURCE, fake_api, reset_database
+
+# Seconds the fake API keeps an idle connection open; shorter than --gap, so
+# every post finds its connection closed unless it was warmed up
+KEEPALIVE_TIMEOUT = 2.0
+
+# Seconds before each post that the warm-up runs; shorter than KEEPALIVE_TIMEOUT
+WARM_LEAD = 1.0
+
+def connections(api_url):
+    """Return how many connections the fake API has accepted so far."""
+    with urllib.request.urlopen(f"{api_url}/_stats") as response:
+        return json.load(response)["connections"]
+
+def schedule(threads, gap, replies):
+    """Schedule `threads` threads `gap` seconds apart and return their scheduled times by ID."""
+    from db import get_connection
+
+    conn = get_connection()
+    start = int(time.time()) + 2
+    times = {}
+    with conn:
+        for i in range(threads):
+            tweets = [f"Warm-up thread {i} at {time.time()}"] + [f"Reply {j}" for j in range(replies)]
+            cursor = conn.execute("""
+                INSERT INTO scheduled_tweets (post, scheduled_time, created_at)
+                VALUES (?, ?, ?)
+            """, (json.dumps(tweets), start + i * gap, int(time.time())))
+            times[cursor.lastrowid] = start + i * gap
+    return times
+
+def run_dispatcher(times, warm):
+    """Run the dispatcher until every scheduled thread is posted; return each thread's time to post."""
+    import api
+    from db import due_accounts
+    from dispatcher import Dispatcher
+    from ratelimit import RateGovernor
+
+    posted_at = {}
+    record_segment = api.record_segment
+
+    def timed_record_segment(scheduled_id, position, tweet_id):
+        posted_at.setdefault(scheduled_id, time.time())
+        record_segment(scheduled_id, position, tweet_id)
+
+    async def run():
+        clients = api.ClientPool(RateGovernor())
+        dispatcher = Dispatcher(
+            lambda: api.post_pending_tweets(clients, 1, clients.governor),
+            warm=(lambda due: clients.warm(due_accounts(due))) if warm else None,
+            warm_lead=WARM_LEAD
+        )
+        task = asyncio.create_task(dispatcher.run())
+        try:
+            deadline = max(times.values()) + 30
+            while len(posted_at) < len(times) and time.time() < deadline:
+                await asyncio.sleep(0.1)
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            await clients.close()
+
+    api.record_segment = timed_record_segment
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run())
+    finally:
+        api.record_segment = record_segment
+
+    if len(posted_at) < len(times):
+        raise RuntimeError("not every thread was posted; is the fake X API reachable?")
+    return [posted_at[row_id] - due for row_id, due in times.items()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=5, help='Threads posted per run (default: 5)')
+    parser.add_argument('--gap', type=float, default=4.0, help='Seconds between threads (default: 4)')
+    parser.add_argument('--replies', type=int, default=2, help='Replies in each thread (default: 2)')
+    parser.add_argument(
+        '--connect-ms', type=float, default=150.0,
+        help='Fake connection setup time (default: 150)'
+    )
+    parser.add_argument('--latency-ms', type=float, default=30.0, help='Fake API latency (default: 30)')
+    args = parser.parse_args()
+
+    options = ("--connect-ms", str(args.connect_ms), "--keepalive-timeout", str(KEEPALIVE_TIMEOUT))
+    with tempfile.TemporaryDirectory() as home, fake_api(args.latency_ms, 0.0, *options) as api_url:
+        # xp reads its paths and API host from the environment at import time
+        os.environ["HOME"] = home
+        os.environ["XP_API_URL"] = api_url
+        sys.path.insert(0, str(SOURCE))
+
+        from setup import CREDENTIALS_FILE, ensure_home_dir
+
+        ensure_home_dir()
+        with open(CREDENTIALS_FILE, "w") as f:
+            for key in ("consumer_key", "consumer_secret", "access_token", "access_token_secret"):
+                f.write(f"{key}=benchmark\n")
+
+        print(f"{'':<12} {'p50 post':>10} {'max post':>10} {'connections':>12}")
+        for label, warm in (("cold", False), ("warmed up", True)):
+            reset_database()
+            opened = connections(api_url)
+            lags = run_dispatcher(schedule(args.threads, args.gap, args.replies), warm)
+            # Less the connection of the /_stats request itself
+            per_thread = (connections(api_url) - opened - 1) / args.threads
+            print(
+                f"{label:<12} {statistics.median(lags) * 1000:7.0f} ms {max(lags) * 1000:7.0f} ms "
+                f"{per_thread:8.1f}/thread"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Local stand-in for the X API endpoint that xp posts to.
+
+Serves `POST /2/tweets` with a configurable latency, error rate and rate limit,
+returning the same `x-rate-limit-*` headers as X, simple and chunked v1.1 media
+uploads, and a paginated home timeline that contains every tweet created so far. Point xp at it with
+XP_API_URL=http://127.0.0.1:PORT. Any other route answers 404.
+
+The first request on each new connection can be delayed by --connect-ms to stand
+in for the DNS, TCP and TLS setup of a real connection to X, and idle
+connections are closed after --keepalive-timeout seconds. `GET /_stats` reports
+the counters, including how many connections were opened.
+
+    python benchmarks/fake_x_api.py [--port PORT] [--latency-ms MS] [--error-rate P]
+                                    [--rate-limit N --window SECONDS]
+                                    [--connect-ms MS] [--keepalive-timeout SECONDS]
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+import weakref
+
+from aiohttp import web
+
+class FakeXAPI:
+    """Request handlers and counters of the stand-in server."""
+
+    def __init__(
+        self, latency_ms=50.0, jitter_ms=0.0, error_rate=0.0, rate_limit=None, window=900, connect_ms=0.0
+    ):
+        """
+        Args:
+            latency_ms (float): Mean time before each response.
+            jitter_ms (float): Latency varies uniformly by up to this much either way.
+            error_rate (float): Fraction of requests that fail with a 503.
+            rate_limit (int, optional): Requests allowed per window. Unlimited if None.
+            window (int): Length of a rate limit window in seconds.
+            connect_ms (float): Extra delay of the first request on each connection.
+        """
+        self.connect_ms = connect_ms
+        # Open connections, dropped once closed
+        self.connections = weakref.WeakSet()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.window = window
+        self.ids = itertools.count(1)
+        self.window_start = time.time()
+        self.used = 0
+        self.counts = {
+            'created': 0, 'errors': 0, 'rate_limited': 0, 'timeline_reads': 0, 'uploads': 0, 'connections': 0
+        }
+        self.tweets = []
+        self.media_ids = itertools.count(10 ** 15)
+        self.uploads = {}
+
+    def rate_limit_headers(self):
+        """Advance the window if it is over and return the headers for the current request."""
+        now = time.time()
+        if now >= self.window_start + self.window:
+            self.window_start = now
+            self.used = 0
+        limit = self.rate_limit if self.rate_limit is not None else 10 ** 9
+        return {
+            'x-rate-limit-limit': str(limit),
+            'x-rate-limit-remaining': str(max(limit - self.used, 0)),
+            # Rounded up, so the window is really over by the time it names
+            'x-rate-limit-reset': str(math.ceil(self.window_start + self.window)),
+        }
+
+    async def create_tweet(self, request):
+        body = await request.json()
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(delay, 0) / 1000)
+
+        headers = self.rate_limit_headers()
+        if headers['x-rate-limit-remaining'] == '0':
+            self.counts['rate_limited'] += 1
+            return web.json_response(
+                {'title': 'Too Many Requests', 'detail': 'Too Many Requests', 'status': 429},
+                status=429,
+                headers=headers
+            )
+
+        self.used += 1
+        headers['x-rate-limit-remaining'] = str(int(headers['x-rate-limit-remaining']) - 1)
+        if random.random() < self.error_rate:
+            self.counts['errors'] += 1
+            return web.json_response(
+                {'title': 'Service Unavailable', 'detail': 'Service Unavailable', 'status': 503},
+                status=503,
+                headers=headers
+            )
+
+        self.counts['created'] += 1
+        tweet_id = str(next(self.ids))
+        self.tweets.append({
+            'id': tweet_id,
+            'text': body.get('text', ''),
+            'author_id': '1',
+            'edit_history_tweet_ids': [tweet_id],
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()),
+        })
+        if body.get('media'):
+            self.tweets[-1]['attachments'] = {
+                'media_keys': [f"3_{media_id}" for media_id in body['media']['media_ids']]
+            }
+        return web.json_response(
+            {'data': {'id': tweet_id, 'text': body.get('text', ''), 'edit_history_tweet_ids': [tweet_id]}},
+            status=201,
+            headers=headers
+        )
+
+    async def media_upload(self, request):
+        """Accept a simple upload, or the INIT, APPEND and FINALIZE steps of a chunked one."""
+        form = await request.post()
+        await asyncio.sleep(self.latency_ms / 1000)
+
+        command = form.get('command')
+        if command == 'APPEND':
+            self.uploads[form['media_id']] += len(form['media'].file.read())
+            return web.Response(status=204)
+
+        if command == 'FINALIZE':
+            media_id = form['media_id']
+            size = self.uploads.pop(media_id)
+        elif command == 'INIT':
+            media_id = str(next(self.media_ids))
+            self.uploads[media_id] = 0
+            size = int(form['total_bytes'])
+        else:
+            media_id = str(next(self.media_ids))
+            size = len(form['media'].file.read())
+
+        if command != 'INIT':
+            self.counts['uploads'] += 1
+        return web.json_response({
+            'media_id': int(media_id),
+            'media_id_string': media_id,
+            'size': size,
+            'expires_after_secs': 86400,
+        })
+
+    async def me(self, request):
+        return web.json_response({'data': {'id': '1', 'name': 'Benchmark', 'username': 'benchmark'}})
+
+    async def home_timeline(self, request):
+        """Return tweets newest first, honouring since_id, until_id, max_results and pagination_token."""
+        self.counts['timeline_reads'] += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+
+        since_id = int(request.query.get('since_id', 0))
+        until_id = int(request.query.get('until_id', 2 ** 63))
+        max_results = int(request.query.get('max_results', 100))
+        start = int(request.query.get('pagination_token', 0))
+        newer = [tweet for tweet in reversed(self.tweets) if since_id < int(tweet['id']) < until_id]
+        page = newer[start:start + max_results]
+
+        meta = {'result_count': len(page)}
+        if page:
+            meta.update(newest_id=page[0]['id'], oldest_id=page[-1]['id'])
+        if start + max_results < len(newer):
+            meta['next_token'] = str(start + max_results)
+        response = {'meta': meta}
+        if page:
+            response['data'] = page
+            response['includes'] = {'users': [{'id': '1', 'name': 'Benchmark', 'username': 'benchmark'}]}
+        return web.json_response(response, headers=self.rate_limit_headers())
+
+    async def stats(self, request):
+        return web.json_response(self.counts)
+
+    @web.middleware
+    async def count_connections(self, request, handler):
+        """Count each new connection and delay its first request by connect_ms."""
+        transport = request.transport
+        if transport is not None and transport not in self.connections:
+            self.connections.add(transport)
+            self.counts['connections'] += 1
+            await asyncio.sleep(self.connect_ms / 1000)
+        return await handler(request)
+
+    def app(self):
+        """Build the aiohttp application."""
+        # Chunked uploads send 1 MiB segments plus the multipart framing
+        app = web.Application(client_max_size=16 * 1024 * 1024, middlewares=[self.count_connections])
+        app.router.add_post('/2/tweets', self.create_tweet)
+        app.router.add_get('/2/users/me', self.me)
+        app.router.add_post('/1.1/media/upload.json', self.media_upload)
+        app.router.add_get('/2/users/{id}/timelines/reverse_chronological', self.home_timeline)
+        app.router.add_get('/_stats', self.stats)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Mean response latency (default: 50)')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Latency jitter (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 503 responses (default: 0)')
+    parser.add_argument('--rate-limit', type=int, help='Requests allowed per window (default: unlimited)')
+    parser.add_argument('--window', type=int, default=900, help='Rate limit window in seconds (default: 900)')
+    parser.add_argument(
+        '--connect-ms', type=float, default=0.0,
+        help='Extra delay of the first request on each connection (default: 0)'
+    )
+    parser.add_argument(
+        '--keepalive-timeout', type=float, default=75.0,
+        help='Seconds before an idle connection is closed (default: 75)'
+    )
+    args = parser.parse_args()
+
+    api = FakeXAPI(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.window, args.connect_ms)
+    web.run_app(
+        api.app(), host='127.0.0.1', port=args.port, print=None, access_log=None,
+        keepalive_timeout=args.keepalive_timeout
+    )
+
+if __name__ == "__main__":
+    main()
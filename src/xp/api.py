@@ -1,27 +1,130 @@
 import tweepy
-import sqlite3
-import dateparser
+import tweepy.asynchronous
+import asyncio
+import collections
 import json
+import os
+import re
+import socket
+import time
 
-from db import DB_FILE
-from datetime import datetime
-from setup import setup_wizard, load_credentials
+from db import (
+    Status, get_posted_segments, record_segment, claim_due_tweet, renew_leases, release_tweet,
+    due_accounts, latest_timeline_id, cache_timeline_tweets, get_cached_timeline,
+    format_timeline_tweet, get_media_uploads, record_media_upload, get_media_ids, content_hash,
+    find_duplicate, DUPLICATE_WINDOW_HOURS
+)
+from setup import setup_wizard, load_credentials, credentials_file, DEFAULT_CONCURRENCY, DEFAULT_ACCOUNT
+from ratelimit import CREATE_TWEET, MAX_WAIT, rate_key
+from metrics import (
+    CREATE_TWEET_SECONDS, DISPATCH_LAG_SECONDS, DB_QUERY_SECONDS, POSTS_TOTAL, MEDIA_UPLOAD_SECONDS
+)
+from tracing import traced
 
-def create_api():
+# Identifies this process in scheduled_tweets.claimed_by
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Seconds a claimed row stays reserved for this worker without a heartbeat
+LEASE_SECONDS = 120
+
+# Seconds before any worker retries a row whose thread failed to post
+FAILURE_BACKOFF = 60
+
+# Least number of seconds a 429 holds back the endpoint, however soon its
+# x-rate-limit-reset header says the window ends
+RATE_LIMIT_MARGIN = 1.0
+
+# Seconds before a thread's due time that `xp run` uploads its media
+MEDIA_LEAD_TIME = 600
+
+# Seconds between checks for media that is about to be needed
+MEDIA_INTERVAL = 30
+
+# Files larger than this are uploaded in chunks
+CHUNKED_UPLOAD_THRESHOLD = 1024 * 1024
+
+# Lifetime assumed for a media ID when X does not report one
+MEDIA_TTL = 24 * 3600
+
+# A media ID that expires sooner than this after dispatch is uploaded again
+MEDIA_EXPIRY_MARGIN = 300
+
+# Most tweets the home timeline endpoint returns per request
+TIMELINE_PAGE_SIZE = 100
+
+# Seconds an idle connection to X is kept open for the next request
+KEEPALIVE_TIMEOUT = 30
+
+# Requested to open a connection ahead of a post. It is unauthenticated, so it
+# costs no rate limit quota, and the response is an error that is discarded.
+WARMUP_URL = "https://api.twitter.com/2/tweets"
+
+# Set to a base URL such as http://127.0.0.1:8080 to send every API request to a
+# local stand-in instead of X, e.g. benchmarks/fake_x_api.py
+API_URL_VARIABLE = "XP_API_URL"
+
+_X_HOSTS = re.compile(r'https://(api|upload)\.twitter\.com')
+
+class RebasedSession:
+    """
+    Wrap an HTTP session so requests to X's hosts go to another base URL.
+
+    Tweepy hardcodes https://api.twitter.com, so this is applied to the session of
+    each client when XP_API_URL is set. It works for both the requests session of
+    the synchronous clients and the aiohttp session of the asynchronous one.
     """
-    Create a Tweepy API object using the stored credentials.
+
+    def __init__(self, session, base_url):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        return self.session.request(method, _X_HOSTS.sub(self.base_url, str(url), count=1), *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+def rebase_session(session):
+    """Return the session, rebased onto XP_API_URL if it is set."""
+    base_url = os.environ.get(API_URL_VARIABLE)
+    return RebasedSession(session, base_url) if base_url else session
+
+def get_credentials(account=None):
+    """
+    Load the stored credentials, running the setup wizard if there are none.
+
+    Args:
+        account (str, optional): The account to load. Defaults to DEFAULT_ACCOUNT.
 
     Returns:
-        tweepy.API: The Tweepy API object.
+        dict: A dictionary containing the API credentials.
     """
-    # Check for credentials
-    credentials = load_credentials()
+    credentials = load_credentials(account)
     
     # If credentials are not found, run the setup wizard
     if not credentials:
         print("No credentials found. Running setup wizard...")
-        setup_wizard()
-        credentials = load_credentials()
+        setup_wizard(account)
+        credentials = load_credentials(account)
+
+    return credentials
+
+@traced("api.create_api")
+def create_api(account=None):
+    """
+    Create a Tweepy Client using the stored credentials.
+
+    Its requests session keeps the connection to X open, so the replies of a
+    thread reuse the connection of the first tweet. Media uploads need the v1.1
+    API object from create_v1_api() as well.
+
+    Args:
+        account (str, optional): The account to use. Defaults to DEFAULT_ACCOUNT.
+
+    Returns:
+        tweepy.Client: The Tweepy Client object.
+    """
+    credentials = get_credentials(account)
 
     client = tweepy.Client(
         consumer_key=credentials["consumer_key"],
@@ -29,14 +132,141 @@ def create_api():
         access_token=credentials["access_token"],
         access_token_secret=credentials["access_token_secret"]
     )
+    client.session = rebase_session(client.session)
+
+    return client
+
+def create_v1_api(account=None):
+    """
+    Create a v1.1 Tweepy API object, which is needed for media uploads.
+
+    Args:
+        account (str, optional): The account to use. Defaults to DEFAULT_ACCOUNT.
+
+    Returns:
+        tweepy.API: The Tweepy API object.
+    """
+    credentials = get_credentials(account)
 
     auth = tweepy.OAuthHandler(credentials["consumer_key"], credentials["consumer_secret"])
     auth.set_access_token(credentials["access_token"], credentials["access_token_secret"])
 
     api = tweepy.API(auth)
+    api.session = rebase_session(api.session)
+    return api
 
-    return client, api
+def create_async_client(account=None):
+    """
+    Create a Tweepy AsyncClient using the stored credentials.
 
+    Args:
+        account (str, optional): The account to use. Defaults to DEFAULT_ACCOUNT.
+
+    Returns:
+        tweepy.asynchronous.AsyncClient: The asynchronous Tweepy Client object.
+    """
+    credentials = get_credentials(account)
+
+    return tweepy.asynchronous.AsyncClient(
+        consumer_key=credentials["consumer_key"],
+        consumer_secret=credentials["consumer_secret"],
+        access_token=credentials["access_token"],
+        access_token_secret=credentials["access_token_secret"]
+    )
+
+class ClientPool:
+    """
+    Asynchronous clients for every account served by one `xp run` process.
+
+    Clients are created on first use. Each account gets its own aiohttp session,
+    so keep-alive connections are reused per account and every response's rate
+    limit headers are credited to the account that made the request. Idle
+    connections stay open for KEEPALIVE_TIMEOUT seconds, and warm() reopens
+    them shortly before a post is due, so the post does not wait for DNS, TCP
+    and TLS.
+    """
+
+    def __init__(self, governor=None):
+        """
+        Args:
+            governor (RateGovernor, optional): Receives each account's rate limit headers.
+        """
+        self.governor = governor
+        self.clients = {}
+        self.apis = {}
+
+    def get(self, account):
+        """
+        Return the client for an account, creating it if needed.
+
+        Must be called from a running event loop. Unlike the interactive commands,
+        the daemon never runs the setup wizard for an account without credentials.
+
+        Args:
+            account (str): The account name.
+
+        Returns:
+            tweepy.asynchronous.AsyncClient: The account's client.
+        """
+        client = self.clients.get(account)
+        if client is None:
+            import aiohttp
+
+            if not os.path.exists(credentials_file(account)):
+                raise ValueError(f"No credentials for account {account!r}; run `xp account add {account}`")
+
+            client = create_async_client(account)
+            trace_configs = [self.governor.trace_config(account)] if self.governor else []
+            client.session = rebase_session(aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=KEEPALIVE_TIMEOUT),
+                trace_configs=trace_configs
+            ))
+            self.clients[account] = client
+        return client
+
+    def get_api(self, account):
+        """
+        Return the v1.1 API object for an account, used for media uploads.
+
+        Args:
+            account (str): The account name.
+
+        Returns:
+            tweepy.API: The account's API object.
+        """
+        api = self.apis.get(account)
+        if api is None:
+            if not os.path.exists(credentials_file(account)):
+                raise ValueError(f"No credentials for account {account!r}; run `xp account add {account}`")
+            api = self.apis[account] = create_v1_api(account)
+        return api
+
+    @traced("api.warm")
+    async def warm(self, accounts):
+        """
+        Open a keep-alive connection to X for each account, or refresh an idle one.
+
+        A failure is reported and otherwise ignored; the post then connects as usual.
+
+        Args:
+            accounts (list[str]): The accounts about to post.
+        """
+        async def warm_account(account):
+            try:
+                async with self.get(account).session.request("HEAD", WARMUP_URL) as response:
+                    await response.read()
+            except Exception as e:
+                print(f"Error warming up the connection for account {account}:", e)
+
+        await asyncio.gather(*(warm_account(account) for account in accounts))
+
+    async def close(self):
+        """Close the HTTP sessions of every client in the pool."""
+        for client in self.clients.values():
+            await client.session.close()
+        self.clients.clear()
+
+@traced("api.post_tweet")
 def post_tweet(client, post, in_reply_to_id=None):
     """
     Post a single tweet using Tweepy.
@@ -87,87 +317,406 @@ def post_thread(client, tweets):
         print("Error posting thread:", e)
         return False
 
-def post_pending_tweets(client):
+@traced("api.upload_media")
+def upload_media(api, path):
     """
-    Check the database for pending tweets and post them if their scheduled time has passed.
+    Upload an image or video, in chunks if it is large.
+
+    This blocks on the network, so the scheduler runs it in a worker thread.
 
     Args:
-        client (tweepy.Client): The Tweepy Client object.
+        api (tweepy.API): The v1.1 Tweepy API object.
+        path (str): The file to upload.
+
+    Returns:
+        tuple: (media ID, UTC epoch timestamp at which the media ID expires)
+    """
+    with MEDIA_UPLOAD_SECONDS.time():
+        media = api.media_upload(path, chunked=os.path.getsize(path) > CHUNKED_UPLOAD_THRESHOLD)
+    expires_after = getattr(media, 'expires_after_secs', None) or MEDIA_TTL
+    return media.media_id_string, time.time() + expires_after
+
+async def upload_media_files(clients, horizon, scheduled_id=None):
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    Upload the media of pending threads due before `horizon` that have no usable media ID.
 
+    Args:
+        clients (ClientPool): The clients of the accounts being served.
+        horizon (float): Upload media of threads scheduled before this time, and
+            replace media IDs that expire before it.
+        scheduled_id (int, optional): Only upload the media of this thread, and
+            raise if a file fails. Otherwise failures are reported and skipped.
+    """
+    loop = asyncio.get_running_loop()
+    for row_id, position, path, account in get_media_uploads(int(horizon), scheduled_id):
+        try:
+            media_id, expires_at = await loop.run_in_executor(
+                None, upload_media, clients.get_api(account), path
+            )
+        except Exception as e:
+            if scheduled_id is not None:
+                raise
+            print(f"Error uploading {path} for scheduled tweet {row_id}:", e)
+            continue
+        record_media_upload(row_id, position, media_id, expires_at)
+
+async def preupload_media(clients, lead_time=MEDIA_LEAD_TIME, interval=MEDIA_INTERVAL):
+    """
+    Upload the media of threads shortly before they are due, until cancelled.
+
+    Uploading ahead of time leaves only the create_tweet call for the dispatcher,
+    so a large video does not make its post late.
+
+    Args:
+        clients (ClientPool): The clients of the accounts being served.
+        lead_time (float): Seconds before the due time to upload.
+        interval (float): Seconds between checks.
+    """
+    while True:
+        try:
+            await upload_media_files(clients, time.time() + lead_time)
+        except Exception as e:
+            print("Error uploading media:", e)
+        await asyncio.sleep(interval)
+
+@traced("api.post_tweet")
+async def post_tweet_async(client, post, in_reply_to_id=None, media_ids=None):
+    """
+    Post a single tweet using the asynchronous Tweepy client.
+
+    Args:
+        client (tweepy.asynchronous.AsyncClient): The asynchronous Tweepy Client object.
+        post (str): The content of the tweet.
+        in_reply_to_id (str, optional): The ID of the tweet to reply to.
+        media_ids (list[str], optional): Uploaded media to attach.
+
+    Returns:
+        tuple: (success boolean, tweet_id if successful or None if failed)
+
+    Raises:
+        tweepy.TooManyRequests: If X refused the tweet because of the rate limit.
+    """
+    start = time.perf_counter()
+    try:
+        response = await client.create_tweet(
+            text=post, in_reply_to_tweet_id=in_reply_to_id, media_ids=media_ids or None
+        )
+        CREATE_TWEET_SECONDS.observe(time.perf_counter() - start, result="ok")
+
+        tweet_id = response.data['id']
+        print(f"Tweet posted successfully: https://x.com/user/status/{tweet_id}")
+        return True, tweet_id
+    except tweepy.TooManyRequests as e:
+        CREATE_TWEET_SECONDS.observe(time.perf_counter() - start, result="error")
+        print("Rate limited posting tweet:", e)
+        raise
+    except Exception as e:
+        CREATE_TWEET_SECONDS.observe(time.perf_counter() - start, result="error")
+        print("Error posting tweet:", e)
+        return False, None
+
+def rate_limit_reset(headers):
+    """
+    Return when to retry after a 429, from its response headers.
+
+    Args:
+        headers (Mapping): The headers of the 429 response.
+
+    Returns:
+        float: The x-rate-limit-reset time, but at least RATE_LIMIT_MARGIN seconds
+        from now, or FAILURE_BACKOFF seconds from now if the header is missing.
+    """
+    now = time.time()
     try:
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            SELECT id, post 
-            FROM scheduled_tweets
-            WHERE status = 'pending' 
-            AND scheduled_time <= ?
-            ORDER BY scheduled_time ASC
-        """, (now,))
-
-        pending_tweets = cursor.fetchall()
-
-        for tweet_id, tweets in pending_tweets:
-            tweets = json.loads(tweets)
-
-            if isinstance(tweets, list):
-                # Handle a thread of tweets
-                previous_id = None
-                success = True
-
-                for tweet in tweets:
-                    success, new_id = post_tweet(client, tweet, previous_id)
-                    if not success:
-                        break
-                    previous_id = new_id
-
-                if success:
-                    cursor.execute(
-                        "UPDATE scheduled_tweets SET status = 'posted' WHERE id = ?", 
-                        (tweet_id,)
-                    )
-                    conn.commit()
-
-                else:
-                    # Handle single tweet
-                    success, _ = post_tweet(client, tweets)
-                    if success:
-                        cursor.execute(
-                            "UPDATE scheduled_tweets SET status = 'posted' WHERE id = ?", 
-                            (tweet_id,)
-                        )
-                        conn.commit()
+        reset_at = int(headers['x-rate-limit-reset'])
+    except (KeyError, TypeError, ValueError):
+        return now + FAILURE_BACKOFF
+    return max(reset_at, now + RATE_LIMIT_MARGIN)
+
+async def wait_for_rate_limit(governor, endpoint):
+    """
+    Wait until the rate governor allows a call to an endpoint and take a token.
+
+    Args:
+        governor (RateGovernor): The rate governor, or None to skip pacing.
+        endpoint (str): The endpoint key, e.g. CREATE_TWEET.
+
+    Returns:
+        float: None if a token was taken, otherwise the time at which to retry
+        because the wait would be longer than MAX_WAIT.
+    """
+    if governor is None:
+        return None
+
+    while True:
+        delay = governor.delay(endpoint)
+        if delay <= 0:
+            governor.acquire(endpoint)
+            return None
+        if delay > MAX_WAIT:
+            return time.time() + delay
+        await asyncio.sleep(delay)
+
+@traced("api.post_thread")
+async def post_thread_async(
+    client, tweets, governor=None, previous_id=None, on_posted=None, endpoint=CREATE_TWEET,
+    media_ids=None
+):
+    """
+    Post a thread of tweets in order, each one replying to the previous one.
+
+    Args:
+        client (tweepy.asynchronous.AsyncClient): The asynchronous Tweepy Client object.
+        tweets (list[str]): The list of tweets in the thread.
+        governor (RateGovernor, optional): Paces calls to stay within the rate limit.
+        previous_id (str, optional): The ID of the tweet the first one replies to,
+            when resuming a thread that was partly posted.
+        on_posted (callable, optional): Called with (index, tweet_id) after each
+            tweet is posted.
+        endpoint (str, optional): The governor bucket to draw from, see rate_key().
+        media_ids (list[str], optional): Uploaded media to attach to the first tweet.
+
+    Returns:
+        tuple: (success boolean, time to retry at if the thread was deferred by the
+        rate limit or None)
+    """
+    for index, tweet in enumerate(tweets):
+        retry_at = await wait_for_rate_limit(governor, endpoint)
+        if retry_at is not None:
+            return False, retry_at
+
+        try:
+            success, tweet_id = await post_tweet_async(
+                client, tweet, previous_id, media_ids if index == 0 else None
+            )
+        except tweepy.TooManyRequests as e:
+            retry_at = rate_limit_reset(e.response.headers)
+            if governor:
+                governor.exhaust(endpoint, retry_at)
+            return False, retry_at
 
+        if not success:
+            return False, None
+        previous_id = tweet_id
+        if on_posted:
+            on_posted(index, tweet_id)
+    return True, None
+
+async def post_pending_tweets(
+    clients, concurrency=DEFAULT_CONCURRENCY, governor=None, duplicate_window=DUPLICATE_WINDOW_HOURS
+):
+    """
+    Check the database for pending tweets and post them if their scheduled time has passed.
+
+    `concurrency` workers each claim one due row at a time with an atomic lease,
+    so several `xp run` processes can share a database without double-posting.
+    Workers take turns across the accounts that have due rows, so a large
+    backlog on one account cannot starve the others. Leases are renewed while a
+    thread is being posted, and a crashed worker's rows become claimable again
+    once its lease expires. The tweets inside each thread are still posted one
+    after another. Each posted tweet is recorded in thread_segments, so a thread
+    that failed partway resumes from its first unposted tweet instead of starting
+    over. Rows that hit the rate limit are left pending and reported back so the
+    caller can retry them once the limit resets. A thread whose first tweet
+    repeats one posted within `duplicate_window` hours is marked as a duplicate
+    without calling the API, since X would reject it.
+
+    Args:
+        clients (ClientPool): The clients of the accounts being served.
+        concurrency (int): Maximum number of threads posted at the same time.
+        governor (RateGovernor, optional): Paces calls to stay within the rate limit.
+        duplicate_window (float): Hours either side in which the same first tweet is a duplicate.
+
+    Returns:
+        dict: Maps the IDs of rows deferred by the rate limit to the time to retry them.
+    """
+    deferred = {}
+    in_flight = set()
+    with DB_QUERY_SECONDS.time(query="due_accounts"):
+        accounts = collections.deque(due_accounts())
+
+    async def post_row(row_id, post, account, scheduled_time):
+        tweets = json.loads(post)
+        if not isinstance(tweets, list):
+            tweets = [tweets]
+
+        # Skip the tweets that are already live and reply to the last one of them
+        with DB_QUERY_SECONDS.time(query="posted_segments"):
+            posted = get_posted_segments(row_id)
+
+        if not posted:
+            # Do not spend quota on a tweet X will reject as a duplicate
+            with DB_QUERY_SECONDS.time(query="find_duplicate"):
+                duplicate_id = find_duplicate(
+                    account, content_hash(tweets), scheduled_time, duplicate_window, row_id,
+                    posted_only=True
+                )
+            if duplicate_id is not None:
+                print(f"Skipping scheduled tweet {row_id}: same first tweet as {duplicate_id}")
+                POSTS_TOTAL.inc(result="duplicate")
+                with DB_QUERY_SECONDS.time(query="release"):
+                    release_tweet(row_id, Status.DUPLICATE)
+                return
+        remaining = tweets[len(posted):]
+        previous_id = posted[-1] if posted else None
+
+        # Media is normally uploaded ahead of time; upload it now if it was not
+        media_ids = None
+        if not posted:
+            await upload_media_files(clients, time.time() + MEDIA_EXPIRY_MARGIN, row_id)
+            media_ids = get_media_ids(row_id)
+
+        def on_posted(index, tweet_id):
+            with DB_QUERY_SECONDS.time(query="record_segment"):
+                record_segment(row_id, len(posted) + index, tweet_id)
+
+        success, retry_at = await post_thread_async(
+            clients.get(account), remaining, governor, previous_id, on_posted, rate_key(account),
+            media_ids
+        )
+
+        if success:
+            result, status, not_before = "posted", Status.POSTED, None
+        elif retry_at is not None:
+            deferred[row_id] = retry_at
+            result, status, not_before = "deferred", None, retry_at
+        else:
+            result, status, not_before = "failed", None, time.time() + FAILURE_BACKOFF
+
+        POSTS_TOTAL.inc(result=result)
+        with DB_QUERY_SECONDS.time(query="release"):
+            release_tweet(row_id, status, not_before)
+
+    def claim_next():
+        # Round-robin over the accounts, dropping those with nothing left to claim
+        while accounts:
+            account = accounts[0]
+            accounts.rotate(-1)
+            with DB_QUERY_SECONDS.time(query="claim"):
+                claimed = claim_due_tweet(WORKER_ID, LEASE_SECONDS, account)
+            if claimed is not None:
+                return claimed
+            accounts.remove(account)
+        return None
+
+    async def worker():
+        while True:
+            claimed = claim_next()
+            if claimed is None:
+                return
+
+            row_id, post, account, scheduled_time = claimed
+            DISPATCH_LAG_SECONDS.observe(max(time.time() - scheduled_time, 0))
+            in_flight.add(row_id)
+            try:
+                await post_row(row_id, post, account, scheduled_time)
+            except Exception as e:
+                print(f"Error posting scheduled tweet {row_id}:", e)
+                POSTS_TOTAL.inc(result="failed")
+                release_tweet(row_id, not_before=time.time() + FAILURE_BACKOFF)
+            finally:
+                in_flight.discard(row_id)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            with DB_QUERY_SECONDS.time(query="renew_leases"):
+                renew_leases(WORKER_ID, in_flight, LEASE_SECONDS)
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
     except Exception as e:
         print("Error posting pending tweets:", e)
     finally:
-        conn.close()
+        beat.cancel()
+
+    return deferred
+
+def fetch_timeline(client, account=DEFAULT_ACCOUNT, limit=20, since_id=None, until_id=None):
+    """
+    Page through the home timeline, newest first, caching each page as it arrives.
+
+    Args:
+        client (tweepy.Client): The Tweepy Client object.
+        account (str, optional): The account whose timeline is cached.
+        limit (int, optional): Maximum number of tweets to fetch.
+        since_id (int, optional): Only fetch tweets newer than this one.
+        until_id (int, optional): Only fetch tweets older than this one.
+
+    Yields:
+        tuple: (id, author, text, created_at) for each tweet.
+    """
+    fetched = 0
+    pages = tweepy.Paginator(
+        client.get_home_timeline,
+        max_results=min(max(limit, 1), TIMELINE_PAGE_SIZE),
+        since_id=since_id,
+        until_id=until_id,
+        expansions=["author_id"],
+        tweet_fields=["created_at"],
+        user_fields=["username"]
+    )
+    for response in pages:
+        if not response.data:
+            return
+
+        authors = {user.id: user.username for user in response.includes.get("users", [])}
+        page = [
+            (
+                tweet.id,
+                authors.get(tweet.author_id),
+                tweet.text,
+                int(tweet.created_at.timestamp()) if tweet.created_at else None
+            )
+            for tweet in response.data[:limit - fetched]
+        ]
+        cache_timeline_tweets(account, page)
+        yield from page
 
-def retrieve_timeline(client, api, count=20):
+        fetched += len(page)
+        if fetched >= limit:
+            return
+
+@traced("api.retrieve_timeline")
+def retrieve_timeline(client, count=20, account=DEFAULT_ACCOUNT):
     """
-    Retrieve the latest tweets from the user's timeline.
+    Print the latest tweets from the user's home timeline, fetching only new ones.
+
+    Tweets newer than the newest cached one are requested with `since_id` and
+    printed page by page as they arrive. The rest of `count` comes from the
+    local cache, and only if the cache runs out are older tweets requested with
+    `until_id`. Frequent polling therefore costs one small API read. When more
+    than `count` tweets are new, only the newest `count` are fetched and the gap
+    behind them is not backfilled.
 
     Args:
         client (tweepy.Client): The Tweepy Client object.
-        count (int, optional): The number of tweets to retrieve.
+        count (int, optional): The number of tweets to print.
+        account (str, optional): The account whose timeline is cached.
 
     Returns:
-        list: The list of tweets.
+        int: The number of tweets fetched from the API.
     """
-    try:
-        response = api.home_timeline(
-            count=count,
-            # tweet_fields=["created_at", "author_id", "conversation_id", "public_metrics"]
-        )
+    printed = 0
+    fetched = 0
+    oldest_id = None
+
+    def show(tweets):
+        nonlocal printed, oldest_id
+        for tweet in tweets:
+            print(format_timeline_tweet(*tweet), flush=True)
+            printed += 1
+            oldest_id = tweet[0]
 
-        if response.data:
-            for tweet in tweets:
-                print(f"Tweet by {tweet.user.screen_name},{tweet.id}: {tweet.text}")
-            return response.data
-        return []
+    try:
+        show(fetch_timeline(client, account, count, since_id=latest_timeline_id(account)))
+        fetched = printed
+        show(get_cached_timeline(account, count - printed, oldest_id))
+        if printed < count:
+            before = printed
+            show(fetch_timeline(client, account, count - printed, until_id=oldest_id))
+            fetched += printed - before
     except Exception as e:
         print("Error retrieving timeline:", e)
-        return []
-
+    return fetched
@@ -0,0 +1,240 @@
+import json
+import os
+import sys
+
+from setup import SOCKET_FILE
+from tracing import span
+
+# Commands a running `xp run` can answer on behalf of a CLI invocation
+DAEMON_COMMANDS = ('post', 'schedule', 'list', 'cancel', 'reschedule')
+
+# Seconds the CLI waits to connect to the daemon before running standalone
+CONNECT_TIMEOUT = 0.5
+
+# Bytes of command output buffered before they are sent to the client
+OUTPUT_CHUNK = 64 * 1024
+
+def send_request(args, tweets, path=SOCKET_FILE):
+    """
+    Run a command in the `xp run` daemon, printing its output as it arrives.
+
+    Only the standard library is imported here, so a command answered by the
+    daemon never pays for tweepy, dateparser or the credentials.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        tweets (list[str]): The tweets read from the arguments, a file or stdin.
+        path (str): The daemon's socket.
+
+    Returns:
+        int: The command's exit code, or None if no daemon is listening and the
+        command should run standalone.
+    """
+    if not os.path.exists(path):
+        return None
+
+    # Imported only when a daemon may be listening; it costs a few milliseconds of startup
+    import socket
+
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    request = dict(vars(args))
+    # Relative paths are resolved by the client, whose working directory the daemon does not share
+    if request.get('media'):
+        request['media'] = [os.path.abspath(media) for media in request['media']]
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+
+    with sock:
+        sock.settimeout(None)
+        sock.sendall(json.dumps({'args': request, 'tweets': tweets}).encode() + b"\n")
+        for line in sock.makefile('r', encoding='utf-8'):
+            message = json.loads(line)
+            if 'exit' in message:
+                return message['exit']
+            stream = sys.stderr if message.get('stream') == 'stderr' else sys.stdout
+            stream.write(message['text'])
+            stream.flush()
+
+    # The daemon went away mid-command; do not run it again standalone
+    print("Error: Lost connection to xp run.", file=sys.stderr)
+    return 1
+
+class RequestOutput:
+    """
+    Forwards what one request prints to its client.
+
+    Writes come from the event loop thread for commands that run as coroutines,
+    and from a worker thread for blocking ones. Worker threads wait for the
+    socket to drain every OUTPUT_CHUNK bytes, so a large `xp list` streams to the
+    client instead of piling up in memory.
+    """
+
+    def __init__(self, writer, loop):
+        self.writer = writer
+        self.loop = loop
+        self.buffers = {'stdout': [], 'stderr': []}
+        self.size = 0
+
+    def write(self, stream, text):
+        self.buffers[stream].append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_CHUNK:
+            self.flush()
+
+    def flush(self):
+        import asyncio
+
+        data = self._take()
+        if not data:
+            return
+        if self._in_loop():
+            self.writer.write(data)
+        else:
+            asyncio.run_coroutine_threadsafe(self._send(data), self.loop).result()
+
+    def _in_loop(self):
+        import asyncio
+
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _take(self):
+        data = b"".join(
+            json.dumps({'stream': stream, 'text': ''.join(chunks)}).encode() + b"\n"
+            for stream, chunks in self.buffers.items() if chunks
+        )
+        self.buffers = {'stdout': [], 'stderr': []}
+        self.size = 0
+        return data
+
+    async def _send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+class RoutedStream:
+    """
+    Stand-in for sys.stdout or sys.stderr that sends prints made while handling
+    a request to that request's client and everything else to the real stream.
+
+    The current request is tracked in a context variable, which asyncio copies
+    into the tasks and worker threads the request starts.
+    """
+
+    def __init__(self, stream, name, current):
+        self.stream = stream
+        self.name = name
+        self.current = current
+
+    def write(self, text):
+        output = self.current.get()
+        if output is None:
+            return self.stream.write(text)
+        output.write(self.name, text)
+        return len(text)
+
+    def flush(self):
+        if self.current.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+async def serve_requests(run_command, post_thread, path=SOCKET_FILE):
+    """
+    Answer CLI commands on a Unix socket until cancelled.
+
+    Each connection carries one JSON request with the parsed arguments and the
+    tweets. `post` runs as a coroutine on the daemon's warm clients; the other
+    commands are blocking database work and run in a worker thread. Output is
+    streamed back as JSON lines, followed by the exit code.
+
+    Args:
+        run_command (callable): Runs a parsed command standalone, e.g. main.run_command.
+        post_thread (callable): Coroutine function that posts (args, tweets) and
+            returns an exit code.
+        path (str): The socket to listen on.
+
+    Returns:
+        asyncio.Server: The server, or None if sockets are unsupported or another
+        daemon is already listening.
+    """
+    import argparse
+    import asyncio
+    import contextvars
+    import socket
+
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    # Leave the socket of another running daemon alone, but clear a stale one
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            print(f"Another xp run is listening on {path}; not serving CLI commands.")
+            return None
+        except OSError:
+            os.remove(path)
+        finally:
+            probe.close()
+
+    current = contextvars.ContextVar('xp_request_output', default=None)
+    sys.stdout = RoutedStream(sys.stdout, 'stdout', current)
+    sys.stderr = RoutedStream(sys.stderr, 'stderr', current)
+
+    async def handle(reader, writer):
+        output = RequestOutput(writer, asyncio.get_running_loop())
+        current.set(output)
+        try:
+            request = json.loads(await reader.readline())
+            args = argparse.Namespace(**request['args'])
+            with span("daemon.request", request=args.command):
+                if args.command == 'post':
+                    code = await post_thread(args, request['tweets'])
+                else:
+                    code = await asyncio.to_thread(run_command, args, request['tweets'])
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            code = 1
+
+        try:
+            output.flush()
+            writer.write(json.dumps({'exit': code or 0}).encode() + b"\n")
+            await writer.drain()
+            writer.close()
+        except ConnectionError:
+            pass
+
+    old_umask = os.umask(0o077)
+    try:
+        return await asyncio.start_unix_server(handle, path)
+    finally:
+        os.umask(old_umask)
+
+def stop_serving(server, path=SOCKET_FILE):
+    """
+    Stop a server started by serve_requests() and remove its socket.
+
+    Args:
+        server (asyncio.Server): The server, or None if none was started.
+        path (str): The socket it listened on.
+    """
+    if server is None:
+        return
+    server.close()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,16 +1,117 @@
 import sqlite3
 import json
-import dateparser
+import csv
+import os
+import sys
+import time
+import threading
+import unicodedata
+import zlib
 from datetime import datetime
+from enum import IntEnum
 
-from setup import DB_FILE
+from setup import DB_FILE, DEFAULT_ACCOUNT, ACCOUNT_NAME
+from timeparse import parse_time
+from tracing import traced
 
-def init_db():
+class Status(IntEnum):
+    """Status of a scheduled post, stored as an integer in scheduled_tweets.status."""
+    PENDING = 0
+    POSTED = 1
+    CANCELLED = 2
+    DUPLICATE = 3
+
+    def __str__(self):
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, name):
+        """Return the Status for a CLI name such as 'pending'."""
+        return cls[name.upper()]
+
+STATUS_NAMES = [str(status) for status in Status]
+
+# Seconds a connection waits on a lock held by another process before failing
+BUSY_TIMEOUT = 10.0
+
+# Number of prepared statements each connection keeps compiled
+STATEMENT_CACHE_SIZE = 256
+
+# Most images X accepts on one tweet; a video or GIF must be the only media file
+MAX_MEDIA = 4
+
+# Hours either side of a thread's time in which the same first tweet counts as a
+# duplicate that X would reject
+DUPLICATE_WINDOW_HOURS = 24
+
+# Posted and cancelled threads older than this many days are moved to archived_tweets
+ARCHIVE_AFTER_DAYS = 30
+
+# Seconds between the archiving passes of `xp run`
+ARCHIVE_INTERVAL = 3600
+
+# Rows moved per transaction, so archiving never holds the write lock for long
+ARCHIVE_BATCH_SIZE = 500
+
+# Free pages released per transaction by an incremental vacuum
+VACUUM_STEP_PAGES = 1000
+
+_local = threading.local()
+
+def get_connection():
     """
-    Initialize the SQLite database. Create a table to store scheduled_tweets.
+    Return this thread's shared database connection, opening it on first use.
+
+    The connection runs in WAL mode with synchronous=NORMAL, so `xp schedule` and
+    `xp list` can read and write while `xp run` is posting without hitting
+    "database is locked". It is reused for the life of the process, which keeps
+    its prepared statement cache warm across calls.
+
+    Returns:
+        sqlite3.Connection: The connection for the current thread.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            DB_FILE,
+            timeout=BUSY_TIMEOUT,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        # Only takes effect when the file is created; `xp vacuum --full` converts older ones
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        _local.conn = conn
+    return conn
+
+def close_connection():
+    """Close this thread's shared database connection, if it is open."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def format_timestamp(timestamp):
+    """
+    Format a UTC epoch timestamp from the database as local time.
+
+    Args:
+        timestamp (int): Seconds since the epoch.
+
+    Returns:
+        str: The local time as "YYYY-MM-DD HH:MM:SS".
+    """
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def _local_to_epoch(value):
+    """Convert a legacy local-time string into a UTC epoch timestamp."""
+    if value is None:
+        return None
+    return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp())
+
+def _create_scheduled_tweets(conn):
+    """Version 1: the original table with local-time strings and text statuses."""
     conn.execute("""
         CREATE TABLE IF NOT EXISTS scheduled_tweets (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -20,102 +121,1490 @@ def init_db():
             created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
         )
     """)
-    conn.commit()
-    conn.close()
 
-def get_scheduled_tweets(status=None):
+def _epoch_times_and_status_index(conn):
+    """Version 2: UTC epoch integer times, integer statuses and a (status, time) index."""
+    conn.create_function("local_to_epoch", 1, _local_to_epoch, deterministic=True)
+    conn.execute("ALTER TABLE scheduled_tweets RENAME TO scheduled_tweets_v1")
+    conn.execute("""
+        CREATE TABLE scheduled_tweets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post TEXT NOT NULL,
+            scheduled_time INTEGER NOT NULL,
+            status INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    """)
+    conn.execute("""
+        INSERT INTO scheduled_tweets (id, post, scheduled_time, status, created_at)
+        SELECT
+            id,
+            post,
+            local_to_epoch(scheduled_time),
+            CASE status WHEN 'posted' THEN ? WHEN 'cancelled' THEN ? ELSE ? END,
+            COALESCE(local_to_epoch(created_at), CAST(strftime('%s', 'now') AS INTEGER))
+        FROM scheduled_tweets_v1
+    """, (Status.POSTED, Status.CANCELLED, Status.PENDING))
+    conn.execute("DROP TABLE scheduled_tweets_v1")
+    conn.execute("""
+        CREATE INDEX idx_scheduled_tweets_status_time
+        ON scheduled_tweets (status, scheduled_time)
+    """)
+
+def _status_id_index(conn):
+    """Version 3: a (status, id) index for keyset-paginated listing by status."""
+    conn.execute("""
+        CREATE INDEX idx_scheduled_tweets_status_id
+        ON scheduled_tweets (status, id)
+    """)
+
+def _rate_limits(conn):
+    """Version 4: persisted rate limit state for each API endpoint."""
+    conn.execute("""
+        CREATE TABLE rate_limits (
+            endpoint TEXT PRIMARY KEY,
+            rate_limit INTEGER,
+            remaining INTEGER,
+            reset_at INTEGER,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+def _thread_segments(conn):
+    """Version 5: the ID of every tweet already posted from a scheduled thread."""
+    conn.execute("""
+        CREATE TABLE thread_segments (
+            scheduled_id INTEGER NOT NULL REFERENCES scheduled_tweets (id),
+            position INTEGER NOT NULL,
+            tweet_id TEXT NOT NULL,
+            posted_at INTEGER NOT NULL,
+            PRIMARY KEY (scheduled_id, position)
+        ) WITHOUT ROWID
+    """)
+
+def _claim_leases(conn):
+    """Version 6: per-row claims so several workers can share the queue."""
+    conn.execute("ALTER TABLE scheduled_tweets ADD COLUMN claimed_by TEXT")
+    conn.execute("ALTER TABLE scheduled_tweets ADD COLUMN lease_until INTEGER")
+
+def _accounts(conn):
+    """Version 7: the account each thread is posted from, indexed for fair claiming."""
+    conn.execute(
+        f"ALTER TABLE scheduled_tweets ADD COLUMN account TEXT NOT NULL DEFAULT '{DEFAULT_ACCOUNT}'"
+    )
+    conn.execute("""
+        CREATE INDEX idx_scheduled_tweets_status_account_time
+        ON scheduled_tweets (status, account, scheduled_time)
+    """)
+
+def _timeline_tweets(conn):
+    """Version 8: a local cache of each account's home timeline."""
+    conn.execute("""
+        CREATE TABLE timeline_tweets (
+            account TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            author TEXT,
+            text TEXT NOT NULL,
+            created_at INTEGER,
+            fetched_at INTEGER NOT NULL,
+            PRIMARY KEY (account, id)
+        ) WITHOUT ROWID
+    """)
+
+def _scheduled_media(conn):
+    """Version 9: media attached to scheduled threads and their pre-uploaded media IDs."""
+    conn.execute("""
+        CREATE TABLE scheduled_media (
+            scheduled_id INTEGER NOT NULL REFERENCES scheduled_tweets (id),
+            position INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            media_id TEXT,
+            expires_at INTEGER,
+            PRIMARY KEY (scheduled_id, position)
+        ) WITHOUT ROWID
+    """)
+
+def _archived_tweets(conn):
+    """Version 10: finished threads moved out of scheduled_tweets, with their posted tweet IDs."""
+    conn.execute("""
+        CREATE TABLE archived_tweets (
+            id INTEGER PRIMARY KEY,
+            account TEXT NOT NULL,
+            post BLOB NOT NULL,
+            scheduled_time INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            tweet_ids TEXT,
+            archived_at INTEGER NOT NULL
+        )
+    """)
+
+def _content_hash(conn):
+    """Version 11: a hash of each thread's normalized first tweet, indexed to find duplicates."""
+    conn.create_function("content_hash", 1, lambda post: content_hash(_decode_post(post)), deterministic=True)
+    conn.execute("ALTER TABLE scheduled_tweets ADD COLUMN content_hash TEXT")
+    conn.execute("UPDATE scheduled_tweets SET content_hash = content_hash(post)")
+    conn.execute("""
+        CREATE INDEX idx_scheduled_tweets_account_hash_time
+        ON scheduled_tweets (account, content_hash, scheduled_time)
+    """)
+
+def _recurring_tweets(conn):
+    """Version 12: recurring series, each with only its next occurrence stored and indexed."""
+    conn.execute("""
+        CREATE TABLE recurring_tweets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account TEXT NOT NULL,
+            post TEXT NOT NULL,
+            media TEXT,
+            rule TEXT NOT NULL,
+            start_time INTEGER NOT NULL,
+            next_time INTEGER,
+            status INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX idx_recurring_tweets_status_next
+        ON recurring_tweets (status, next_time)
+    """)
+    conn.execute("ALTER TABLE scheduled_tweets ADD COLUMN series_id INTEGER REFERENCES recurring_tweets (id)")
+
+def _queue_revision(conn):
+    """Version 13: a counter bumped whenever pending rows are moved or cancelled in bulk."""
+    conn.execute("""
+        CREATE TABLE queue_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            revision INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT INTO queue_revision (id, revision) VALUES (0, 0)")
+
+# Schema migrations, applied in order. The database's PRAGMA user_version records
+# how many of them have already run, so append new migrations and never reorder.
+MIGRATIONS = [
+    _create_scheduled_tweets,
+    _epoch_times_and_status_index,
+    _status_id_index,
+    _rate_limits,
+    _thread_segments,
+    _claim_leases,
+    _accounts,
+    _timeline_tweets,
+    _scheduled_media,
+    _archived_tweets,
+    _content_hash,
+    _recurring_tweets,
+    _queue_revision,
+]
+
+@traced("db.init_db")
+def init_db():
+    """
+    Initialize the SQLite database and apply any pending schema migrations.
+    """
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+def get_scheduled_tweets(
+    status=None, after_id=None, limit=None, since=None, until=None, account=None, archived=False
+):
     """
-    Retrieve scheduled tweets from the database.
+    Stream scheduled tweets from the database in ID order.
+
+    Rows are read from the cursor as they are yielded, so callers can start
+    printing before the query finishes. Pass the last ID seen as `after_id` to
+    fetch the next page.
 
     Args:
         status (str): Filter by status (e.g., 'pending', 'posted').
+        after_id (int): Only return rows with an ID greater than this one.
+        limit (int): Maximum number of rows to return.
+        since (int): Only return rows scheduled at or after this UTC epoch timestamp.
+        until (int): Only return rows scheduled before this UTC epoch timestamp.
+        account (str): Only return rows posted from this account.
+        archived (bool): Read the threads moved to archived_tweets instead.
 
-    Returns:
-        list[dict]: A list of dictionaries containing the scheduled tweets.
+    Yields:
+        dict: A dictionary for each scheduled tweet.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM scheduled_tweets"
+    clauses = []
+    params = []
     if status:
-        query += f" WHERE status = '{status}'"
+        clauses.append("status = ?")
+        params.append(Status.parse(status))
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(after_id)
+    if since is not None:
+        clauses.append("scheduled_time >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("scheduled_time < ?")
+        params.append(until)
+    if account:
+        clauses.append("account = ?")
+        params.append(account)
+
+    table = "archived_tweets" if archived else "scheduled_tweets"
+    query = f"SELECT id, account, post, scheduled_time, status, created_at FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
 
-    cursor.execute(query)
+    cursor = get_connection().execute(query, params)
     columns = [column[0] for column in cursor.description]
-    tweets = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    for row in cursor:
+        tweet = dict(zip(columns, row))
+        tweet['status'] = str(Status(tweet['status']))
+        if isinstance(tweet['post'], bytes):
+            # Archived with compression
+            tweet['post'] = zlib.decompress(tweet['post']).decode()
+        yield tweet
+
+def queue_revision():
+    """
+    Return the revision of the pending queue.
+
+    New rows only ever get higher IDs, so `xp run` picks them up by ID. Edits to
+    rows it already knows (xp cancel, xp reschedule) bump this counter instead,
+    which tells it to reload the whole queue.
+    """
+    return get_connection().execute("SELECT revision FROM queue_revision").fetchone()[0]
 
-    conn.close()
-    return tweets
+def _bump_queue_revision(conn):
+    """Record an edit to existing pending rows, inside the caller's transaction."""
+    conn.execute("UPDATE queue_revision SET revision = revision + 1")
 
-def list_scheduled_tweets(status: str = None, verbose: bool = False) -> None:
+def content_hash(tweets):
     """
-    List scheduled tweets from the database.
-    
+    Return the duplicate-detection hash of a thread.
+
+    X rejects a tweet that repeats one the account posted recently, and a thread
+    fails at its first tweet, so only that one is hashed. It is NFC-normalized
+    and runs of whitespace are collapsed first, as they are not what makes two
+    tweets different.
+
     Args:
-        status (str): Filter by status (e.g., 'pending', 'posted').
-        verbose (bool): Show full tweet content.
+        tweets (list[str]): The tweets of the thread.
+
+    Returns:
+        str: A hex digest, or None for an empty thread.
+    """
+    import hashlib
+
+    if not tweets:
+        return None
+    text = " ".join(unicodedata.normalize('NFC', str(tweets[0])).split())
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+@traced("db.find_duplicate")
+def find_duplicate(
+    account, digest, scheduled_time, window_hours=DUPLICATE_WINDOW_HOURS, exclude_id=None,
+    posted_only=False
+):
+    """
+    Return the ID of a pending or posted thread of the account with the same
+    content hash, scheduled within the window either side of `scheduled_time`.
+
+    One range scan of idx_scheduled_tweets_account_hash_time, however large the
+    table is.
+
+    Args:
+        account (str): The account posting the thread.
+        digest (str): The thread's content_hash().
+        scheduled_time (int): When the thread is posted, as a UTC epoch timestamp.
+        window_hours (float): How close two threads must be to count as duplicates.
+        exclude_id (int, optional): The thread itself, when it is already stored.
+        posted_only (bool): Ignore pending threads, e.g. when about to post one.
+
+    Returns:
+        int: The ID of the other thread, or None.
+    """
+    window = int(window_hours * 3600)
+    row = get_connection().execute("""
+        SELECT id FROM scheduled_tweets
+        WHERE account = ? AND content_hash = ?
+        AND scheduled_time BETWEEN ? AND ?
+        AND status IN (?, ?)
+        AND id IS NOT ?
+        LIMIT 1
+    """, (
+        account, digest, scheduled_time - window, scheduled_time + window,
+        Status.POSTED, Status.POSTED if posted_only else Status.PENDING, exclude_id
+    )).fetchone()
+    return row[0] if row else None
+
+def check_duplicate(tweets, account, scheduled_time, window_hours=DUPLICATE_WINDOW_HOURS, allow=False):
+    """
+    Report whether a thread repeats one already scheduled or posted, before it is
+    stored or sent.
+
+    Args:
+        tweets (list[str]): The tweets of the thread.
+        account (str): The account posting the thread.
+        scheduled_time (int): When the thread is posted, as a UTC epoch timestamp.
+        window_hours (float): How close two threads must be to count as duplicates.
+        allow (bool): Only warn about a duplicate instead of refusing it.
+
+    Returns:
+        bool: True if the thread is a duplicate and must not be stored or sent.
     """
+    duplicate_id = find_duplicate(account, content_hash(tweets), scheduled_time, window_hours)
+    if duplicate_id is None:
+        return False
+    if allow:
+        print(f"Warning: Same first tweet as scheduled thread {duplicate_id}; X may reject it as a duplicate.")
+        return False
+    print(
+        f"Error: Same first tweet as scheduled thread {duplicate_id} within {window_hours:g} hours; "
+        "X would reject it as a duplicate. Use --allow-duplicate to keep it anyway."
+    )
+    return True
+
+def _decode_post(post):
+    """Decode a stored post into a list of tweets."""
+    try:
+        tweets = json.loads(post)
+    except json.JSONDecodeError:
+        return [post]
+    return tweets if isinstance(tweets, list) else [tweets]
+
+def _to_record(tweet):
+    """Convert a scheduled tweet row into a JSON-serializable record."""
+    return {
+        'id': tweet['id'],
+        'account': tweet['account'],
+        'status': tweet['status'],
+        'scheduled_time': datetime.fromtimestamp(tweet['scheduled_time']).astimezone().isoformat(),
+        'created_at': datetime.fromtimestamp(tweet['created_at']).astimezone().isoformat(),
+        'tweets': _decode_post(tweet['post']),
+    }
+
+def _print_table(scheduled_tweets, verbose):
+    """Print scheduled tweets in the human-readable listing format."""
     print("\n=== Scheduled Tweets ===\n")
-    # Get the scheduled tweets
-    scheduled_tweets = get_scheduled_tweets(status)
-    
-    if not scheduled_tweets:
-        print("No scheduled tweets found.")
-        return
-    
+
+    found = False
     for tweet in scheduled_tweets:
+        found = True
         print(f"ID: {tweet['id']}")
+        print(f"Account: {tweet['account']}")
         print(f"Post: {tweet['post']}")
-        print(f"Scheduled Time: {tweet['scheduled_time']}")
+        print(f"Scheduled Time: {format_timestamp(tweet['scheduled_time'])}")
         print(f"Status: {tweet['status']}")
-        print(f"Created At: {tweet['created_at']}")
+        print(f"Created At: {format_timestamp(tweet['created_at'])}")
         if verbose:
-            try:
-                tweets_list = json.loads(tweet['post'])
-                if isinstance(tweets_list, list):
-                    print("Tweets in thread:")
-                    for i, t in enumerate(tweets_list, 1):
-                        print(f"Tweet {i}: {t}")
-                else:
-                    print(f"Tweet: {tweets_list}")
-            except json.JSONDecodeError:
-                print(f"Tweet: {tweet['post']}")
+            tweets_list = _decode_post(tweet['post'])
+            print("Tweets in thread:")
+            for i, t in enumerate(tweets_list, 1):
+                print(f"Tweet {i}: {t}")
 
         print("-" * 40)
 
-def add_tweet(post, scheduled_time):
+    if not found:
+        print("No scheduled tweets found.")
+
+def _parse_bounds(since, until):
+    """Parse --since and --until into UTC epoch bounds, or return None after reporting a bad one."""
+    bounds = {}
+    for name, value in (('since', since), ('until', until)):
+        if value:
+            parsed_time = parse_time(value)
+            if not parsed_time:
+                print(f"Error: Unable to parse --{name} time.")
+                return None
+            bounds[name] = int(parsed_time.timestamp())
+    return bounds
+
+@traced("db.list_scheduled_tweets")
+def list_scheduled_tweets(
+    status: str = None,
+    verbose: bool = False,
+    output_format: str = 'table',
+    limit: int = None,
+    after_id: int = None,
+    since: str = None,
+    until: str = None,
+    account: str = None,
+    archived: bool = False,
+) -> None:
+    """
+    List scheduled tweets from the database.
+    
+    Args:
+        status (str): Filter by status (e.g., 'pending', 'posted').
+        verbose (bool): Show full tweet content.
+        output_format (str): 'table' for people, 'json' or 'ndjson' for tools.
+        limit (int): Maximum number of rows to print.
+        after_id (int): Only print rows with an ID greater than this one.
+        since (str): Only print rows scheduled at or after this time (in natural language).
+        until (str): Only print rows scheduled before this time (in natural language).
+        account (str): Only print rows posted from this account.
+        archived (bool): List archived threads instead of the live ones.
+    """
+    bounds = _parse_bounds(since, until)
+    if bounds is None:
+        return
+
+    scheduled_tweets = get_scheduled_tweets(
+        status, after_id, limit, account=account, archived=archived, **bounds
+    )
+
+    if output_format == 'ndjson':
+        for tweet in scheduled_tweets:
+            print(json.dumps(_to_record(tweet)))
+
+    elif output_format == 'json':
+        # Stream the array one element at a time instead of building it in memory
+        separator = "["
+        for tweet in scheduled_tweets:
+            print(separator + json.dumps(_to_record(tweet)), end="")
+            separator = ",\n"
+        print("[]" if separator == "[" else "]")
+
+    else:
+        _print_table(scheduled_tweets, verbose)
+
+def due_accounts(horizon=None):
+    """
+    Return the accounts that have pending rows due now, or by a later time.
+
+    Args:
+        horizon (float, optional): Also count rows and series occurrences due by
+            this UTC epoch timestamp. Defaults to now, and rows only.
+
+    Returns:
+        list[str]: Account names.
+    """
+    if horizon is None:
+        rows = get_connection().execute("""
+            SELECT DISTINCT account
+            FROM scheduled_tweets
+            WHERE status = ?
+            AND scheduled_time <= ?
+        """, (Status.PENDING, int(time.time())))
+    else:
+        rows = get_connection().execute("""
+            SELECT account FROM scheduled_tweets WHERE status = ? AND scheduled_time <= ?
+            UNION
+            SELECT account FROM recurring_tweets WHERE status = ? AND next_time <= ?
+        """, (Status.PENDING, int(horizon), Status.PENDING, int(horizon)))
+    return [account for account, in rows]
+
+@traced("db.claim_due_tweet")
+def claim_due_tweet(worker_id, lease_seconds, account=DEFAULT_ACCOUNT):
+    """
+    Atomically claim an account's earliest due, unclaimed pending row for a worker.
+
+    The claim is a single UPDATE ... RETURNING, so two workers can never claim
+    the same row. Rows whose lease has expired count as unclaimed, which is how
+    the rows of a crashed worker are recovered.
+
+    Args:
+        worker_id (str): Identifies the claiming worker.
+        lease_seconds (int): How long the claim lasts without being renewed.
+        account (str): The account to claim a row for.
+
+    Returns:
+        tuple: (id, post, account, scheduled_time) of the claimed row, or None if nothing is due.
+    """
+    now = int(time.time())
+    conn = get_connection()
+    row = conn.execute("""
+        UPDATE scheduled_tweets
+        SET claimed_by = ?, lease_until = ?
+        WHERE id = (
+            SELECT id
+            FROM scheduled_tweets
+            WHERE status = ?
+            AND account = ?
+            AND scheduled_time <= ?
+            AND (lease_until IS NULL OR lease_until <= ?)
+            ORDER BY scheduled_time ASC
+            LIMIT 1
+        )
+        RETURNING id, post, account, scheduled_time
+    """, (worker_id, now + lease_seconds, Status.PENDING, account, now, now)).fetchone()
+    conn.commit()
+    return row
+
+def renew_leases(worker_id, row_ids, lease_seconds):
+    """
+    Extend the leases a worker holds on rows it is still posting.
+
+    Args:
+        worker_id (str): The worker that claimed the rows.
+        row_ids (iterable[int]): The rows to renew.
+        lease_seconds (int): How long the renewed claims last.
+    """
+    lease_until = int(time.time()) + lease_seconds
+    conn = get_connection()
+    conn.executemany("""
+        UPDATE scheduled_tweets
+        SET lease_until = ?
+        WHERE id = ? AND claimed_by = ?
+    """, [(lease_until, row_id, worker_id) for row_id in row_ids])
+    conn.commit()
+
+@traced("db.release_tweet")
+def release_tweet(row_id, status=None, not_before=None):
+    """
+    Release a claimed row, optionally setting its status.
+
+    Args:
+        row_id (int): The claimed row.
+        status (Status, optional): The new status, e.g. Status.POSTED.
+        not_before (float, optional): Keep the row unclaimable by any worker until
+            this time, e.g. after a failure or while a rate limit resets.
+    """
+    conn = get_connection()
+    conn.execute("""
+        UPDATE scheduled_tweets
+        SET status = COALESCE(?, status),
+            claimed_by = NULL,
+            lease_until = ?
+        WHERE id = ?
+    """, (status, int(not_before) if not_before else None, row_id))
+    conn.commit()
+
+def get_posted_segments(scheduled_id):
+    """
+    Return the IDs of the tweets already posted from a scheduled thread.
+
+    Args:
+        scheduled_id (int): The ID of the scheduled thread.
+
+    Returns:
+        list[str]: Tweet IDs in thread order, up to the first segment not yet posted.
+    """
+    rows = get_connection().execute("""
+        SELECT position, tweet_id
+        FROM thread_segments
+        WHERE scheduled_id = ?
+        ORDER BY position
+    """, (scheduled_id,))
+
+    tweet_ids = []
+    for position, tweet_id in rows:
+        if position != len(tweet_ids):
+            break
+        tweet_ids.append(tweet_id)
+    return tweet_ids
+
+@traced("db.record_segment")
+def record_segment(scheduled_id, position, tweet_id):
+    """
+    Record that one tweet of a scheduled thread is live.
+
+    Committed right away, so a crash or failure later in the thread never causes
+    this tweet to be posted again.
+
+    Args:
+        scheduled_id (int): The ID of the scheduled thread.
+        position (int): The tweet's zero-based position in the thread.
+        tweet_id (str): The ID X assigned to the posted tweet.
+    """
+    conn = get_connection()
+    conn.execute("""
+        INSERT OR REPLACE INTO thread_segments (scheduled_id, position, tweet_id, posted_at)
+        VALUES (?, ?, ?, ?)
+    """, (scheduled_id, position, str(tweet_id), int(time.time())))
+    conn.commit()
+
+def get_media_uploads(horizon, scheduled_id=None):
+    """
+    Return the media of pending threads that need uploading before they are posted.
+
+    A file needs uploading if it has no media ID yet or if its media ID expires
+    before `horizon`.
+
+    Args:
+        horizon (int): Only consider threads scheduled before this UTC epoch timestamp.
+        scheduled_id (int, optional): Only consider this thread.
+
+    Returns:
+        list[tuple]: (scheduled_id, position, path, account) for each file.
+    """
+    query = """
+        SELECT m.scheduled_id, m.position, m.path, t.account
+        FROM scheduled_tweets t
+        JOIN scheduled_media m ON m.scheduled_id = t.id
+        WHERE t.status = ?
+        AND t.scheduled_time < ?
+        AND (m.expires_at IS NULL OR m.expires_at < ?)
+    """
+    params = [Status.PENDING, horizon, horizon]
+    if scheduled_id is not None:
+        query += " AND t.id = ?"
+        params.append(scheduled_id)
+    return get_connection().execute(query + " ORDER BY t.scheduled_time, m.position", params).fetchall()
+
+def record_media_upload(scheduled_id, position, media_id, expires_at):
+    """
+    Store the media ID X assigned to an uploaded file.
+
+    Args:
+        scheduled_id (int): The ID of the scheduled thread.
+        position (int): The file's position among the thread's media.
+        media_id (str): The media ID to attach when posting.
+        expires_at (int): UTC epoch timestamp after which the media ID can no longer be used.
+    """
+    conn = get_connection()
+    conn.execute("""
+        UPDATE scheduled_media
+        SET media_id = ?, expires_at = ?
+        WHERE scheduled_id = ? AND position = ?
+    """, (str(media_id), int(expires_at), scheduled_id, position))
+    conn.commit()
+
+def get_media_ids(scheduled_id):
+    """
+    Return the media IDs to attach to the first tweet of a scheduled thread.
+
+    Args:
+        scheduled_id (int): The ID of the scheduled thread.
+
+    Returns:
+        list[str]: Media IDs in attachment order, empty if the thread has no media.
+    """
+    rows = get_connection().execute("""
+        SELECT media_id
+        FROM scheduled_media
+        WHERE scheduled_id = ?
+        ORDER BY position
+    """, (scheduled_id,))
+    return [media_id for media_id, in rows]
+
+def latest_timeline_id(account=DEFAULT_ACCOUNT):
+    """
+    Return the ID of the newest cached timeline tweet of an account.
+
+    Args:
+        account (str): The account whose timeline is cached.
+
+    Returns:
+        int: The tweet ID, or None if nothing is cached yet.
+    """
+    return get_connection().execute("""
+        SELECT MAX(id)
+        FROM timeline_tweets
+        WHERE account = ?
+    """, (account,)).fetchone()[0]
+
+def cache_timeline_tweets(account, tweets):
+    """
+    Store one page of timeline tweets in the cache.
+
+    Args:
+        account (str): The account whose timeline the tweets are from.
+        tweets (iterable[tuple]): (id, author, text, created_at) for each tweet,
+            created_at as a UTC epoch timestamp or None.
+    """
+    fetched_at = int(time.time())
+    conn = get_connection()
+    conn.executemany("""
+        INSERT OR REPLACE INTO timeline_tweets (account, id, author, text, created_at, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(account, int(tweet_id), author, text, created_at, fetched_at)
+          for tweet_id, author, text, created_at in tweets])
+    conn.commit()
+
+def get_cached_timeline(account=DEFAULT_ACCOUNT, limit=20, before_id=None):
+    """
+    Stream cached timeline tweets of an account, newest first.
+
+    Args:
+        account (str): The account whose timeline is cached.
+        limit (int): Maximum number of tweets to return.
+        before_id (int, optional): Only return tweets older than this one.
+
+    Yields:
+        tuple: (id, author, text, created_at) for each tweet.
+    """
+    yield from get_connection().execute("""
+        SELECT id, author, text, created_at
+        FROM timeline_tweets
+        WHERE account = ?
+        AND id < ?
+        ORDER BY id DESC
+        LIMIT ?
+    """, (account, before_id if before_id is not None else 2 ** 63 - 1, limit))
+
+def format_timeline_tweet(tweet_id, author, text, created_at):
+    """Format a timeline tweet as one line for the terminal."""
+    when = f" [{format_timestamp(created_at)}]" if created_at else ""
+    return f"Tweet by {author or 'unknown'},{tweet_id}{when}: {text}"
+
+def _check_account_and_media(account, media):
+    """Return the absolute media paths, or None after reporting a bad account or file."""
+    if not ACCOUNT_NAME.fullmatch(account):
+        print(f"Error: Invalid account name: {account!r}")
+        return None
+
+    import mimetypes
+
+    media = [os.path.abspath(path) for path in media or []]
+    kinds = []
+    for path in media:
+        if not os.path.isfile(path):
+            print(f"Error: Media file not found: {path}")
+            return None
+        media_type = mimetypes.guess_type(path)[0] or ''
+        if media_type == 'image/gif' or media_type.startswith('video/'):
+            kinds.append('video')
+        elif media_type.startswith('image/'):
+            kinds.append('image')
+        else:
+            print(f"Error: Not an image, GIF or video: {path}")
+            return None
+
+    # X rejects any other mix when the tweet is posted, long after scheduling
+    if 'video' in kinds and len(media) > 1:
+        print("Error: A video or GIF must be the only media file on a tweet.")
+        return None
+    if len(media) > MAX_MEDIA:
+        print(f"Error: At most {MAX_MEDIA} images can be attached to a tweet.")
+        return None
+    return media
+
+@traced("db.add_tweet")
+def add_tweet(
+    post, scheduled_time, account=DEFAULT_ACCOUNT, media=None,
+    duplicate_window=DUPLICATE_WINDOW_HOURS, allow_duplicate=False
+):
     """
     Add a tweet to the database.
 
     Args:
         tweets (str): The content of the tweet.
         scheduled_time (str): When the tweet should be posted (in natural language).
+        account (str): The account to post from.
+        media (list[str], optional): Image or video files to attach to the first tweet.
+        duplicate_window (float): Hours either side in which the same first tweet is a duplicate.
+        allow_duplicate (bool): Schedule a duplicate with a warning instead of refusing it.
+
+    Returns:
+        bool: True if the thread was scheduled.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_FILE)
+    media = _check_account_and_media(account, media)
+    if media is None:
+        return False
+
+    conn = get_connection()
     cursor = conn.cursor()
 
     # Parse the natural language date/time into a standard format
-    parsed_time = dateparser.parse(scheduled_time)
+    parsed_time = parse_time(scheduled_time)
     if not parsed_time:
         print("Error: Unable to parse the scheduled time.")
-        return
+        return False
+
+    timestamp = int(parsed_time.timestamp())
+    if check_duplicate(post, account, timestamp, duplicate_window, allow_duplicate):
+        return False
 
     try:
         tweets_json = json.dumps(post)
 
         cursor.execute("""
-            INSERT INTO scheduled_tweets (post, scheduled_time, created_at) 
-            VALUES (?, ?, ?)
+            INSERT INTO scheduled_tweets (post, scheduled_time, created_at, account, content_hash) 
+            VALUES (?, ?, ?, ?, ?)
         """, (
             tweets_json,
-            parsed_time.strftime("%Y-%m-%d %H:%M:%S"),
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp,
+            int(time.time()),
+            account,
+            content_hash(post)
         ))
+        cursor.executemany("""
+            INSERT INTO scheduled_media (scheduled_id, position, path)
+            VALUES (?, ?, ?)
+        """, [(cursor.lastrowid, position, path) for position, path in enumerate(media)])
         conn.commit()
         print("Tweet scheduled successfully!")
+        return True
     except Exception as e:
+        conn.rollback()
         print("Error adding tweet to database:", e)
+        return False
+
+@traced("db.add_posted")
+def add_posted(post, account=DEFAULT_ACCOUNT):
+    """
+    Record a thread that `xp post` sent right away, as posted now, so that
+    posting or scheduling it again is caught as a duplicate.
+
+    Args:
+        post (list[str]): The tweets of the thread.
+        account (str): The account that posted it.
+
+    Returns:
+        int: The ID of the new row, for record_segment().
+    """
+    now = int(time.time())
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("""
+            INSERT INTO scheduled_tweets (post, scheduled_time, created_at, status, account, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (json.dumps(post), now, now, Status.POSTED, account, content_hash(post)))
+    return cursor.lastrowid
+
+def add_series(post, rule, start_time=None, account=DEFAULT_ACCOUNT, media=None):
+    """
+    Add a recurring thread, posted at every occurrence of a cron rule or RRULE.
+
+    Only the series and its next occurrence are stored; `xp run` adds one
+    scheduled_tweets row when an occurrence is due and then moves the series on
+    to the one after.
+
+    Args:
+        post (list[str]): The tweets of the thread.
+        rule (str): A cron expression such as "0 9 * * 1-5", or an RRULE such as
+            "FREQ=WEEKLY;BYDAY=MO".
+        start_time (str, optional): When the series starts (in natural language). Now if omitted.
+        account (str): The account to post from.
+        media (list[str], optional): Image or video files to attach to the first tweet.
+
+    Returns:
+        bool: True if the series was scheduled.
+    """
+    from recurrence import next_occurrence
+
+    media = _check_account_and_media(account, media)
+    if media is None:
+        return False
+
+    now = int(time.time())
+    start = now
+    if start_time:
+        parsed_time = parse_time(start_time)
+        if not parsed_time:
+            print("Error: Unable to parse the scheduled time.")
+            return False
+        start = int(parsed_time.timestamp())
+
+    try:
+        next_time = next_occurrence(rule, start, max(start, now) - 1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+    if next_time is None:
+        print("Error: The rule has no occurrences after the start time.")
+        return False
+
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO recurring_tweets (account, post, media, rule, start_time, next_time, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (account, json.dumps(post), json.dumps(media) if media else None, rule, start, next_time, now))
+    print(f"Recurring thread scheduled; first post at {format_timestamp(next_time)}")
+    return True
+
+def next_series_time():
+    """Return the UTC epoch timestamp of the earliest next occurrence of any active series, or None."""
+    # The MIN is a single seek into idx_recurring_tweets_status_next
+    return get_connection().execute("""
+        SELECT MIN(next_time) FROM recurring_tweets WHERE status = ?
+    """, (Status.PENDING,)).fetchone()[0]
+
+@traced("db.fire_recurring")
+def fire_recurring(now):
+    """
+    Schedule the due occurrence of every active series and advance it to the next.
+
+    Each due series gets one scheduled_tweets row, which `xp run` then posts like
+    any other. A series that fell behind, e.g. while no daemon was running, posts
+    its earliest missed occurrence once and skips the rest instead of catching
+    up with a burst. Occurrences get no content hash: a series repeats its text
+    on purpose, so the duplicate check does not hold one occurrence against the
+    last. Everything happens in one transaction, so several `xp run` processes
+    sharing the database never fire an occurrence twice.
+
+    Args:
+        now (float): The current UTC epoch timestamp.
+
+    Returns:
+        int: The number of occurrences scheduled.
+    """
+    from recurrence import next_occurrence
+
+    conn = get_connection()
+    created_at = int(now)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        due = conn.execute("""
+            SELECT id, account, post, media, rule, start_time, next_time
+            FROM recurring_tweets
+            WHERE status = ? AND next_time <= ?
+        """, (Status.PENDING, now)).fetchall()
+
+        for series_id, account, post, media, rule, start_time, due_time in due:
+            cursor = conn.execute("""
+                INSERT INTO scheduled_tweets (post, scheduled_time, created_at, account, series_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, (post, due_time, created_at, account, series_id))
+            conn.executemany("""
+                INSERT INTO scheduled_media (scheduled_id, position, path)
+                VALUES (?, ?, ?)
+            """, [(cursor.lastrowid, position, path) for position, path in enumerate(json.loads(media or '[]'))])
+
+            next_time = next_occurrence(rule, start_time, max(due_time, now))
+            conn.execute("""
+                UPDATE recurring_tweets
+                SET next_time = ?, status = ?
+                WHERE id = ?
+            """, (next_time, Status.PENDING if next_time else Status.POSTED, series_id))
+    return len(due)
+
+def list_series(output_format='table', account=None):
+    """
+    List the active recurring series with their next occurrence.
+
+    Args:
+        output_format (str): 'table' for people, 'json' or 'ndjson' for tools.
+        account (str): Only list series posted from this account.
+    """
+    query = """
+        SELECT id, account, post, rule, next_time FROM recurring_tweets
+        WHERE status = ?
+    """
+    params = [Status.PENDING]
+    if account:
+        query += " AND account = ?"
+        params.append(account)
+    rows = get_connection().execute(query + " ORDER BY next_time", params)
+
+    if output_format in ('json', 'ndjson'):
+        records = [
+            {
+                'id': series_id,
+                'account': series_account,
+                'rule': rule,
+                'next_time': datetime.fromtimestamp(next_time).astimezone().isoformat(),
+                'tweets': _decode_post(post),
+            }
+            for series_id, series_account, post, rule, next_time in rows
+        ]
+        if output_format == 'json':
+            print(json.dumps(records))
+        else:
+            for record in records:
+                print(json.dumps(record))
+        return
+
+    print("\n=== Recurring Tweets ===\n")
+    found = False
+    for series_id, series_account, post, rule, next_time in rows:
+        found = True
+        print(f"ID: {series_id}")
+        print(f"Account: {series_account}")
+        print(f"Post: {post}")
+        print(f"Rule: {rule}")
+        print(f"Next Time: {format_timestamp(next_time)}")
+        print("-" * 40)
+    if not found:
+        print("No recurring tweets found.")
+
+def _selection(ids=None, statuses=(), since=None, until=None, match=None, account=None, time_column='scheduled_time'):
+    """
+    Build the WHERE clause that selects the rows of a set-based command.
+
+    Args:
+        ids (list[tuple]): Inclusive (first, last) ID ranges; a row matches any of them.
+        statuses (list[Status]): A row matches any of these statuses.
+        since (int): Only rows at or after this UTC epoch timestamp.
+        until (int): Only rows before this UTC epoch timestamp.
+        match (str): Only rows whose tweets contain this text (case-insensitive for ASCII).
+        account (str): Only rows posted from this account.
+        time_column (str): The column the time window applies to.
+
+    Returns:
+        tuple: (SQL condition, parameters)
+    """
+    clauses = []
+    params = []
+    if ids:
+        clauses.append("(" + " OR ".join("id BETWEEN ? AND ?" for _ in ids) + ")")
+        params.extend(bound for id_range in ids for bound in id_range)
+    if statuses:
+        clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if since is not None:
+        clauses.append(f"{time_column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{time_column} < ?")
+        params.append(until)
+    if match:
+        # Posts are stored as JSON, so escape the text the same way before matching it
+        needle = json.dumps(match)[1:-1]
+        needle = needle.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+        clauses.append("post LIKE ? ESCAPE '!'")
+        params.append(f"%{needle}%")
+    if account:
+        clauses.append("account = ?")
+        params.append(account)
+    return " AND ".join(clauses) or "1", params
+
+@traced("db.cancel_tweets")
+def cancel_tweets(ids=None, status='pending', since=None, until=None, match=None, account=None):
+    """
+    Cancel every scheduled thread that matches the filters, in one UPDATE.
+
+    Threads that a running `xp run` is posting right now are left alone.
+
+    Args:
+        ids (list[tuple]): Inclusive (first, last) ID ranges.
+        status (str): Only threads with this status, e.g. 'pending'.
+        since (str): Only threads scheduled at or after this time (in natural language).
+        until (str): Only threads scheduled before this time (in natural language).
+        match (str): Only threads whose tweets contain this text.
+        account (str): Only threads posted from this account.
+
+    Returns:
+        int: The number of threads cancelled, or None if a filter was invalid.
+    """
+    bounds = _parse_bounds(since, until)
+    if bounds is None:
+        return None
+
+    where, params = _selection(ids, [Status.parse(status)], match=match, account=account, **bounds)
+    conn = get_connection()
+    with conn:
+        cancelled = conn.execute(f"""
+            UPDATE scheduled_tweets
+            SET status = ?
+            WHERE {where}
+            AND (claimed_by IS NULL OR lease_until <= ?)
+        """, (Status.CANCELLED, *params, int(time.time()))).rowcount
+        if cancelled:
+            _bump_queue_revision(conn)
+
+    if cancelled:
+        print(f"Cancelled {cancelled} scheduled thread{'s' if cancelled != 1 else ''}.")
+    else:
+        print("No matching tweets.")
+    return cancelled
+
+@traced("db.reschedule_tweets")
+def reschedule_tweets(
+    shift=None, new_time=None, ids=None, status='pending', since=None, until=None, match=None,
+    account=None
+):
+    """
+    Move every scheduled thread that matches the filters, in one UPDATE.
+
+    Rescheduled threads become pending again, so cancelled or duplicate threads
+    can be brought back. Posted threads are never touched, and neither are
+    threads that a running `xp run` is posting right now.
+
+    Args:
+        shift (float, optional): Seconds to move each thread by; negative moves it earlier.
+        new_time (str, optional): Move every thread to this time (in natural language) instead.
+        ids (list[tuple]): Inclusive (first, last) ID ranges.
+        status (str): Only threads with this status, e.g. 'pending'.
+        since (str): Only threads scheduled at or after this time (in natural language).
+        until (str): Only threads scheduled before this time (in natural language).
+        match (str): Only threads whose tweets contain this text.
+        account (str): Only threads posted from this account.
+
+    Returns:
+        int: The number of threads moved, or None if an argument was invalid.
+    """
+    bounds = _parse_bounds(since, until)
+    if bounds is None:
+        return None
+
+    if new_time is not None:
+        parsed_time = parse_time(new_time)
+        if not parsed_time:
+            print("Error: Unable to parse the scheduled time.")
+            return None
+        moved_to = "scheduled_time = ?"
+        target = int(parsed_time.timestamp())
+    else:
+        moved_to = "scheduled_time = scheduled_time + ?"
+        target = int(shift)
+
+    statuses = [Status.parse(status)]
+    if Status.POSTED in statuses:
+        print("Error: Posted threads cannot be rescheduled.")
+        return None
+
+    where, params = _selection(ids, statuses, match=match, account=account, **bounds)
+    conn = get_connection()
+    with conn:
+        moved = conn.execute(f"""
+            UPDATE scheduled_tweets
+            SET {moved_to}, status = ?, claimed_by = NULL, lease_until = NULL
+            WHERE {where}
+            AND (claimed_by IS NULL OR lease_until <= ?)
+        """, (target, Status.PENDING, *params, int(time.time()))).rowcount
+        if moved:
+            _bump_queue_revision(conn)
+
+    if moved:
+        print(f"Rescheduled {moved} thread{'s' if moved != 1 else ''}.")
+    else:
+        print("No matching tweets.")
+    return moved
+
+def cancel_series(ids=None, since=None, until=None, match=None, account=None):
+    """
+    Stop the active recurring series that match the filters, in one UPDATE.
+    Occurrences already scheduled stay pending.
+
+    Args:
+        ids (list[tuple]): Inclusive (first, last) ID ranges, as shown by `xp list --recurring`.
+        since (str): Only series whose next occurrence is at or after this time.
+        until (str): Only series whose next occurrence is before this time.
+        match (str): Only series whose tweets contain this text.
+        account (str): Only series posted from this account.
+
+    Returns:
+        int: The number of series cancelled, or None if a filter was invalid.
+    """
+    bounds = _parse_bounds(since, until)
+    if bounds is None:
+        return None
+
+    where, params = _selection(
+        ids, [Status.PENDING], match=match, account=account, time_column='next_time', **bounds
+    )
+    conn = get_connection()
+    with conn:
+        cancelled = conn.execute(f"""
+            UPDATE recurring_tweets
+            SET status = ?, next_time = NULL
+            WHERE {where}
+        """, (Status.CANCELLED, *params)).rowcount
+
+    if cancelled:
+        print(f"Cancelled {cancelled} recurring series.")
+    else:
+        print("No matching recurring series.")
+    return cancelled
+
+def _compress_post(post):
+    """Compress a post for the archive, if that makes it smaller."""
+    encoded = post.encode('utf-8')
+    compressed = zlib.compress(encoded, 9)
+    # Compare bytes with bytes; a non-ASCII post is longer encoded than as str
+    return compressed if len(compressed) < len(encoded) else post
+
+@traced("db.archive_finished")
+def archive_finished(older_than_days=ARCHIVE_AFTER_DAYS, compress=False, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move finished threads (posted, cancelled or duplicate) scheduled before the
+    retention window into archived_tweets, together with the IDs of their posted
+    tweets.
+
+    Rows are moved in batches of `batch_size`, each in its own short transaction,
+    so `xp run` and other commands can write in between.
+
+    Args:
+        older_than_days (float): Keep finished threads scheduled within this many days.
+        compress (bool): Store the archived posts zlib-compressed.
+        batch_size (int): Rows moved per transaction.
+
+    Returns:
+        int: The number of threads archived.
+    """
+    cutoff = int(time.time() - older_than_days * 86400)
+    conn = get_connection()
+    conn.create_function("compress_post", 1, _compress_post, deterministic=True)
+
+    archived = 0
+    while True:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Uses idx_scheduled_tweets_status_time, one range per finished status
+            ids = [row[0] for row in conn.execute("""
+                SELECT id FROM scheduled_tweets
+                WHERE status IN (?, ?, ?) AND scheduled_time < ?
+                LIMIT ?
+            """, (Status.POSTED, Status.CANCELLED, Status.DUPLICATE, cutoff, batch_size))]
+            if not ids:
+                break
+
+            placeholders = ", ".join("?" * len(ids))
+            conn.execute(f"""
+                INSERT INTO archived_tweets (
+                    id, account, post, scheduled_time, status, created_at, tweet_ids, archived_at
+                )
+                SELECT
+                    id,
+                    account,
+                    {"compress_post(post)" if compress else "post"},
+                    scheduled_time,
+                    status,
+                    created_at,
+                    (
+                        SELECT json_group_array(tweet_id) FROM (
+                            SELECT tweet_id FROM thread_segments
+                            WHERE scheduled_id = scheduled_tweets.id
+                            ORDER BY position
+                        )
+                    ),
+                    ?
+                FROM scheduled_tweets
+                WHERE id IN ({placeholders})
+            """, (int(time.time()), *ids))
+            for table, column in (
+                ("thread_segments", "scheduled_id"),
+                ("scheduled_media", "scheduled_id"),
+                ("scheduled_tweets", "id"),
+            ):
+                conn.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", ids)
+        archived += len(ids)
+    return archived
+
+@traced("db.vacuum_db")
+def vacuum_db(older_than_days=ARCHIVE_AFTER_DAYS, compress=False, full=False):
+    """
+    Archive finished threads, then give the freed space back to the file system.
+
+    By default free pages are released a few at a time with incremental vacuum,
+    which never blocks `xp run` for long. A full VACUUM rewrites the whole file and
+    blocks other writers while it runs, but is needed once to enable incremental
+    vacuum on a database created by an older version of xp.
+
+    Args:
+        older_than_days (float): Keep finished threads scheduled within this many days.
+        compress (bool): Store the archived posts zlib-compressed.
+        full (bool): Rebuild the database with VACUUM instead.
+    """
+    archived = archive_finished(older_than_days, compress)
+    print(f"Archived {archived} finished thread{'s' if archived != 1 else ''}.")
+
+    conn = get_connection()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    before = conn.execute("PRAGMA page_count").fetchone()[0]
+
+    if full:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    elif conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        print("Incremental vacuum is not enabled for this database; run `xp vacuum --full` once.")
+        return
+    else:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Each step of the statement frees one page; the sqlite3 module steps it once per call
+                for _ in range(VACUUM_STEP_PAGES):
+                    conn.execute("PRAGMA incremental_vacuum(1)")
+
+    # Fold the WAL back into the file without waiting for readers
+    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    freed = max(before - conn.execute("PRAGMA page_count").fetchone()[0], 0)
+    print(f"Freed {freed * page_size / 1024 / 1024:.1f} MiB.")
+
+# Number of rows parsed and inserted together by import_tweets
+IMPORT_BATCH_SIZE = 1000
+
+# What an import file's undecodable bytes are read as
+_REPLACEMENT = '\ufffd'
+
+def read_import_rows(f, file_format):
+    """
+    Stream (line_number, time, tweets, account) rows from a CSV or JSONL schedule file.
+
+    CSV rows hold the time in the first column and the thread's tweets in the
+    remaining columns; an optional header row starting with "time" is skipped.
+    JSONL rows are objects with a "time" string and a "tweets" list (or a single
+    "post" string), plus an optional "account". Rows that cannot be decoded,
+    including rows that are not valid UTF-8, are yielded with tweets set to an
+    error message string instead of a list.
+
+    Args:
+        f (file): The open input file.
+        file_format (str): Either 'csv' or 'jsonl'.
+
+    Yields:
+        tuple: (line_number, time, tweets, account or None)
+    """
+    if file_format == 'csv':
+        reader = csv.reader(f)
+        for row in reader:
+            line = reader.line_num
+            if not row or (line == 1 and row[0].strip().lower() == 'time'):
+                continue
+            if any(_REPLACEMENT in cell for cell in row):
+                yield line, '', "invalid UTF-8", None
+                continue
+            yield line, row[0].strip(), [cell.strip() for cell in row[1:] if cell.strip()], None
+        return
+
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        if _REPLACEMENT in text:
+            yield line, '', "invalid UTF-8", None
+            continue
+        try:
+            record = json.loads(text)
+            tweets = record.get('tweets', record.get('post'))
+            if isinstance(tweets, str):
+                tweets = [tweets]
+            yield line, str(record.get('time') or ''), tweets, record.get('account')
+        except (json.JSONDecodeError, AttributeError) as e:
+            yield line, '', f"invalid JSON: {e}", None
+
+def parse_times(values):
+    """
+    Parse a batch of natural language times, parsing each distinct string once.
+
+    Args:
+        values (iterable[str]): The times to parse.
+
+    Returns:
+        dict: Maps each distinct input string to a datetime, or None if it could not be parsed.
+    """
+    # Resolve relative times in the batch against the same instant
+    now = datetime.now()
+    return {value: parse_time(value, now) for value in set(values)}
+
+def _auto_thread(rows):
+    """Re-split the tweets of each import row into tweets that fit."""
+    from textlength import split_text
+
+    for line, scheduled_time, tweets, account in rows:
+        if isinstance(tweets, list) and all(isinstance(tweet, str) for tweet in tweets):
+            tweets = list(split_text("\n\n".join(tweets)))
+        yield line, scheduled_time, tweets, account
+
+def _insert_batch(cursor, batch, created_at, default_account, duplicate_window, allow_duplicate):
+    """Insert the valid rows of one import batch and report the invalid ones."""
+    from textlength import MAX_WEIGHTED_LENGTH, too_long
+
+    parsed = parse_times(row[1] for row in batch)
+    rows = []
+    failed = 0
+    # (account, hash) -> times of the rows accepted so far in this batch, which
+    # find_duplicate() cannot see until they are inserted
+    accepted = {}
+
+    for line, scheduled_time, tweets, account in batch:
+        account = account or default_account
+        if isinstance(tweets, str):
+            error = tweets
+        elif not tweets or not all(isinstance(tweet, str) and tweet for tweet in tweets):
+            error = "no tweets"
+        elif too_long(tweets):
+            number, length = too_long(tweets)[0]
+            error = f"tweet {number} is {length}/{MAX_WEIGHTED_LENGTH} characters"
+        elif parsed[scheduled_time] is None:
+            error = f"unable to parse time {scheduled_time!r}"
+        elif not isinstance(account, str) or not ACCOUNT_NAME.fullmatch(account):
+            error = f"invalid account {account!r}"
+        else:
+            timestamp = int(parsed[scheduled_time].timestamp())
+            digest = content_hash(tweets)
+            earlier = accepted.setdefault((account, digest), [])
+            duplicate_id = find_duplicate(account, digest, timestamp, duplicate_window)
+            if duplicate_id is not None:
+                duplicate = f"scheduled thread {duplicate_id}"
+            elif any(abs(timestamp - other) <= duplicate_window * 3600 for other in earlier):
+                duplicate = "an earlier row"
+            else:
+                duplicate = None
+
+            if duplicate and not allow_duplicate:
+                error = f"same first tweet as {duplicate}"
+            else:
+                if duplicate:
+                    print(f"Line {line}: warning: same first tweet as {duplicate}", file=sys.stderr)
+                earlier.append(timestamp)
+                rows.append((json.dumps(tweets), timestamp, created_at, account, digest))
+                continue
+
+        print(f"Line {line}: {error}", file=sys.stderr)
+        failed += 1
+
+    cursor.executemany("""
+        INSERT INTO scheduled_tweets (post, scheduled_time, created_at, account, content_hash) 
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+    return len(rows), failed
+
+@traced("db.import_tweets")
+def import_tweets(
+    path, file_format=None, account=DEFAULT_ACCOUNT, auto_thread=False,
+    duplicate_window=DUPLICATE_WINDOW_HOURS, allow_duplicate=False
+):
+    """
+    Bulk schedule threads from a CSV or JSONL file in a single transaction.
+
+    The file is streamed in batches of IMPORT_BATCH_SIZE rows, so memory use does
+    not grow with the size of the input. Invalid rows are reported and skipped
+    without aborting the rest of the import.
+
+    Args:
+        path (str): The file to import, or '-' to read from stdin.
+        file_format (str, optional): 'csv' or 'jsonl'. Guessed from the file extension if omitted.
+        account (str): The account for rows that do not name one.
+        auto_thread (bool): Split each row's text into tweets that fit, instead of
+            skipping rows with over-length tweets.
+        duplicate_window (float): Hours either side in which the same first tweet is a duplicate.
+        allow_duplicate (bool): Import duplicate rows with a warning instead of skipping them.
+
+    Returns:
+        tuple: (number of rows imported, number of rows skipped)
+    """
+    if not file_format:
+        file_format = 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    created_at = int(time.time())
+    imported = failed = 0
+
+    # Undecodable bytes become U+FFFD, so the rows holding them are reported and
+    # skipped instead of aborting the import
+    if path == '-':
+        sys.stdin.reconfigure(encoding='utf-8', errors='replace', newline='')
+        f = sys.stdin
+    else:
+        f = open(path, 'r', encoding='utf-8', errors='replace', newline='')
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        batch = []
+        rows = read_import_rows(f, file_format)
+        for row in _auto_thread(rows) if auto_thread else rows:
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                counts = _insert_batch(
+                    cursor, batch, created_at, account, duplicate_window, allow_duplicate
+                )
+                imported, failed = imported + counts[0], failed + counts[1]
+                batch = []
+        if batch:
+            counts = _insert_batch(cursor, batch, created_at, account, duplicate_window, allow_duplicate)
+            imported, failed = imported + counts[0], failed + counts[1]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        if f is not sys.stdin:
+            f.close()
 
+    print(f"Imported {imported} scheduled threads ({failed} rows skipped)")
+    return imported, failed
@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import time
+
+from db import Status, fire_recurring, get_connection, next_series_time, queue_revision
+from metrics import DB_QUERY_SECONDS, DUE_QUEUE_SIZE, PENDING_POSTS
+
+# How often the dispatcher checks whether another process changed the table.
+WATCH_INTERVAL = 1.0
+
+# How long a row that is still pending after a dispatch waits before retrying.
+RETRY_DELAY = 60.0
+
+# How many seconds before the next post is due the warm-up job runs.
+WARM_LEAD = 5.0
+
+# Most row IDs looked up in one query when re-queueing dispatched rows.
+REQUEUE_BATCH = 500
+
+class Dispatcher:
+    """
+    Sleep until the next pending post is due, then hand off to a posting job.
+
+    Pending rows are kept in an in-memory min-heap of (due_time, id), updated
+    incrementally. When `PRAGMA data_version` reports that another connection
+    committed (e.g. `xp schedule`), only rows with an ID above the highest one
+    seen are read. Edits to known rows (`xp cancel`, `xp reschedule`) bump the
+    queue revision, and only then is the heap rebuilt from every pending row.
+    After a dispatch, only the dispatched rows are looked up again. An idle
+    daemon costs one pragma per WATCH_INTERVAL, and scheduling a post costs
+    the new rows, not the whole queue.
+
+    Rows posted by another `xp run` can leave stale entries behind. They are
+    harmless: the job only posts rows it can claim, and re-queueing drops rows
+    that are no longer pending.
+
+    Recurring series are not in the heap. Only the earliest next occurrence of
+    any series is tracked; when it is due, fire_recurring() turns the due
+    occurrences into pending rows and moves each series on to its next one.
+
+    Since the dispatcher knows when the next post is due, it can also start a
+    warm-up job, e.g. opening connections, `warm_lead` seconds beforehand.
+    """
+
+    def __init__(
+        self, job, watch_interval=WATCH_INTERVAL, retry_delay=RETRY_DELAY, warm=None, warm_lead=WARM_LEAD
+    ):
+        """
+        Args:
+            job (callable): Coroutine function awaited with no arguments when at least
+                one post is due. It may return a dict mapping row IDs to the time to
+                retry them, overriding retry_delay for those rows.
+            watch_interval (float): Seconds between data_version checks.
+            retry_delay (float): Seconds before re-dispatching a row that is still pending.
+            warm (callable, optional): Coroutine function started in the background
+                with the due time of the next post, `warm_lead` seconds before it.
+            warm_lead (float): Seconds before a due time to start `warm`.
+        """
+        self.job = job
+        self.watch_interval = watch_interval
+        self.retry_delay = retry_delay
+        self.warm = warm
+        self.warm_lead = warm_lead
+        self.warmed_for = None
+        self.warming = None
+        self.heap = []
+        self.next_series = None
+        self.deferred = {}
+        self.data_version = None
+        self.revision = None
+        # Highest scheduled_tweets ID read so far; later rows are new
+        self.last_id = 0
+        self.conn = get_connection()
+
+    def changed(self):
+        """Return True if the database was modified by another connection."""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.data_version = version
+            return True
+        return False
+
+    def refresh(self):
+        """Bring the heap up to date after another connection changed the database."""
+        with DB_QUERY_SECONDS.time(query="queue_revision"):
+            revision = queue_revision()
+        if revision != self.revision:
+            self.revision = revision
+            self.reload()
+        else:
+            self.load_new()
+            with DB_QUERY_SECONDS.time(query="next_series"):
+                self.next_series = next_series_time()
+
+    def push(self, row_id, due):
+        """Add a pending row to the heap, at its deferred time if it has one."""
+        heapq.heappush(self.heap, (max(due, self.deferred.get(row_id, 0)), row_id))
+
+    def load_new(self):
+        """Add the pending rows inserted since the last read to the heap."""
+        # A range scan of the primary key from the highest ID seen
+        with DB_QUERY_SECONDS.time(query="load_new"):
+            rows = self.conn.execute("""
+                SELECT id, scheduled_time, status
+                FROM scheduled_tweets
+                WHERE id > ?
+                ORDER BY id
+            """, (self.last_id,)).fetchall()
+        for row_id, due, status in rows:
+            if status == Status.PENDING:
+                self.push(row_id, due)
+        if rows:
+            self.last_id = rows[-1][0]
+        PENDING_POSTS.set(len(self.heap))
+
+    def requeue(self, row_ids):
+        """Put the dispatched rows that are still pending back on the heap."""
+        pending = {}
+        with DB_QUERY_SECONDS.time(query="requeue"):
+            for start in range(0, len(row_ids), REQUEUE_BATCH):
+                batch = row_ids[start:start + REQUEUE_BATCH]
+                pending.update(self.conn.execute(f"""
+                    SELECT id, scheduled_time
+                    FROM scheduled_tweets
+                    WHERE id IN ({", ".join("?" * len(batch))}) AND status = ?
+                """, (*batch, Status.PENDING)))
+
+        for row_id in row_ids:
+            if row_id in pending:
+                self.push(row_id, pending[row_id])
+            else:
+                # Posted or cancelled meanwhile
+                self.deferred.pop(row_id, None)
+        PENDING_POSTS.set(len(self.heap))
+
+    def reload(self):
+        """Rebuild the heap from every pending row in the database."""
+        # Served entirely by the (status, scheduled_time) index; the highest ID
+        # comes from the same statement, so no row inserted meanwhile is missed
+        with DB_QUERY_SECONDS.time(query="reload"):
+            rows = self.conn.execute("""
+                SELECT id, scheduled_time
+                FROM scheduled_tweets
+                WHERE status = ?
+                UNION ALL
+                SELECT MAX(id), NULL FROM scheduled_tweets
+            """, (Status.PENDING,)).fetchall()
+        *rows, (last_id, _) = rows
+        self.last_id = last_id or 0
+        pending = dict(rows)
+
+        # Forget deferrals for rows that were posted or cancelled meanwhile
+        self.deferred = {
+            row_id: retry_at for row_id, retry_at in self.deferred.items() if row_id in pending
+        }
+        self.heap = [
+            (max(due, self.deferred.get(row_id, 0)), row_id) for row_id, due in pending.items()
+        ]
+        heapq.heapify(self.heap)
+        PENDING_POSTS.set(len(self.heap))
+
+        with DB_QUERY_SECONDS.time(query="next_series"):
+            self.next_series = next_series_time()
+
+    def next_due(self):
+        """Return the timestamp of the earliest pending post or series occurrence, or None."""
+        times = [self.heap[0][0]] if self.heap else []
+        if self.next_series is not None:
+            times.append(self.next_series)
+        return min(times) if times else None
+
+    def fire_series(self, now):
+        """Schedule the series occurrences that are due and add them to the heap."""
+        if self.next_series is None or self.next_series > now:
+            return
+        with DB_QUERY_SECONDS.time(query="fire_recurring"):
+            fire_recurring(now)
+        self.load_new()
+        with DB_QUERY_SECONDS.time(query="next_series"):
+            self.next_series = next_series_time()
+
+    def pop_due(self, now):
+        """Remove and return the IDs of every post due at or before `now`."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[1])
+        return due
+
+    async def dispatch(self, now):
+        """Run the job for the posts that are due and defer any that stay pending."""
+        due = self.pop_due(now)
+        DUE_QUEUE_SIZE.set(len(due))
+        if not due:
+            return
+
+        retry_times = await self.job() or {}
+
+        # Anything the job could not post comes back after retry_delay, or at the
+        # time the job asked for. The job writes through the same connection, which
+        # does not bump data_version, so look the dispatched rows up again here.
+        retry_at = time.time() + self.retry_delay
+        for row_id in due:
+            self.deferred[row_id] = retry_at
+        self.deferred.update(retry_times)
+        self.requeue(due)
+
+    def start_warming(self, due):
+        """Run the warm-up job for the posts due at `due`, unless it is already running."""
+        self.warmed_for = due
+        if self.warming is None or self.warming.done():
+            self.warming = asyncio.create_task(self.warm(due))
+
+    async def run(self):
+        """Dispatch posts until cancelled."""
+        while True:
+            if self.changed():
+                self.refresh()
+
+            now = time.time()
+            self.fire_series(now)
+            await self.dispatch(now)
+
+            timeout = self.watch_interval
+            next_due = self.next_due()
+            if next_due is not None:
+                now = time.time()
+                wake_at = next_due
+                # Nothing to warm up for posts that are already due
+                if self.warm and next_due != self.warmed_for and next_due > now:
+                    if now >= next_due - self.warm_lead:
+                        self.start_warming(next_due)
+                    else:
+                        wake_at = next_due - self.warm_lead
+                timeout = min(timeout, max(wake_at - now, 0))
+
+            await asyncio.sleep(timeout)
@@ -1,11 +1,107 @@
 import argparse
 import sys
-import schedule
-import time
-from pathlib import Path
 
-from api import post_pending_tweets, create_api, retrieve_timeline
-from db import add_tweet, get_scheduled_tweets
+from db import ARCHIVE_AFTER_DAYS, DUPLICATE_WINDOW_HOURS, STATUS_NAMES
+from setup import DEFAULT_CONCURRENCY, DEFAULT_ACCOUNT
+
+def add_auto_thread_argument(parser):
+    """Add the --auto-thread option shared by the commands that take tweet text."""
+    parser.add_argument(
+        '--auto-thread',
+        action='store_true',
+        help='Split long text into a thread of tweets that each fit the length limit'
+    )
+
+def add_archive_after_argument(parser, help):
+    """Add the --archive-after option shared by the commands that archive finished threads."""
+    parser.add_argument(
+        '--archive-after',
+        type=float,
+        default=ARCHIVE_AFTER_DAYS,
+        metavar='DAYS',
+        help=help
+    )
+
+def add_duplicate_arguments(parser, allow=True):
+    """Add the duplicate detection options shared by the commands that post or schedule."""
+    parser.add_argument(
+        '--duplicate-window',
+        type=float,
+        default=DUPLICATE_WINDOW_HOURS,
+        metavar='HOURS',
+        help='Threads starting with the same tweet this many hours apart are duplicates (default: %(default)s)'
+    )
+    if allow:
+        parser.add_argument(
+            '--allow-duplicate',
+            action='store_true',
+            help='Warn about a duplicate first tweet instead of refusing it'
+        )
+
+def add_account_argument(parser, help='Account to post from (default: %(default)s)'):
+    """Add the --account option shared by the commands that work per account."""
+    parser.add_argument(
+        '--account', '-a',
+        default=DEFAULT_ACCOUNT,
+        help=help
+    )
+
+def id_ranges(text):
+    """Parse thread IDs such as "7", "10-20" or "3,5,9-12" into inclusive (first, last) ranges."""
+    ranges = []
+    for part in text.split(','):
+        first, dash, last = part.strip().partition('-')
+        try:
+            first = int(first)
+            last = int(last) if dash else first
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid ID or ID range: {part.strip()!r}")
+        if last < first:
+            raise argparse.ArgumentTypeError(f"ID range {part.strip()!r} ends before it starts")
+        ranges.append((first, last))
+    return ranges
+
+def shift(text):
+    """Parse a --shift duration for argparse into seconds."""
+    from timeparse import parse_shift
+
+    delta = parse_shift(text)
+    if delta is None:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    return delta.total_seconds()
+
+def add_selection_arguments(parser, verb):
+    """Add the ID and filter arguments shared by the set-based commands."""
+    parser.add_argument(
+        'ids',
+        nargs='*',
+        type=id_ranges,
+        metavar='ID',
+        help=f'IDs or ranges of the threads to {verb}, e.g. 7, 10-20 or 3,5,9-12'
+    )
+    parser.add_argument(
+        '--status', '-s',
+        choices=[name for name in STATUS_NAMES if name != 'posted'],
+        default='pending',
+        help='Only threads with this status (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--since',
+        help='Only threads scheduled at or after this time'
+    )
+    parser.add_argument(
+        '--until',
+        help='Only threads scheduled before this time'
+    )
+    parser.add_argument(
+        '--match',
+        metavar='TEXT',
+        help='Only threads whose tweets contain this text'
+    )
+    parser.add_argument(
+        '--account', '-a',
+        help='Only threads posted from this account'
+    )
 
 def create_parser() -> argparse.ArgumentParser:
     """
@@ -14,6 +110,12 @@ def create_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Tweet Scheduler CLI: Schedule and manage your tweets effortlessly."
     )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the command: write a cProfile report, an import-time breakdown '
+             'and its trace spans to ~/.tweet/profiles/ and print a summary'
+    )
     subparsers = parser.add_subparsers(dest='command', help='Commands')
     
     # Post command for immediate posting
@@ -37,6 +139,9 @@ def create_parser() -> argparse.ArgumentParser:
         nargs='*',
         help='Tweet messages (optional if piping or using --file)'
     )
+    add_auto_thread_argument(post_parser)
+    add_duplicate_arguments(post_parser)
+    add_account_argument(post_parser)
 
     # Schedule command
     schedule_parser = subparsers.add_parser(
@@ -45,19 +150,26 @@ def create_parser() -> argparse.ArgumentParser:
     )
     schedule_parser.add_argument(
         'tweets',
-        nargs='+',
+        nargs='*',
         help='Tweet messages (optional if piping or using --file)'
     )
     schedule_parser.add_argument(
         '--time', '-t',
-        required=True,
         help=(
-            'When to post the thread. Supports:\n'
+            'When to post the thread, or when a --repeat series starts. Supports:\n'
             '- Standard format: "YYYY-MM-DD HH:MM:SS"\n'
             '- Natural language: "next friday at 3pm", "tomorrow at noon",\n'
             '  "in 2 hours", "November 1st at 3:30pm", etc.'
         )
     )
+    schedule_parser.add_argument(
+        '--repeat', '-r',
+        metavar='RULE',
+        help=(
+            'Post the thread repeatedly: a cron expression such as "0 9 * * 1-5" '
+            'or @daily, or an RRULE such as "FREQ=WEEKLY;BYDAY=MO;COUNT=10"'
+        )
+    )
     schedule_parser.add_argument(
         '--file', '-f',
         help='Read tweets from file (one tweet per line)'
@@ -67,12 +179,45 @@ def create_parser() -> argparse.ArgumentParser:
         action='store_true',
         help='Preview thread before scheduling'
     )
+    schedule_parser.add_argument(
+        '--media', '-m',
+        nargs='+',
+        metavar='FILE',
+        help='Images or a video to attach to the first tweet (up to 4 files)'
+    )
+    add_auto_thread_argument(schedule_parser)
+    add_duplicate_arguments(schedule_parser)
+    add_account_argument(schedule_parser)
     
+    # Import command
+    import_parser = subparsers.add_parser(
+        'import',
+        help='Schedule many threads at once from a CSV or JSONL file'
+    )
+    import_parser.add_argument(
+        'file',
+        help=(
+            'File to import, or "-" for stdin. CSV rows are: time,tweet[,tweet...]. '
+            'JSONL rows are: {"time": "...", "tweets": ["...", "..."]}'
+        )
+    )
+    import_parser.add_argument(
+        '--format',
+        choices=['csv', 'jsonl'],
+        help='Input format (default: guessed from the file extension)'
+    )
+    add_auto_thread_argument(import_parser)
+    add_duplicate_arguments(import_parser)
+    add_account_argument(
+        import_parser,
+        help='Account for rows that do not name one (default: %(default)s)'
+    )
+
     # List command
     list_parser = subparsers.add_parser('list', help='List scheduled threads')
     list_parser.add_argument(
         '--status', '-s',
-        choices=['pending', 'posted', 'cancelled'],
+        choices=STATUS_NAMES,
         help='Filter by status'
     )
     list_parser.add_argument(
@@ -80,13 +225,73 @@ def create_parser() -> argparse.ArgumentParser:
         action='store_true',
         help='Show full tweet content'
     )
+    list_parser.add_argument(
+        '--format',
+        choices=['table', 'json', 'ndjson'],
+        default='table',
+        help='Output format (default: table)'
+    )
+    list_parser.add_argument(
+        '--limit', '-n',
+        type=int,
+        help='Maximum number of threads to list'
+    )
+    list_parser.add_argument(
+        '--after-id',
+        type=int,
+        help='Only list threads with an ID greater than this (for paging with --limit)'
+    )
+    list_parser.add_argument(
+        '--since',
+        help='Only list threads scheduled at or after this time'
+    )
+    list_parser.add_argument(
+        '--until',
+        help='Only list threads scheduled before this time'
+    )
+    list_parser.add_argument(
+        '--account', '-a',
+        help='Only list threads posted from this account'
+    )
+    list_parser.add_argument(
+        '--archived',
+        action='store_true',
+        help='List threads moved to the archive by xp run or xp vacuum'
+    )
+    list_parser.add_argument(
+        '--recurring',
+        action='store_true',
+        help='List the active recurring series instead of individual threads'
+    )
 
     # Cancel commands
-    cancel_parser = subparsers.add_parser('cancel', help='Cancel a scheduled thread')
+    cancel_parser = subparsers.add_parser(
+        'cancel',
+        help='Cancel scheduled threads by ID, status, time, text or account'
+    )
+    add_selection_arguments(cancel_parser, 'cancel')
     cancel_parser.add_argument(
-        'id',
-        type=int,
-        help='ID of the scheduled thread to cancel'
+        '--recurring',
+        action='store_true',
+        help='Cancel recurring series instead of scheduled threads'
+    )
+
+    # Reschedule command
+    reschedule_parser = subparsers.add_parser(
+        'reschedule',
+        help='Move scheduled threads by ID, status, time, text or account'
+    )
+    add_selection_arguments(reschedule_parser, 'move')
+    move_group = reschedule_parser.add_mutually_exclusive_group(required=True)
+    move_group.add_argument(
+        '--shift',
+        type=shift,
+        metavar='DURATION',
+        help='Move each thread by this much, e.g. "+2h" or "+1d 6h"; write --shift=-30m to move earlier'
+    )
+    move_group.add_argument(
+        '--time', '-t',
+        help='Move the threads to this time (natural language or "YYYY-MM-DD HH:MM:SS")'
     )
 
     # Retrieve timeline
@@ -95,8 +300,21 @@ def create_parser() -> argparse.ArgumentParser:
         '--count', '-c',
         type=int,
         default=20,
-        help='Number of tweets to retrieve (default: 20)'
+        help='Number of tweets to show; more than 100 are fetched over several pages (default: 20)'
     )
+    timeline_parser.add_argument(
+        '--cached',
+        action='store_true',
+        help='Show the locally cached timeline without calling the API'
+    )
+    add_account_argument(timeline_parser, help='Account to read the timeline of (default: %(default)s)')
+
+    # Account commands
+    account_parser = subparsers.add_parser('account', help='Manage the accounts xp posts from')
+    account_subparsers = account_parser.add_subparsers(dest='account_command', required=True)
+    account_add_parser = account_subparsers.add_parser('add', help='Store credentials for an account')
+    account_add_parser.add_argument('name', help='Name to refer to the account by')
+    account_subparsers.add_parser('list', help='List the accounts with stored credentials')
 
     # Run command
     run_parser = subparsers.add_parser('run', help='Run the Tweet Scheduler to post pending tweets.')
@@ -105,39 +323,98 @@ def create_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Run the Tweet Scheduler to post pending tweets.",
     )
+    run_parser.add_argument(
+        '--concurrency', '-c',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Maximum number of threads posted at the same time (default: {DEFAULT_CONCURRENCY})'
+    )
+    run_parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Also serve metrics in the Prometheus text format on this localhost port'
+    )
+    add_duplicate_arguments(run_parser, allow=False)
+    add_archive_after_argument(
+        run_parser,
+        help='Archive posted and cancelled threads this many days after their time; 0 turns it off (default: %(default)s)'
+    )
+
+    # Stats command
+    stats_parser = subparsers.add_parser('stats', help='Show posting metrics from a running scheduler')
+    stats_parser.add_argument(
+        '--raw',
+        action='store_true',
+        help='Print the metrics in the Prometheus text format'
+    )
+
+    # Vacuum command
+    vacuum_parser = subparsers.add_parser(
+        'vacuum',
+        help='Archive finished threads and shrink the database without stopping xp run'
+    )
+    add_archive_after_argument(
+        vacuum_parser,
+        help='Archive posted and cancelled threads this many days after their time (default: %(default)s)'
+    )
+    vacuum_parser.add_argument(
+        '--compress',
+        action='store_true',
+        help='Store archived threads compressed'
+    )
+    vacuum_parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Rebuild the whole database file; blocks xp run while it runs, needed once on older databases'
+    )
 
     return parser
 
 def get_tweets_input(args) -> list[str]:
-    """Get tweets from either pipe, file, or command line arguments."""
-    tweets = []
+    """
+    Get tweets from either pipe, file, or command line arguments.
+
+    With --auto-thread the whole input is read as one document and split into
+    tweets, instead of taking one tweet per line or argument.
+    """
+    auto_thread = getattr(args, 'auto_thread', False)
+    text = None
 
     # First check if input is being piped
     if not sys.stdin.isatty():
-        tweets = [line.strip() for line in sys.stdin.readlines() if line.strip()]
+        text = sys.stdin.read()
 
     # Then check if a file is specified
     elif hasattr(args, 'file') and args.file:
         try:
-            file_path = Path(args.file)
-            with open(file_path, 'r') as f:
-                tweets = [line.strip() for line in f.readlines() if line.strip()]
+            with open(args.file, 'r') as f:
+                text = f.read()
         except Exception as e:
             raise ValueError(f"Error reading file {args.file}: {str(e)}")
 
     # Finally use command line arguments
     elif hasattr(args, 'tweets') and args.tweets:
-        tweets = args.tweets
+        if not auto_thread:
+            return args.tweets
+        text = "\n\n".join(args.tweets)
+
+    if text is None:
+        return []
+    if auto_thread:
+        from textlength import split_text
 
-    return tweets
+        return list(split_text(text))
+    return [line.strip() for line in text.splitlines() if line.strip()]
 
 def preview_thread(tweets: list[str]) -> None:
     """Display a formatted preview of the thread."""
+    from textlength import MAX_WEIGHTED_LENGTH, weighted_length
+
     print("\n=== Thread Preview ===\n")
     for i, tweet in enumerate(tweets, 1):
         print(f"Tweet {i}/{len(tweets)}:")
         print(f"{tweet}\n")
-        print(f"Length: {len(tweet)}/280 characters\n")
+        print(f"Length: {weighted_length(tweet)}/{MAX_WEIGHTED_LENGTH} characters\n")
         if i < len(tweets):
             print("-" * 40 + "\n")
 
@@ -152,12 +429,31 @@ def parse_args():
         
     # Get tweets for commands that need them
     tweets = []
+    if args.command in ('cancel', 'reschedule'):
+        # Each ID argument may hold several ranges
+        args.ids = [id_range for ranges in args.ids for id_range in ranges]
+        if not (args.ids or args.since or args.until or args.match or args.account):
+            parser.error(f"{args.command} needs thread IDs or at least one of --since, --until, --match, --account")
+
+    if args.command == 'schedule' and not (args.time or args.repeat):
+        parser.error("schedule needs --time, --repeat or both")
+
     if args.command in ('post', 'schedule'):
         tweets = get_tweets_input(args)
 
         if not tweets:
             print("Error: No tweets provided")
             sys.exit(1)
+
+        from textlength import MAX_WEIGHTED_LENGTH, too_long
+
+        # Catch over-length tweets here rather than as a failed API call
+        over = too_long(tweets)
+        for number, length in over:
+            print(f"Error: Tweet {number} is {length}/{MAX_WEIGHTED_LENGTH} characters")
+        if over:
+            print("Shorten it, or use --auto-thread to split long text into a thread.")
+            sys.exit(1)
             
         # Handle preview if requested
         if args.preview:
@@ -166,10 +462,5 @@ def parse_args():
                 print("Cancelled.")
                 sys.exit(0)
 
-    elif args.command == 'timeline':
-        client, api = create_api()
-        retrieve_timeline(client, api, args.count)
-        sys.exit(0)
-
     return args, tweets
 
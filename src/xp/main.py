@@ -1,32 +1,149 @@
+import os
 import sys
-import tweepy
 import time
-import schedule
 
+# Taken before the other xp modules are loaded, for the "import" trace span
+_IMPORT_START = time.time()
+
+from contextlib import nullcontext
+
+from tracing import (
+    PROFILE_VARIABLE, TRACE_VARIABLE, enable_tracing, profile_requested, profiled, record_span,
+    run_profiled, span
+)
 from input import parse_args
-from db import init_db, add_tweet, list_scheduled_tweets
-from setup import setup_wizard, load_credentials, ensure_home_dir
-from api import create_api, post_pending_tweets, post_tweet
+from db import (
+    init_db, add_tweet, list_scheduled_tweets, import_tweets, get_cached_timeline,
+    format_timeline_tweet, vacuum_db, check_duplicate, add_series, list_series, cancel_series,
+    cancel_tweets, reschedule_tweets, add_posted, record_segment
+)
+from setup import ensure_home_dir, setup_wizard, list_accounts, PROFILES_DIR, TRACE_FILE
+from daemon import DAEMON_COMMANDS, send_request
 
-def main():
+_IMPORT_END = time.time()
+
+# Network modules (api, tweepy, aiohttp) and the dispatcher are imported inside the
+# commands that use them, so local commands like `xp list` start without loading them.
+
+def posted_recorder(tweets, account):
     """
-    Main function to initialize the tool and start the scheduler.
+    Return an on_posted callback that records a thread posted by `xp post`.
+
+    The row is added when the first tweet goes live, which is what X compares for
+    duplicates, so even a thread that fails partway is caught if posted again.
     """
-    ensure_home_dir()
-    init_db()
+    scheduled_id = None
 
-    # Create the Tweepy API client
-    client, api = create_api()
+    def on_posted(index, tweet_id):
+        nonlocal scheduled_id
+        if scheduled_id is None:
+            scheduled_id = add_posted(tweets, account)
+        record_segment(scheduled_id, index, tweet_id)
 
-    # Parse command line arguments
-    args, tweets = parse_args()
-    
+    return on_posted
+
+async def run_scheduler(concurrency, metrics_port=None, archive_after=None, duplicate_window=None):
+    """
+    Run the dispatcher, posting due tweets for every account from one client pool.
+
+    Args:
+        concurrency (int): Maximum number of threads posted at the same time.
+        metrics_port (int, optional): Also serve the metrics over HTTP on this local port.
+        archive_after (float, optional): Archive finished threads this many days after
+            their scheduled time, checking every ARCHIVE_INTERVAL seconds.
+        duplicate_window (float, optional): Skip threads whose first tweet was posted
+            within this many hours. Defaults to DUPLICATE_WINDOW_HOURS.
+    """
+    import asyncio
+    import sqlite3
+    with span("import", module="api"):
+        from api import ClientPool, post_pending_tweets, post_thread_async, preupload_media
+    from daemon import serve_requests, stop_serving
+    from db import ARCHIVE_INTERVAL, DUPLICATE_WINDOW_HOURS, archive_finished, due_accounts
+    from dispatcher import Dispatcher
+    from metrics import export_metrics
+    from ratelimit import RateGovernor, rate_key
+
+    governor = RateGovernor()
+    clients = ClientPool(governor)
+    if duplicate_window is None:
+        duplicate_window = DUPLICATE_WINDOW_HOURS
+    dispatcher = Dispatcher(
+        lambda: post_pending_tweets(clients, concurrency, governor, duplicate_window),
+        # Connect ahead of the next post for every account with something due by then
+        warm=lambda due: clients.warm(due_accounts(due))
+    )
+
+    async def post_from_cli(args, tweets):
+        # `xp post` sent to the daemon: reuse its client and rate limit state
+        if check_duplicate(tweets, args.account, int(time.time()), args.duplicate_window, args.allow_duplicate):
+            return 1
+        success, retry_at = await post_thread_async(
+            clients.get(args.account), tweets, governor,
+            on_posted=posted_recorder(tweets, args.account), endpoint=rate_key(args.account)
+        )
+        if success:
+            print("Thread posted successfully!" if len(tweets) > 1 else f"Tweet posted: {tweets[0]}")
+            return 0
+        if retry_at is not None:
+            print(f"Error: Rate limited; try again after {time.strftime('%H:%M:%S', time.localtime(retry_at))}.")
+        else:
+            print("Error posting thread" if len(tweets) > 1 else "Error posting tweet")
+        return 1
+
+    async def archive_periodically():
+        # Keep the queue table down to pending and recent threads however long we run
+        while True:
+            try:
+                await asyncio.to_thread(archive_finished, archive_after)
+            except sqlite3.Error as e:
+                print(f"Error archiving finished threads: {e}")
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+
+    exporter = asyncio.create_task(export_metrics(metrics_port))
+    uploader = asyncio.create_task(preupload_media(clients))
+    archiver = asyncio.create_task(archive_periodically()) if archive_after else None
+    server = await serve_requests(run_command, post_from_cli)
+
+    try:
+        await dispatcher.run()
+    finally:
+        stop_serving(server)
+        if archiver:
+            archiver.cancel()
+        uploader.cancel()
+        exporter.cancel()
+        await clients.close()
+
+def run_command(args, tweets):
+    """
+    Run a parsed command other than `run` in this process.
+
+    `xp run` also calls this to answer the commands CLI invocations send it.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        tweets (list[str]): The tweets read from the arguments, a file or stdin.
+
+    Returns:
+        int: The exit code.
+    """
     if args.command == 'post':
+        with span("import", module="api"):
+            from api import create_api, post_tweet
+
+        if check_duplicate(tweets, args.account, int(time.time()), args.duplicate_window, args.allow_duplicate):
+            return 1
+
+        # Create the Tweepy API client
+        client = create_api(args.account)
+        on_posted = posted_recorder(tweets, args.account)
 
         if len(tweets) == 1:
             # Post a single tweet
-            success, _ = post_tweet(client, tweets[0])
+            success, tweet_id = post_tweet(client, tweets[0])
             if success:
+                on_posted(0, tweet_id)
                 print(f"Tweet posted: {tweets[0]}")
             else:
                 print(f"Error posting tweet")
@@ -43,35 +160,172 @@ def main():
                 if not success:
                     all_succeeded = False
                     break
-                if all_succeeded:
-                    print("Thread posted successfully!")
-                else:
-                    print("Error posting thread")
+                on_posted(i - 1, tweet_id)
+                previous_id = tweet_id
+
+            if all_succeeded:
+                print("Thread posted successfully!")
+            else:
+                print("Error posting thread")
+
+    elif args.command == 'schedule' and args.repeat:
+        # Store the series; `xp run` schedules each occurrence when it is due
+        if not add_series(tweets, args.repeat, args.time, args.account, args.media):
+            return 1
 
     elif args.command == 'schedule':
         # Add a tweet to the database
-        add_tweet(tweets, args.time)
+        if not add_tweet(
+            tweets, args.time, args.account, args.media, args.duplicate_window, args.allow_duplicate
+        ):
+            return 1
         print(f"Tweet scheduled for {args.time}")
 
+    elif args.command == 'import':
+        # Bulk schedule threads from a file
+        try:
+            import_tweets(
+                args.file, args.format, args.account, args.auto_thread,
+                args.duplicate_window, args.allow_duplicate
+            )
+        except (OSError, ValueError) as e:
+            print(f"Error reading file {args.file}: {e}")
+            return 1
+
+    elif args.command == 'cancel' and args.recurring:
+        if cancel_series(args.ids, args.since, args.until, args.match, args.account) is None:
+            return 1
+
+    elif args.command == 'cancel':
+        # One UPDATE for the whole selection, however many threads it covers; matching
+        # nothing is not an error, only an invalid filter is
+        if cancel_tweets(args.ids, args.status, args.since, args.until, args.match, args.account) is None:
+            return 1
+
+    elif args.command == 'reschedule':
+        if reschedule_tweets(
+            args.shift, args.time, args.ids, args.status, args.since, args.until, args.match,
+            args.account
+        ) is None:
+            return 1
+
+    elif args.command == 'list' and args.recurring:
+        list_series(args.format, args.account)
+
     elif args.command == 'list':
         # List scheduled tweets
         list_scheduled_tweets(
             status=args.status if hasattr(args, 'status') else None,
-            verbose=args.verbose if hasattr(args, 'verbose') else False
+            verbose=args.verbose if hasattr(args, 'verbose') else False,
+            output_format=args.format,
+            limit=args.limit,
+            after_id=args.after_id,
+            since=args.since,
+            until=args.until,
+            account=args.account,
+            archived=args.archived
         )
 
-    elif args.command == 'run':
-        # Run the scheduler
-        print("Tweet scheduler is running. Press Ctrl+C to exit.")
-        # Schedule the job to check for pending tweets every minute
-        schedule.every(1).minutes.do(post_pending_tweets, client)
+    elif args.command == 'timeline':
+        if args.cached:
+            # Offline: print the cache without loading the network stack
+            for tweet in get_cached_timeline(args.account, args.count):
+                print(format_timeline_tweet(*tweet))
+        else:
+            with span("import", module="api"):
+                from api import create_api, retrieve_timeline
+
+            client = create_api(args.account)
+            retrieve_timeline(client, args.count, args.account)
 
-        try:
-            while True:
-                schedule.run_pending()
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("\nExiting Tweet Scheduler.")
+    elif args.command == 'account':
+        if args.account_command == 'add':
+            try:
+                setup_wizard(args.name)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 1
+        else:
+            for name in list_accounts():
+                print(name)
+
+    elif args.command == 'stats':
+        from metrics import print_stats
+
+        # Summarize the metrics file written by `xp run`
+        print_stats(raw=args.raw)
+
+    elif args.command == 'vacuum':
+        vacuum_db(args.archive_after, args.compress, args.full)
+
+    return 0
+
+def start_tracing(command, profile_dir=None):
+    """
+    Record trace spans if XP_TRACE is set or this is the child process of `xp --profile`.
+
+    Args:
+        command (str): The xp command, recorded on every span.
+        profile_dir (str, optional): The profile being written, which gets its own trace file.
+    """
+    if profile_dir:
+        path = os.path.join(profile_dir, "trace.jsonl")
+    else:
+        path = os.environ.get(TRACE_VARIABLE)
+        if not path:
+            return
+        if path == "1":
+            ensure_home_dir()
+            path = TRACE_FILE
+    enable_tracing(path, command)
+    record_span("import", _IMPORT_START, _IMPORT_END, module="main")
+
+def main():
+    """
+    Main function to initialize the tool and start the scheduler.
+    """
+    profile_dir = os.environ.get(PROFILE_VARIABLE)
+    if profile_requested(sys.argv) and not profile_dir:
+        # Run the command again in a child process that records the profile
+        command = next((arg for arg in sys.argv[1:] if not arg.startswith('-')), 'help')
+        directory = os.path.join(PROFILES_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{command}")
+        sys.exit(run_profiled(sys.argv, directory))
+
+    # Parse command line arguments
+    parse_start = time.time()
+    args, tweets = parse_args()
+    start_tracing(args.command, profile_dir)
+    record_span("parse_args", parse_start)
+
+    with profiled(profile_dir) if profile_dir else nullcontext():
+        # A profile should show the command itself, not the round trip to the daemon
+        if args.command in DAEMON_COMMANDS and not profile_dir:
+            # Let a running `xp run` answer with its warm clients and connection
+            with span("daemon.send_request"):
+                code = send_request(args, tweets)
+            if code is not None:
+                sys.exit(code)
+
+        ensure_home_dir()
+        init_db()
+
+        if args.command == 'run':
+            import asyncio
+
+            # Run the scheduler
+            print("Tweet scheduler is running. Press Ctrl+C to exit.")
+            # Sleep until the next pending post is due instead of polling on a fixed interval
+            try:
+                asyncio.run(run_scheduler(
+                    args.concurrency, args.metrics_port, args.archive_after, args.duplicate_window
+                ))
+            except KeyboardInterrupt:
+                print("\nExiting Tweet Scheduler.")
+
+        else:
+            with span("command", request=args.command):
+                code = run_command(args, tweets)
+            sys.exit(code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,282 @@
+import bisect
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from setup import METRICS_FILE
+
+# Seconds between metrics file writes while `xp run` is active
+METRICS_INTERVAL = 15.0
+
+def _format_labels(labels):
+    """Render a label tuple as a Prometheus label set."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+def _format_value(value):
+    """Render a sample value, without a trailing .0 for whole numbers."""
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    """Base class for metrics keyed by an optional set of labels."""
+    kind = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def render(self):
+        """Return the metric in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of posts sent."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. the size of the due queue."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, e.g. request latencies."""
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets):
+        super().__init__(name, help)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series['counts'][index] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time spent in a `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in sorted(self.values.items(), key=lambda item: item[0]):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {series["count"]}')
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+class Registry:
+    """The set of metrics exported by this process."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+CREATE_TWEET_SECONDS = REGISTRY.register(Histogram(
+    "xp_create_tweet_seconds",
+    "Latency of create_tweet calls.",
+    [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+))
+DISPATCH_LAG_SECONDS = REGISTRY.register(Histogram(
+    "xp_dispatch_lag_seconds",
+    "Delay between a thread's scheduled time and the start of posting it.",
+    [0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 3600]
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "xp_db_query_seconds",
+    "Latency of the scheduler's database queries.",
+    [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5]
+))
+MEDIA_UPLOAD_SECONDS = REGISTRY.register(Histogram(
+    "xp_media_upload_seconds",
+    "Latency of media uploads.",
+    [0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+))
+POSTS_TOTAL = REGISTRY.register(Counter(
+    "xp_posts_total",
+    "Scheduled threads handled by the scheduler, by result."
+))
+DUE_QUEUE_SIZE = REGISTRY.register(Gauge(
+    "xp_due_queue_size",
+    "Pending threads that were due at the dispatcher's last check."
+))
+PENDING_POSTS = REGISTRY.register(Gauge(
+    "xp_pending_posts",
+    "Pending threads known to the dispatcher."
+))
+
+def write_metrics_file(path=METRICS_FILE):
+    """
+    Write the current metrics to a file, replacing it atomically.
+
+    Args:
+        path (str): The file to write.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        f.write(REGISTRY.render())
+    os.replace(temporary, path)
+
+async def handle_metrics_request(reader, writer):
+    """Answer any HTTP request on the metrics port with the current metrics."""
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+    except Exception:
+        pass
+    body = REGISTRY.render().encode()
+    writer.write(
+        b"HTTP/1.0 200 OK\r\n"
+        b"Content-Type: text/plain; version=0.0.4\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    writer.close()
+
+async def export_metrics(port=None, interval=METRICS_INTERVAL):
+    """
+    Export metrics until cancelled.
+
+    The metrics file is rewritten every `interval` seconds. If `port` is given, a
+    Prometheus-compatible endpoint is also served on localhost.
+
+    Args:
+        port (int, optional): Local TCP port for the HTTP endpoint.
+        interval (float): Seconds between metrics file writes.
+    """
+    import asyncio
+
+    server = None
+    if port:
+        server = await asyncio.start_server(handle_metrics_request, "127.0.0.1", port)
+    try:
+        while True:
+            write_metrics_file()
+            await asyncio.sleep(interval)
+    finally:
+        write_metrics_file()
+        if server:
+            server.close()
+
+_SAMPLE = re.compile(r'(?P<name>[A-Za-z_:][A-Za-z0-9_:]*)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)')
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+def read_metrics_file(path=METRICS_FILE):
+    """
+    Parse a metrics file written by write_metrics_file.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        list[tuple]: (name, labels dict, value) for each sample.
+    """
+    samples = []
+    with open(path, "r") as f:
+        for line in f:
+            match = _SAMPLE.fullmatch(line.strip())
+            if line.startswith("#") or not match:
+                continue
+            labels = dict(_LABEL.findall(match['labels'] or ""))
+            samples.append((match['name'], labels, float(match['value'])))
+    return samples
+
+def _quantile(buckets, count, q):
+    """Estimate a quantile as the upper bound of the bucket that contains it."""
+    for bound, cumulative in buckets:
+        if cumulative >= q * count:
+            return bound
+    return float("inf")
+
+def print_stats(path=METRICS_FILE, raw=False):
+    """
+    Print a summary of the metrics written by a running `xp run`.
+
+    Args:
+        path (str): The metrics file to read.
+        raw (bool): Print the file in the Prometheus text format instead.
+    """
+    if not os.path.exists(path):
+        print("No metrics found. Is `xp run` running?")
+        return
+
+    if raw:
+        with open(path, "r") as f:
+            print(f.read(), end="")
+        return
+
+    samples = read_metrics_file(path)
+    age = time.time() - os.path.getmtime(path)
+    print(f"\n=== Scheduler Stats (updated {age:.0f}s ago) ===\n")
+
+    for metric in REGISTRY.metrics:
+        if not isinstance(metric, Histogram):
+            for name, labels, value in samples:
+                if name == metric.name:
+                    print(f"{name}{_format_labels(sorted(labels.items()))}: {value:g}")
+            continue
+
+        # Group the bucket, sum and count samples of each label set
+        series = {}
+        for name, labels, value in samples:
+            if name not in (f"{metric.name}_bucket", f"{metric.name}_sum", f"{metric.name}_count"):
+                continue
+            labels = dict(labels)
+            bound = labels.pop("le", None)
+            entry = series.setdefault(tuple(sorted(labels.items())), {'buckets': [], 'sum': 0.0, 'count': 0})
+            if name == f"{metric.name}_bucket" and bound != "+Inf":
+                entry['buckets'].append((float(bound), value))
+            elif name == f"{metric.name}_sum":
+                entry['sum'] = value
+            elif name == f"{metric.name}_count":
+                entry['count'] = value
+
+        for labels, entry in sorted(series.items()):
+            count = entry['count']
+            if not count:
+                continue
+            buckets = sorted(entry['buckets'])
+            print(
+                f"{metric.name}{_format_labels(labels)}: count={count:.0f} "
+                f"mean={entry['sum'] / count:.3f}s "
+                f"p50<={_quantile(buckets, count, 0.5):g}s "
+                f"p95<={_quantile(buckets, count, 0.95):g}s"
+            )
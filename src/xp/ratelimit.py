@@ -0,0 +1,228 @@
+import time
+
+from db import get_connection
+
+# Endpoint key for tweet creation, in the "METHOD /path" form used by RateGovernor
+CREATE_TWEET = "POST /2/tweets"
+
+# Number of requests that may go out back to back before pacing kicks in
+BURST = 5
+
+# Longest a post waits in-process for a token before it is deferred instead
+MAX_WAIT = 30.0
+
+# Seconds between checks while the first request to a bucket is awaiting its headers
+PROBE_POLL = 0.05
+
+# Seconds after which a first request that got no headers back stops holding up the rest
+PROBE_TIMEOUT = 10.0
+
+def rate_key(account, endpoint=CREATE_TWEET):
+    """
+    Return the bucket key for an account's calls to an endpoint.
+
+    X rate limits user-context calls per account, so each account has its own buckets.
+    """
+    return f"{account} {endpoint}"
+
+class RateGovernor:
+    """
+    Pace API calls from the `x-rate-limit-*` headers X returns.
+
+    Each account and endpoint has a token bucket that holds at most BURST tokens
+    and refills at the rate that spreads the remaining quota evenly until the
+    window resets. A burst of due posts therefore goes out immediately up to
+    BURST and then settles into the fastest rate the quota can sustain, instead
+    of exhausting the window and failing with 429s. Bucket state is persisted in
+    the rate_limits table so a restarted daemon keeps respecting an exhausted window.
+
+    Until a bucket's first headers arrive nothing is known about its quota, so
+    only one request goes out; the others wait for its response instead of
+    bursting into a window that may already be nearly used up.
+    """
+
+    def __init__(self, burst=BURST):
+        """
+        Args:
+            burst (int): Maximum number of requests sent back to back.
+        """
+        self.burst = burst
+        self.buckets = {}
+        # When the first request of each bucket without known limits was sent
+        self.probes = {}
+        self.load()
+
+    def load(self):
+        """Load the persisted bucket state from the database."""
+        rows = get_connection().execute("""
+            SELECT endpoint, rate_limit, remaining, reset_at, tokens, updated_at
+            FROM rate_limits
+        """)
+        for endpoint, limit, remaining, reset_at, tokens, updated_at in rows:
+            self.buckets[endpoint] = {
+                'limit': limit,
+                'remaining': remaining,
+                'reset_at': reset_at,
+                'tokens': tokens,
+                'updated_at': updated_at,
+            }
+
+    def save(self, endpoint):
+        """Persist the bucket state of one endpoint."""
+        bucket = self.buckets[endpoint]
+        conn = get_connection()
+        conn.execute("""
+            INSERT INTO rate_limits (endpoint, rate_limit, remaining, reset_at, tokens, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (endpoint) DO UPDATE SET
+                rate_limit = excluded.rate_limit,
+                remaining = excluded.remaining,
+                reset_at = excluded.reset_at,
+                tokens = excluded.tokens,
+                updated_at = excluded.updated_at
+        """, (
+            endpoint,
+            bucket['limit'],
+            bucket['remaining'],
+            bucket['reset_at'],
+            bucket['tokens'],
+            bucket['updated_at']
+        ))
+        conn.commit()
+
+    def _bucket(self, endpoint, now):
+        """Return the refilled bucket for an endpoint."""
+        bucket = self.buckets.setdefault(endpoint, {
+            'limit': None,
+            'remaining': None,
+            'reset_at': None,
+            'tokens': float(self.burst),
+            'updated_at': now,
+        })
+
+        # A new window has started, so the whole quota is available again
+        if bucket['reset_at'] is not None and now >= bucket['reset_at']:
+            bucket['remaining'] = bucket['limit']
+            bucket['reset_at'] = None
+
+        rate = self._rate(bucket, now)
+        if rate is None:
+            # Nothing to pace by yet, apart from a first request still in flight
+            bucket['tokens'] = float(self.burst - (endpoint in self.probes))
+        else:
+            elapsed = max(now - bucket['updated_at'], 0)
+            bucket['tokens'] = min(self.burst, bucket['remaining'], bucket['tokens'] + elapsed * rate)
+        bucket['updated_at'] = now
+        return bucket
+
+    @staticmethod
+    def _rate(bucket, now):
+        """Tokens per second that use up the remaining quota exactly at the reset."""
+        if bucket['remaining'] is None or bucket['reset_at'] is None:
+            return None
+        return bucket['remaining'] / max(bucket['reset_at'] - now, 1)
+
+    def delay(self, endpoint, now=None):
+        """
+        Return how many seconds to wait before calling an endpoint.
+
+        Args:
+            endpoint (str): The bucket key, see rate_key().
+            now (float, optional): The current time. Defaults to time.time().
+
+        Returns:
+            float: 0 if a request can be sent right away.
+        """
+        now = time.time() if now is None else now
+        bucket = self._bucket(endpoint, now)
+
+        if bucket['remaining'] is not None and bucket['remaining'] <= 0:
+            return max(bucket['reset_at'] - now, 0) if bucket['reset_at'] else 0
+        if bucket['limit'] is None:
+            probe_sent = self.probes.get(endpoint)
+            return PROBE_POLL if probe_sent is not None and now - probe_sent < PROBE_TIMEOUT else 0
+        if bucket['tokens'] >= 1:
+            return 0
+
+        rate = self._rate(bucket, now)
+        return (1 - bucket['tokens']) / rate if rate else 0
+
+    def acquire(self, endpoint):
+        """Take a token for a request that is about to be sent."""
+        now = time.time()
+        bucket = self._bucket(endpoint, now)
+        if bucket['limit'] is None:
+            self.probes[endpoint] = now
+        bucket['tokens'] -= 1
+        if bucket['remaining'] is not None:
+            bucket['remaining'] -= 1
+
+    def update(self, endpoint, headers):
+        """
+        Record the rate limit headers of a response.
+
+        Args:
+            endpoint (str): The bucket key, see rate_key().
+            headers (Mapping): The response headers.
+        """
+        now = time.time()
+        bucket = self._bucket(endpoint, now)
+        # Any response ends the wait for a bucket's first one
+        self.probes.pop(endpoint, None)
+        try:
+            limit = int(headers['x-rate-limit-limit'])
+            remaining = int(headers['x-rate-limit-remaining'])
+            reset_at = int(headers['x-rate-limit-reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if remaining <= 0 and bucket['reset_at'] is not None:
+            # A stale reset time must not reopen a window that exhaust() holds closed
+            reset_at = max(reset_at, bucket['reset_at'])
+        bucket['limit'] = limit
+        bucket['remaining'] = remaining
+        bucket['reset_at'] = reset_at
+        bucket['tokens'] = min(bucket['tokens'], remaining)
+        self.save(endpoint)
+
+    def exhaust(self, endpoint, until):
+        """
+        Record that X refused a request with a 429, holding the endpoint back until `until`.
+
+        The reset time of a 429 can already be past, through clock skew or a
+        reset on a second boundary, and update() would then take the window as
+        renewed; this keeps it closed regardless.
+
+        Args:
+            endpoint (str): The bucket key, see rate_key().
+            until (float): The UTC epoch timestamp to wait for.
+        """
+        bucket = self._bucket(endpoint, time.time())
+        bucket['remaining'] = 0
+        bucket['reset_at'] = until
+        bucket['tokens'] = 0
+        self.save(endpoint)
+
+    def trace_config(self, account):
+        """
+        Build an aiohttp TraceConfig that feeds every response into update().
+
+        Args:
+            account (str): The account whose session the TraceConfig is attached to.
+
+        Returns:
+            aiohttp.TraceConfig: Pass it to aiohttp.ClientSession(trace_configs=[...]).
+        """
+        import aiohttp
+
+        async def on_request_end(session, context, params):
+            self.update(rate_key(account, f"{params.method} {params.url.path}"), params.response.headers)
+
+        async def on_request_exception(session, context, params):
+            # No response is coming, so let the next request find out the limits
+            self.probes.pop(rate_key(account, f"{params.method} {params.url.path}"), None)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
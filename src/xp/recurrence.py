@@ -0,0 +1,155 @@
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Shorthands accepted in place of a five-field cron expression
+_MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_abbr) if name}
+_WEEKDAYS = {'sun': 0, 'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6}
+
+# (name, lowest value, highest value, names) of the five cron fields, in order
+_FIELDS = (
+    ('minute', 0, 59, {}),
+    ('hour', 0, 23, {}),
+    ('day of month', 1, 31, {}),
+    ('month', 1, 12, _MONTHS),
+    ('day of week', 0, 7, _WEEKDAYS),
+)
+
+# A cron rule that matches nothing within this many years never fires
+_SEARCH_YEARS = 8
+
+def is_rrule(rule):
+    """Return True if the rule is an iCalendar RRULE rather than a cron expression."""
+    return rule.lstrip().upper().startswith(('RRULE:', 'FREQ=', 'DTSTART'))
+
+def _parse_value(text, low, high, names, field):
+    """Parse one number or name of a cron field."""
+    value = names.get(text.lower()) if not text.isdigit() else int(text)
+    if value is None or not low <= value <= high:
+        raise ValueError(f"invalid {field} {text!r} in cron rule")
+    return value
+
+def _parse_field(text, low, high, names, field):
+    """Parse a cron field such as "*/15", "1-5" or "mon,wed,fri" into a set of values."""
+    values = set()
+    for part in text.split(','):
+        part, slash, step = part.partition('/')
+        if slash and not (step.isdigit() and int(step) > 0):
+            raise ValueError(f"invalid step {step!r} in cron {field}")
+        if part == '*':
+            start, end = low, high
+        else:
+            first, dash, last = part.partition('-')
+            start = _parse_value(first, low, high, names, field)
+            end = _parse_value(last, low, high, names, field) if dash else (high if slash else start)
+            if end < start:
+                raise ValueError(f"invalid range {part!r} in cron {field}")
+        values.update(range(start, end + 1, int(step) if slash else 1))
+    return values
+
+@lru_cache(maxsize=256)
+def parse_cron(rule):
+    """
+    Parse a five-field cron expression (minute, hour, day of month, month, day of
+    week) or a shorthand such as @daily.
+
+    Fields accept numbers, `*`, ranges, lists, steps and month or weekday names.
+    As in cron, when both day fields are restricted a day matches either of them.
+
+    Args:
+        rule (str): The cron expression.
+
+    Returns:
+        tuple: (minutes, hours, days, months, weekdays, match either day field).
+
+    Raises:
+        ValueError: If the expression is not valid.
+    """
+    text = _MACROS.get(rule.strip().lower(), rule)
+    parts = text.split()
+    if len(parts) != len(_FIELDS):
+        raise ValueError(f"cron rule {rule!r} needs 5 fields: minute hour day-of-month month day-of-week")
+
+    minutes, hours, days, months, weekdays = (
+        frozenset(_parse_field(part, low, high, names, field))
+        for part, (field, low, high, names) in zip(parts, _FIELDS)
+    )
+    # Both 0 and 7 mean Sunday
+    if 7 in weekdays:
+        weekdays = (weekdays - {7}) | {0}
+    either_day = parts[2] != '*' and parts[4] != '*'
+    return minutes, hours, days, months, weekdays, either_day
+
+def _next_cron(rule, after):
+    """Return the first minute after the datetime `after` that matches a cron rule, or None."""
+    minutes, hours, days, months, weekdays, either_day = parse_cron(rule)
+
+    def day_matches(moment):
+        in_days = moment.day in days
+        # datetime counts weekdays from Monday = 0, cron from Sunday = 0
+        in_weekdays = (moment.weekday() + 1) % 7 in weekdays
+        return (in_days or in_weekdays) if either_day else (in_days and in_weekdays)
+
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = moment.year + _SEARCH_YEARS
+    # Skip ahead a whole month, day or hour at a time wherever the larger field does not match
+    while moment.year <= limit:
+        if moment.month not in months:
+            year, month = divmod(moment.month, 12)
+            moment = moment.replace(year=moment.year + year, month=month + 1, day=1, hour=0, minute=0)
+        elif not day_matches(moment):
+            moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+        elif moment.hour not in hours:
+            moment = (moment + timedelta(hours=1)).replace(minute=0)
+        elif moment.minute not in minutes:
+            moment += timedelta(minutes=1)
+        else:
+            return moment
+    return None
+
+@lru_cache(maxsize=256)
+def _parse_rrule(rule, start):
+    """Parse an RRULE anchored at the UTC epoch timestamp `start`."""
+    from dateutil.rrule import rrulestr
+
+    return rrulestr(rule, dtstart=datetime.fromtimestamp(start).replace(microsecond=0))
+
+def next_occurrence(rule, start, after):
+    """
+    Return the first occurrence of a recurrence rule after a moment.
+
+    Cron rules match in local time; an RRULE repeats from the series' start time
+    (for example FREQ=WEEKLY;BYDAY=MO,TH;COUNT=10). Only this one occurrence is
+    computed, so a series costs the same however often it repeats.
+
+    Args:
+        rule (str): A cron expression or an RRULE.
+        start (int): When the series starts, as a UTC epoch timestamp. No
+            occurrence is earlier than this.
+        after (float): Return the first occurrence strictly after this UTC epoch timestamp.
+
+    Returns:
+        int: The occurrence as a UTC epoch timestamp, or None if the series has ended.
+
+    Raises:
+        ValueError: If the rule is not valid.
+    """
+    after = max(after, start - 1)
+    if is_rrule(rule):
+        try:
+            occurrence = _parse_rrule(rule, start).after(datetime.fromtimestamp(after))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"invalid RRULE {rule!r}: {e}") from None
+    else:
+        occurrence = _next_cron(rule, datetime.fromtimestamp(after))
+    return int(occurrence.timestamp()) if occurrence else None
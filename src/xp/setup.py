@@ -1,35 +1,86 @@
 import os
+import re
+
+from tracing import traced
 
 HOME_DIR = os.path.expanduser("~/.tweet")
 CREDENTIALS_FILE = os.path.join(HOME_DIR, "credentials.txt")
+ACCOUNTS_DIR = os.path.join(HOME_DIR, "accounts")
 DB_FILE = os.path.join(HOME_DIR, "scheduled_tweets.db")
+METRICS_FILE = os.path.join(HOME_DIR, "metrics.prom")
+SOCKET_FILE = os.path.join(HOME_DIR, "xp.sock")
+TRACE_FILE = os.path.join(HOME_DIR, "trace.jsonl")
+PROFILES_DIR = os.path.join(HOME_DIR, "profiles")
+
+# Account used when no --account is given; its credentials live in CREDENTIALS_FILE
+DEFAULT_ACCOUNT = "default"
+
+ACCOUNT_NAME = re.compile(r'[A-Za-z0-9_-]+')
+
+# Maximum number of scheduled threads posted at the same time by `xp run`
+DEFAULT_CONCURRENCY = 8
 
 def ensure_home_dir():
     """
     Ensure the $HOME/.tweet directory exists.
+
+    Credentials are not checked here; commands that talk to the API load them
+    (and run the setup wizard if needed) when they create a client.
     """
     if not os.path.exists(HOME_DIR):
         os.makedirs(HOME_DIR)
         print(f"Created directory: {HOME_DIR}")
 
-    if not os.path.exists(CREDENTIALS_FILE):
-        print(f"No credentials file not found at: {CREDENTIALS_FILE}")
-        setup_wizard()
+def credentials_file(account=None):
+    """
+    Return the path of an account's credentials file.
+
+    Args:
+        account (str, optional): The account name. Defaults to DEFAULT_ACCOUNT.
 
-def setup_wizard():
+    Returns:
+        str: CREDENTIALS_FILE for the default account, otherwise a file in ACCOUNTS_DIR.
+    """
+    if not account or account == DEFAULT_ACCOUNT:
+        return CREDENTIALS_FILE
+    if not ACCOUNT_NAME.fullmatch(account):
+        raise ValueError(f"Invalid account name: {account!r}")
+    return os.path.join(ACCOUNTS_DIR, f"{account}.txt")
+
+def list_accounts():
+    """
+    List the accounts that have stored credentials.
+
+    Returns:
+        list[str]: Account names, with DEFAULT_ACCOUNT first if it is configured.
+    """
+    accounts = [DEFAULT_ACCOUNT] if os.path.exists(CREDENTIALS_FILE) else []
+    if os.path.isdir(ACCOUNTS_DIR):
+        accounts += sorted(
+            name[:-len(".txt")] for name in os.listdir(ACCOUNTS_DIR) if name.endswith(".txt")
+        )
+    return accounts
+
+def setup_wizard(account=None):
     """
     Guide the user through setting up their Twitter API credentials.
+
+    Args:
+        account (str, optional): The account to set up. Defaults to DEFAULT_ACCOUNT.
     """
+    path = credentials_file(account)
     print("Twitter API credentials setup wizard")
+    if account and account != DEFAULT_ACCOUNT:
+        print(f"Account: {account}")
     consumer_key = input("Enter your Consumer Key: ").strip()
     consumer_secret = input("Enter your Consumer Secret Key: ").strip()
     access_token = input("Enter your Access Token: ").strip()
     access_token_secret = input("Enter your Access Token Secret: ").strip()
     
     # Ensure the home directory exists
-    os.makedirs(HOME_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
 
-    with open(CREDENTIALS_FILE, "w") as f:
+    with open(path, "w") as f:
         f.write(f"consumer_key={consumer_key}\n")
         f.write(f"consumer_secret={consumer_secret}\n")
         f.write(f"access_token={access_token}\n")
@@ -38,20 +89,25 @@ def setup_wizard():
     print("Credentials saved successfully!")
 
 
-def load_credentials():
+@traced("setup.load_credentials")
+def load_credentials(account=None):
     """
     Load Twitter API credentials from the credentials file.
 
+    Args:
+        account (str, optional): The account to load. Defaults to DEFAULT_ACCOUNT.
+
     Returns:
         dict: A dictionary containing the API credentials.
     """
-    if not os.path.exists(CREDENTIALS_FILE):
+    path = credentials_file(account)
+    if not os.path.exists(path):
         print("Credentials not found. Starting setup wizard.")
-        setup_wizard()
+        setup_wizard(account)
 
     credentials = {}
     try:
-        with open(CREDENTIALS_FILE, "r") as f:
+        with open(path, "r") as f:
             for line in f:
                 if '=' in line:
                     key, value = line.strip().split("=", 1)
@@ -63,12 +119,12 @@ def load_credentials():
 
         if missing_keys:
             print("Error: Missing required credentials: {', '.join(missing_keys)}")
-            setup_wizard()
-            return load_credentials()
+            setup_wizard(account)
+            return load_credentials(account)
 
         return credentials
     except Exception as e:
         print("Error loading credentials:", e)
-        setup_wizard()
-        return load_credentials() # Try loading credentials again after setup_wizard
+        setup_wizard(account)
+        return load_credentials(account) # Try loading credentials again after setup_wizard
 
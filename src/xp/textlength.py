@@ -0,0 +1,223 @@
+import re
+import unicodedata
+
+# Longest tweet X accepts, in weighted characters
+MAX_WEIGHTED_LENGTH = 280
+
+# Every URL counts as this many characters, whatever its real length, because X
+# rewrites it to a t.co link
+URL_LENGTH = 23
+
+# Code point ranges that count as one character; everything else counts as two.
+# These are the ranges of X's twitter-text v3 configuration: Latin, Greek,
+# Cyrillic, Hebrew, Arabic, Indic scripts and so on, plus some punctuation.
+_LIGHT_RANGES = [(0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037)]
+
+_URL = re.compile(
+    r'(?:https?://|www\.)[^\s<>"]+'
+    r'|\b(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+'
+    r'(?:com|org|net|edu|gov|io|co|ai|app|dev|me|info|biz|us|uk|de|fr|jp|cn|ca|au|ly|gl|to|tv)'
+    r'\b(?:/[^\s<>"]*)?',
+    re.IGNORECASE
+)
+
+# Trailing punctuation that ends a sentence rather than a URL
+_URL_TRAILING = '.,:;!?\'")]}'
+
+_ZWJ = '\u200d'
+
+_KEYCAP_BASES = '0123456789#*'
+
+def _is_emoji(cp):
+    """Return True for code points that start an emoji."""
+    return (
+        0x1F000 <= cp <= 0x1FAFF
+        or 0x2600 <= cp <= 0x27BF
+        or 0x2B00 <= cp <= 0x2BFF
+        or 0x1F1E6 <= cp <= 0x1F1FF
+    )
+
+def _is_emoji_modifier(cp):
+    """Return True for code points that extend the preceding emoji."""
+    return (
+        cp == 0xFE0F
+        or cp == 0x20E3
+        or 0x1F3FB <= cp <= 0x1F3FF
+        or 0xE0020 <= cp <= 0xE007F
+    )
+
+def _text_weight(text):
+    """Weight of text without URLs: 1 per light character, 2 per other character or emoji."""
+    if text.isascii():
+        return len(text)
+
+    weight = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        cp = ord(text[i])
+        i += 1
+        # A keycap (digit, # or * with an enclosing keycap) is an emoji too
+        keycap = text[i - 1] in _KEYCAP_BASES and i < n and _is_emoji_modifier(ord(text[i]))
+        if keycap or _is_emoji(cp):
+            # An emoji sequence (skin tone, ZWJ family, flag, keycap) counts as one emoji
+            if 0x1F1E6 <= cp <= 0x1F1FF and i < n and 0x1F1E6 <= ord(text[i]) <= 0x1F1FF:
+                i += 1
+            while i < n:
+                if _is_emoji_modifier(ord(text[i])):
+                    i += 1
+                elif text[i] == _ZWJ and i + 1 < n and _is_emoji(ord(text[i + 1])):
+                    i += 2
+                else:
+                    break
+            weight += 2
+        elif any(low <= cp <= high for low, high in _LIGHT_RANGES):
+            weight += 1
+        else:
+            weight += 2
+    return weight
+
+def _url_spans(text):
+    """Yield the (start, end) of every URL in the text, without trailing punctuation."""
+    for match in _URL.finditer(text):
+        start, end = match.span()
+        while end > start and text[end - 1] in _URL_TRAILING:
+            end -= 1
+        yield start, end
+
+def _weigh(text):
+    """Weighted length of NFC-normalized text."""
+    if '.' not in text:
+        return _text_weight(text)
+
+    weight = 0
+    position = 0
+    for start, end in _url_spans(text):
+        weight += _text_weight(text[position:start]) + URL_LENGTH
+        position = end
+    return weight + _text_weight(text[position:])
+
+def weighted_length(text):
+    """
+    Return the length of a tweet as X counts it.
+
+    The text is NFC-normalized first. URLs count as URL_LENGTH, emoji (including
+    multi-code-point sequences) and CJK characters count as 2, and most other
+    characters count as 1.
+
+    Args:
+        text (str): The tweet.
+
+    Returns:
+        int: The weighted length, to compare with MAX_WEIGHTED_LENGTH.
+    """
+    return _weigh(unicodedata.normalize('NFC', text))
+
+def too_long(tweets, limit=MAX_WEIGHTED_LENGTH):
+    """
+    Return the tweets of a thread that X would reject as too long.
+
+    Args:
+        tweets (list[str]): The tweets of the thread.
+        limit (int): The maximum weighted length.
+
+    Returns:
+        list[tuple]: (1-based tweet number, weighted length) for each tweet over the limit.
+    """
+    lengths = ((number, weighted_length(tweet)) for number, tweet in enumerate(tweets, 1))
+    return [(number, length) for number, length in lengths if length > limit]
+
+# Whitespace, or a run of non-whitespace; URLs never contain whitespace, so a
+# token never splits one
+_TOKEN = re.compile(r'\s+|\S+')
+
+_SENTENCE_END = re.compile(r'[.!?…。！？]["\')\]”’]*$')
+
+def _split_word(word, limit):
+    """Split a single word that is longer than a tweet into pieces that fit."""
+    piece = []
+    weight = 0
+    for char in word:
+        char_weight = _text_weight(char)
+        if weight + char_weight > limit:
+            yield ''.join(piece)
+            piece, weight = [], 0
+        piece.append(char)
+        weight += char_weight
+    if piece:
+        yield ''.join(piece)
+
+def split_text(text, limit=MAX_WEIGHTED_LENGTH):
+    """
+    Split a document into tweets that each fit within the weighted length limit.
+
+    The text is read in a single pass. Each tweet is filled with as many words as
+    fit and then broken at the last sentence end, or paragraph break, in its
+    second half, falling back to the last word boundary. A word longer than a
+    whole tweet is broken between characters. Only the words after the break
+    carry over to the next tweet, and there are never more than one tweet's
+    worth of them, so the running time is linear in the length of the text.
+
+    Args:
+        text (str): The document to split.
+        limit (int): The maximum weighted length of a tweet.
+
+    Yields:
+        str: The tweets, in order.
+    """
+    # Tokens of the tweet being built, and the weight up to and including each one
+    tokens = []
+    weights = []
+    # Index of the whitespace token after the last sentence end and the last word
+    sentence_break = word_break = 0
+
+    def push(token, weight):
+        nonlocal sentence_break, word_break
+        tokens.append(token)
+        weights.append((weights[-1] if weights else 0) + weight)
+        if token.isspace():
+            word_break = len(tokens) - 1
+            if '\n\n' in token or _SENTENCE_END.search(tokens[-2]):
+                sentence_break = len(tokens) - 1
+
+    def cut(end):
+        """Remove and return the tweet made of tokens[:end], keeping the rest."""
+        nonlocal sentence_break, word_break
+        tweet = ''.join(tokens[:end]).strip()
+        rest = [(token, weights[i] - (weights[i - 1] if i else 0)) for i, token in enumerate(tokens)][end:]
+        tokens.clear()
+        weights.clear()
+        sentence_break = word_break = 0
+        for token, weight in rest:
+            if tokens or not token.isspace():
+                push(token, weight)
+        return tweet
+
+    for match in _TOKEN.finditer(unicodedata.normalize('NFC', text)):
+        token = match.group()
+        is_space = token.isspace()
+        if is_space and not tokens:
+            continue
+        weight = len(token) if is_space else _weigh(token)
+
+        if weight > limit and not is_space:
+            # Flush what we have, then cut the oversized word into pieces
+            if tokens:
+                yield cut(len(tokens))
+            *pieces, last = _split_word(token, limit)
+            yield from pieces
+            push(last, _text_weight(last))
+            continue
+
+        # Whitespace never starts a new tweet; it is stripped at the break instead
+        while not is_space and tokens and weights[-1] + weight > limit:
+            if sentence_break and weights[sentence_break - 1] * 2 >= limit:
+                end = sentence_break
+            else:
+                end = word_break or len(tokens)
+            yield cut(end)
+        push(token, weight)
+
+    tweet = ''.join(tokens).strip()
+    if tweet:
+        yield tweet
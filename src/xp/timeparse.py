@@ -0,0 +1,185 @@
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from tracing import traced
+
+# Languages dateparser is restricted to. Skipping language detection is most of
+# the difference between a slow and a fast dateparser call.
+LANGUAGES = ['en']
+
+# Number of distinct time strings whose parse result is remembered
+CACHE_SIZE = 1024
+
+_UNITS = {
+    'second': 'seconds', 'sec': 'seconds', 's': 'seconds',
+    'minute': 'minutes', 'min': 'minutes', 'm': 'minutes',
+    'hour': 'hours', 'hr': 'hours', 'h': 'hours',
+    'day': 'days', 'd': 'days',
+    'week': 'weeks', 'wk': 'weeks', 'w': 'weeks',
+}
+
+_ISO = re.compile(
+    r'\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?',
+    re.IGNORECASE
+)
+
+_RELATIVE = re.compile(
+    r'in\s+(?P<amount>\d+)\s*(?P<unit>seconds?|secs?|s|minutes?|mins?|m|hours?|hrs?|h|days?|d|weeks?|wks?|w)'
+)
+
+_DAY = re.compile(
+    r'(?P<day>today|tonight|tomorrow)(?:\s+(?:at\s+)?(?P<time>.+))?'
+    r'|(?:at\s+)?(?P<time_first>.+?)\s+(?P<day_last>today|tonight|tomorrow)'
+)
+
+_CLOCK = re.compile(r'(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>am|pm|a\.m\.|p\.m\.)?')
+
+def _parse_clock(text):
+    """Parse "3pm", "3:30 pm", "15:00", "noon" or "midnight" into (hour, minute)."""
+    if text == 'noon':
+        return 12, 0
+    if text == 'midnight':
+        return 0, 0
+
+    match = _CLOCK.fullmatch(text)
+    if not match:
+        return None
+
+    hour = int(match['hour'])
+    minute = int(match['minute'] or 0)
+    meridiem = match['meridiem']
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.startswith('p') else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile(text):
+    """
+    Turn a normalized time string into a resolver that maps "now" to a datetime.
+
+    Results are cached by text alone, so relative forms are cached as resolvers
+    rather than as fixed datetimes. Returns None for anything the fast path
+    does not understand.
+    """
+    if _ISO.fullmatch(text):
+        value = text.upper().replace('Z', '+00:00')
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            # Python < 3.11 does not accept offsets without a colon
+            try:
+                parsed = datetime.fromisoformat(value[:-2] + ':' + value[-2:])
+            except ValueError:
+                return None
+        return lambda now: parsed
+
+    if text == 'now':
+        return lambda now: now
+
+    match = _RELATIVE.fullmatch(text)
+    if match:
+        unit = match['unit']
+        unit = _UNITS.get(unit, _UNITS.get(unit.rstrip('s'), unit))
+        delta = timedelta(**{unit: int(match['amount'])})
+        return lambda now: now + delta
+
+    match = _DAY.fullmatch(text)
+    if match:
+        day = match['day'] or match['day_last']
+        clock = match['time'] or match['time_first']
+        if clock:
+            hour_minute = _parse_clock(clock)
+        elif day == 'tonight':
+            hour_minute = (20, 0)
+        else:
+            # "tomorrow" on its own keeps the current time of day, like dateparser
+            hour_minute = None
+        if clock and hour_minute is None:
+            return None
+
+        offset = timedelta(days=1 if day == 'tomorrow' else 0)
+
+        def resolve(now):
+            moment = now + offset
+            if hour_minute is None:
+                return moment
+            return moment.replace(hour=hour_minute[0], minute=hour_minute[1], second=0, microsecond=0)
+        return resolve
+
+    return None
+
+@lru_cache(maxsize=CACHE_SIZE)
+@traced("timeparse.dateparser")
+def _parse_with_dateparser(text, base):
+    """Parse with dateparser relative to `base`, restricted to LANGUAGES."""
+    import dateparser
+
+    return dateparser.parse(text, languages=LANGUAGES, settings={'RELATIVE_BASE': base})
+
+def parse_time(text, now=None, fast_only=False):
+    """
+    Parse an ISO-8601 or natural language time.
+
+    ISO-8601 times and the common relative forms ("now", "in 2 hours",
+    "tomorrow at 3pm", "today at noon") are handled by precompiled patterns
+    without importing dateparser. Anything else falls back to dateparser.
+    Both paths keep a bounded LRU cache of results.
+
+    Args:
+        text (str): The time to parse.
+        now (datetime, optional): The time relative forms are resolved against. Defaults to now.
+        fast_only (bool): Return None instead of falling back to dateparser.
+
+    Returns:
+        datetime: The parsed time, or None if it could not be parsed.
+    """
+    if not text:
+        return None
+
+    if now is None:
+        now = datetime.now()
+    now = now.replace(microsecond=0)
+
+    resolver = _compile(' '.join(text.lower().split()))
+    if resolver is not None:
+        return resolver(now)
+    if fast_only:
+        return None
+    return _parse_with_dateparser(text, now)
+
+_SHIFT_PART = re.compile(
+    r'(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>seconds?|secs?|s|minutes?|mins?|m|hours?|hrs?|h|days?|d|weeks?|wks?|w)'
+)
+
+def parse_shift(text):
+    """
+    Parse a signed duration such as "+2h", "-30m", "+1d 6h" or "90 minutes".
+
+    Args:
+        text (str): The duration, optionally starting with + or -.
+
+    Returns:
+        timedelta: The duration, or None if it could not be parsed.
+    """
+    text = ' '.join(text.lower().split())
+    sign = -1 if text.startswith('-') else 1
+    text = text.lstrip('+-').strip()
+
+    total = timedelta()
+    position = 0
+    while position < len(text):
+        match = _SHIFT_PART.match(text, position)
+        if not match:
+            return None
+        unit = match['unit']
+        unit = _UNITS.get(unit, _UNITS.get(unit.rstrip('s'), unit))
+        total += timedelta(**{unit: float(match['amount'])})
+        position = match.end()
+        while position < len(text) and text[position] in ' ,':
+            position += 1
+    return sign * total if position else None
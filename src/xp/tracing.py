@@ -0,0 +1,225 @@
+import contextvars
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Set to "1" to append spans to the default trace file, or to the path of another file
+TRACE_VARIABLE = "XP_TRACE"
+
+# Set by `xp --profile` in the child process it runs: the directory to write the profile to
+PROFILE_VARIABLE = "XP_PROFILE_DIR"
+
+# CO_COROUTINE in a code object's flags; checked directly so inspect and asyncio
+# are not imported just to decorate a function
+_CO_COROUTINE = 0x80
+
+_fd = None
+_command = None
+_ids = itertools.count(1)
+_parent = contextvars.ContextVar('xp_span_parent', default=None)
+
+def enable_tracing(path, command=None):
+    """
+    Start appending finished spans to a JSON lines file.
+
+    Each span is written with a single append as soon as it ends, so a long
+    `xp run` never buffers them, and several processes can share one file.
+
+    Args:
+        path (str): The trace file.
+        command (str, optional): The xp command, recorded on every span.
+    """
+    global _fd, _command
+    if _fd is not None:
+        return
+    _fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    _command = command
+
+def _write(name, span_id, parent, start, end, attributes):
+    """Append one span record to the trace file."""
+    record = {
+        'name': name,
+        'ts': round(start, 6),
+        'ms': round((end - start) * 1000, 3),
+        'pid': os.getpid(),
+        'id': span_id,
+        'parent': parent,
+    }
+    if _command:
+        record['command'] = _command
+    record.update(attributes)
+    os.write(_fd, (json.dumps(record, default=str) + "\n").encode())
+
+def record_span(name, start, end=None, **attributes):
+    """
+    Write a span for something timed without a `with` block, e.g. module imports.
+
+    Args:
+        name (str): What was timed, e.g. "import".
+        start (float): When it started, from time.time().
+        end (float, optional): When it ended. Defaults to now.
+        **attributes: Extra JSON-serializable fields.
+    """
+    if _fd is not None:
+        _write(name, next(_ids), _parent.get(), start, time.time() if end is None else end, attributes)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a `with` block as a span. Spans opened inside it, including in tasks
+    and worker threads it starts, record it as their parent.
+
+    When tracing is off this costs one check.
+    """
+    if _fd is None:
+        yield
+        return
+
+    span_id = next(_ids)
+    token = _parent.set(span_id)
+    start = time.time()
+    try:
+        yield
+    except BaseException as e:
+        attributes['error'] = type(e).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        _write(name, span_id, _parent.get(), start, time.time(), attributes)
+
+def traced(name):
+    """
+    Decorator that records every call of a function, or coroutine function, as a span.
+
+    Args:
+        name (str): The span name.
+    """
+    def decorate(func):
+        if func.__code__.co_flags & _CO_COROUTINE:
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _fd is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _fd is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def profile_requested(argv):
+    """Return True if `--profile` is among the options before the command name."""
+    for arg in argv[1:]:
+        if not arg.startswith('-'):
+            return False
+        if arg == '--profile':
+            return True
+    return False
+
+def _import_breakdown(lines):
+    """
+    Turn `-X importtime` output into rows of (self µs, cumulative µs, module),
+    slowest cumulative first. Nested imports keep their indentation.
+    """
+    rows = []
+    for line in lines:
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split('|', 2)
+            rows.append((int(self_us), int(cumulative_us), module.rstrip()[1:]))
+        except ValueError:
+            # The header line
+            continue
+    return sorted(rows, key=lambda row: -row[1])
+
+def run_profiled(argv, directory):
+    """
+    Run one xp invocation again in a child process that records its imports,
+    a cProfile profile and its spans, then print a summary.
+
+    The child gets `-X importtime` through PYTHONPROFILEIMPORTTIME; its stderr is
+    passed through, minus the import timings, which go to imports.txt. A frozen
+    build ignores the variable, so its profile has no import breakdown.
+
+    Args:
+        argv (list[str]): This process's sys.argv.
+        directory (str): Where to write imports.txt, profile.pstats, profile.txt and trace.jsonl.
+
+    Returns:
+        int: The child's exit code.
+    """
+    import shlex
+    import subprocess
+    import sys
+
+    os.makedirs(directory, exist_ok=True)
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1", **{PROFILE_VARIABLE: directory})
+    command = [sys.executable] + (argv[1:] if getattr(sys, 'frozen', False) else argv)
+
+    start = time.perf_counter()
+    child = subprocess.Popen(command, env=env, stderr=subprocess.PIPE, text=True)
+    import_lines = []
+    for line in child.stderr:
+        if line.startswith("import time:"):
+            import_lines.append(line)
+        else:
+            sys.stderr.write(line)
+    code = child.wait()
+    wall = time.perf_counter() - start
+
+    rows = _import_breakdown(import_lines)
+    with open(os.path.join(directory, "imports.txt"), "w") as f:
+        f.write(f"{'self ms':>9} {'total ms':>9}  module\n")
+        for self_us, cumulative_us, module in rows:
+            f.write(f"{self_us / 1000:9.2f} {cumulative_us / 1000:9.2f}  {module}\n")
+
+    top_level = [row for row in rows if not row[2].startswith(' ')]
+    shown = [arg for arg in argv[1:] if arg != '--profile']
+    print(f"\nProfile of xp {shlex.join(shown)} ({wall * 1000:.0f} ms wall):", file=sys.stderr)
+    if top_level:
+        print(f"  imports: {sum(row[1] for row in top_level) / 1000:.1f} ms", file=sys.stderr)
+    else:
+        # A frozen build ignores PYTHONPROFILEIMPORTTIME
+        print("  imports: not recorded by this build", file=sys.stderr)
+    for self_us, cumulative_us, module in top_level[:5]:
+        print(f"    {cumulative_us / 1000:7.1f} ms  {module}", file=sys.stderr)
+
+    trace_path = os.path.join(directory, "trace.jsonl")
+    if os.path.exists(trace_path):
+        totals = {}
+        with open(trace_path) as f:
+            for line in f:
+                record = json.loads(line)
+                totals[record['name']] = totals.get(record['name'], 0) + record['ms']
+        print("  spans:", file=sys.stderr)
+        for name, ms in sorted(totals.items(), key=lambda item: -item[1])[:8]:
+            print(f"    {ms:7.1f} ms  {name}", file=sys.stderr)
+    print(f"  written to {directory}", file=sys.stderr)
+    return code
+
+@contextmanager
+def profiled(directory):
+    """
+    Run a `with` block under cProfile and write profile.pstats plus a text summary
+    of the 40 most expensive functions by cumulative time to `directory`.
+    """
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(os.path.join(directory, "profile.pstats"))
+        with open(os.path.join(directory, "profile.txt"), "w") as f:
+            pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(40)
@@ -0,0 +1,29 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_home = None
+
+def pytest_configure(config):
+    # setup.py resolves ~/.tweet when it is imported, so point HOME at a scratch
+    # directory before any test module imports xp
+    global _home
+    _home = tempfile.mkdtemp(prefix="xp-tests-")
+    os.environ["HOME"] = _home
+
+def pytest_unconfigure(config):
+    if _home:
+        shutil.rmtree(_home, ignore_errors=True)
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """An empty, migrated database that this test's db calls use."""
+    import db
+
+    db.close_connection()
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "scheduled_tweets.db"))
+    db.init_db()
+    yield db.get_connection()
+    db.close_connection()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+import tweepy
+
+from api import FAILURE_BACKOFF, RATE_LIMIT_MARGIN, post_thread_async, rate_limit_reset
+from ratelimit import RateGovernor
+
+ENDPOINT = "default POST /2/tweets"
+
+class FakeClient:
+    """Posts the first `allowed` tweets, then answers 429 with the given headers."""
+
+    def __init__(self, allowed, headers):
+        self.allowed = allowed
+        self.headers = headers
+        self.posted = []
+
+    async def create_tweet(self, text, in_reply_to_tweet_id=None, media_ids=None):
+        if len(self.posted) == self.allowed:
+            response = SimpleNamespace(status=429, reason="Too Many Requests", headers=self.headers)
+            raise tweepy.TooManyRequests(response, response_json={})
+        self.posted.append((text, in_reply_to_tweet_id))
+        return SimpleNamespace(data={'id': str(len(self.posted))})
+
+def headers(limit, remaining, reset_at):
+    return {
+        'x-rate-limit-limit': str(limit),
+        'x-rate-limit-remaining': str(remaining),
+        'x-rate-limit-reset': str(int(reset_at)),
+    }
+
+def test_429_with_a_past_reset_defers_instead_of_failing(database):
+    governor = RateGovernor()
+    # The window the 429 reports has already ended by our clock
+    stale = headers(3, 0, time.time() - 5)
+    client = FakeClient(allowed=1, headers=stale)
+    posted = []
+
+    async def post():
+        # As the TraceConfig does when each response arrives
+        governor.update(ENDPOINT, headers(3, 1, time.time() + 60))
+        result = await post_thread_async(
+            client, ["one", "two"], governor, on_posted=lambda i, tweet_id: posted.append(i),
+            endpoint=ENDPOINT
+        )
+        return result
+
+    start = time.time()
+    success, retry_at = asyncio.run(post())
+
+    assert not success
+    assert posted == [0]
+    assert retry_at >= start + RATE_LIMIT_MARGIN
+    # Even with the stale headers recorded, the bucket stays closed until then
+    governor.update(ENDPOINT, stale)
+    assert governor.delay(ENDPOINT) > 0
+    assert governor.delay(ENDPOINT, now=retry_at) == 0
+
+def test_429_defers_until_the_reported_reset(database):
+    governor = RateGovernor()
+    reset_at = time.time() + 120
+    success, retry_at = asyncio.run(
+        post_thread_async(FakeClient(0, headers(3, 0, reset_at)), ["one"], governor, endpoint=ENDPOINT)
+    )
+    assert not success
+    assert retry_at == int(reset_at)
+    assert governor.delay(ENDPOINT) > 100
+
+@pytest.mark.parametrize("response_headers, low, high", [
+    ({}, FAILURE_BACKOFF - 1, FAILURE_BACKOFF + 1),
+    ({'x-rate-limit-reset': 'soon'}, FAILURE_BACKOFF - 1, FAILURE_BACKOFF + 1),
+    ({'x-rate-limit-reset': '0'}, RATE_LIMIT_MARGIN - 1, RATE_LIMIT_MARGIN + 1),
+])
+def test_rate_limit_reset_fallbacks(response_headers, low, high):
+    assert low <= rate_limit_reset(response_headers) - time.time() <= high
+
+def test_other_errors_fail_without_a_retry_time():
+    class BrokenClient:
+        async def create_tweet(self, **kwargs):
+            raise RuntimeError("boom")
+
+    assert asyncio.run(post_thread_async(BrokenClient(), ["one"])) == (False, None)
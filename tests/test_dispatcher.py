@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+import time
+
+from db import Status, get_connection, reschedule_tweets
+from dispatcher import Dispatcher
+
+def in_other_connection(func, *args):
+    """Run `func` on another thread, which commits through its own connection."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def schedule(due, text="hello"):
+    """Insert a pending thread due at `due` and return its ID."""
+    conn = get_connection()
+    with conn:
+        return conn.execute("""
+            INSERT INTO scheduled_tweets (post, scheduled_time, created_at)
+            VALUES (?, ?, ?)
+        """, (json.dumps([text]), due, int(time.time()))).lastrowid
+
+def set_status(row_id, status):
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE scheduled_tweets SET status = ? WHERE id = ?", (status, row_id))
+
+class CountingDispatcher(Dispatcher):
+    """A Dispatcher that counts its full reloads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        super().reload()
+
+async def no_job():
+    return None
+
+def test_a_row_scheduled_after_start_is_picked_up_without_a_full_reload(database):
+    first = schedule(2_000_000_000)
+    dispatcher = CountingDispatcher(no_job)
+    assert dispatcher.changed()
+    dispatcher.refresh()
+    assert dispatcher.reloads == 1
+    assert not dispatcher.changed()
+
+    second = in_other_connection(schedule, 1_900_000_000)
+    assert dispatcher.changed()
+    dispatcher.refresh()
+
+    assert dispatcher.reloads == 1
+    assert dispatcher.last_id == second
+    assert dispatcher.heap[0] == (1_900_000_000, second)
+    assert sorted(row_id for _, row_id in dispatcher.heap) == [first, second]
+    assert dispatcher.next_due() == 1_900_000_000
+
+def test_rows_that_are_not_pending_are_not_queued(database):
+    dispatcher = CountingDispatcher(no_job)
+    dispatcher.changed()
+    dispatcher.refresh()
+
+    def schedule_cancelled():
+        row_id = schedule(1_900_000_000)
+        set_status(row_id, Status.CANCELLED)
+        return row_id
+
+    row_id = in_other_connection(schedule_cancelled)
+    assert dispatcher.changed()
+    dispatcher.refresh()
+
+    assert dispatcher.heap == []
+    assert dispatcher.last_id == row_id
+
+def test_a_reschedule_reloads_the_queue(database):
+    row_id = schedule(2_000_000_000)
+    dispatcher = CountingDispatcher(no_job)
+    dispatcher.changed()
+    dispatcher.refresh()
+
+    assert in_other_connection(lambda: reschedule_tweets(shift=-3600, ids=[(row_id, row_id)])) == 1
+    assert dispatcher.changed()
+    dispatcher.refresh()
+
+    assert dispatcher.reloads == 2
+    assert dispatcher.heap == [(2_000_000_000 - 3600, row_id)]
+
+def test_a_deferred_row_is_requeued_at_its_retry_time(database):
+    now = time.time()
+    deferred = schedule(int(now) - 10, "deferred")
+    posted = schedule(int(now) - 10, "posted")
+    retry_at = now + 900
+
+    async def job():
+        set_status(posted, Status.POSTED)
+        return {deferred: retry_at}
+
+    dispatcher = CountingDispatcher(job)
+    dispatcher.changed()
+    dispatcher.refresh()
+    asyncio.run(dispatcher.dispatch(now))
+
+    assert dispatcher.reloads == 1
+    assert dispatcher.heap == [(retry_at, deferred)]
+    assert dispatcher.deferred == {deferred: retry_at}
+    assert dispatcher.next_due() == retry_at
+
+def test_a_row_still_pending_after_a_dispatch_waits_retry_delay(database):
+    now = time.time()
+    row_id = schedule(int(now) - 10)
+
+    dispatcher = Dispatcher(no_job, retry_delay=60)
+    dispatcher.changed()
+    dispatcher.refresh()
+    asyncio.run(dispatcher.dispatch(now))
+
+    (due, queued), = dispatcher.heap
+    assert queued == row_id
+    assert now + 60 <= due <= time.time() + 60
+    assert dispatcher.pop_due(now + 1) == []
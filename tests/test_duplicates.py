@@ -0,0 +1,18 @@
+import time
+
+from db import add_posted, check_duplicate, get_posted_segments, record_segment
+
+def test_posted_thread_is_a_duplicate(database, capsys):
+    row_id = add_posted(["Hello  there", "second"], "default")
+    record_segment(row_id, 0, "1")
+    record_segment(row_id, 1, "2")
+    assert get_posted_segments(row_id) == ["1", "2"]
+
+    now = int(time.time())
+    assert check_duplicate(["Hello there"], "default", now)
+    assert f"thread {row_id}" in capsys.readouterr().out
+
+    # Other accounts, later windows and --allow-duplicate are not refused
+    assert not check_duplicate(["Hello there"], "other", now)
+    assert not check_duplicate(["Hello there"], "default", now + 25 * 3600)
+    assert not check_duplicate(["Hello there"], "default", now, allow=True)
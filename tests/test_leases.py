@@ -0,0 +1,86 @@
+import json
+import time
+
+from db import Status, claim_due_tweet, release_tweet, renew_leases
+
+LEASE = 120
+
+def schedule(conn, text, delay=-10, account="default"):
+    """Insert a pending thread due `delay` seconds from now and return its ID."""
+    with conn:
+        return conn.execute("""
+            INSERT INTO scheduled_tweets (post, scheduled_time, created_at, account)
+            VALUES (?, ?, ?, ?)
+        """, (json.dumps([text]), int(time.time()) + delay, int(time.time()), account)).lastrowid
+
+def lease(conn, row_id):
+    return conn.execute("""
+        SELECT status, claimed_by, lease_until FROM scheduled_tweets WHERE id = ?
+    """, (row_id,)).fetchone()
+
+def test_claims_the_earliest_due_row_of_the_account(database):
+    later = schedule(database, "later", delay=-5)
+    earlier = schedule(database, "earlier", delay=-50)
+    schedule(database, "future", delay=3600)
+    schedule(database, "other account", delay=-100, account="brand")
+
+    assert claim_due_tweet("a", LEASE)[0] == earlier
+    assert claim_due_tweet("a", LEASE)[0] == later
+    assert claim_due_tweet("a", LEASE) is None
+    assert claim_due_tweet("a", LEASE, account="brand")[2] == "brand"
+
+def test_a_held_lease_is_not_claimed_twice(database):
+    row_id = schedule(database, "once")
+    assert claim_due_tweet("a", LEASE)[0] == row_id
+    assert claim_due_tweet("b", LEASE) is None
+
+    status, claimed_by, lease_until = lease(database, row_id)
+    assert claimed_by == "a"
+    assert lease_until >= time.time() + LEASE - 2
+
+def test_an_expired_lease_can_be_claimed_again(database):
+    row_id = schedule(database, "crashed worker")
+    # A lease of 0 seconds has run out as soon as it is taken, like that of a worker that died
+    assert claim_due_tweet("a", 0)[0] == row_id
+    assert claim_due_tweet("b", LEASE)[0] == row_id
+    assert lease(database, row_id)[1] == "b"
+
+def test_renewing_keeps_only_the_owners_leases(database):
+    row_id = schedule(database, "long thread")
+    claim_due_tweet("a", 0)
+    renew_leases("b", [row_id], LEASE)
+    assert lease(database, row_id)[2] <= time.time()
+
+    renew_leases("a", [row_id], LEASE)
+    assert lease(database, row_id)[2] >= time.time() + LEASE - 2
+    assert claim_due_tweet("b", LEASE) is None
+
+def test_release_makes_the_row_claimable_again(database):
+    row_id = schedule(database, "released")
+    claim_due_tweet("a", LEASE)
+    release_tweet(row_id)
+
+    assert lease(database, row_id) == (Status.PENDING, None, None)
+    assert claim_due_tweet("b", LEASE)[0] == row_id
+
+def test_release_with_not_before_holds_the_row_until_then(database):
+    row_id = schedule(database, "deferred")
+    claim_due_tweet("a", LEASE)
+    retry_at = time.time() + 60
+    release_tweet(row_id, not_before=retry_at)
+
+    assert lease(database, row_id) == (Status.PENDING, None, int(retry_at))
+    assert claim_due_tweet("b", LEASE) is None
+
+    # Once that time has passed the row is due again
+    with database:
+        database.execute("UPDATE scheduled_tweets SET lease_until = ? WHERE id = ?", (int(time.time()) - 1, row_id))
+    assert claim_due_tweet("b", LEASE)[0] == row_id
+
+def test_release_with_a_status_finishes_the_row(database):
+    row_id = schedule(database, "posted")
+    claim_due_tweet("a", LEASE)
+    release_tweet(row_id, Status.POSTED)
+
+    assert lease(database, row_id) == (Status.POSTED, None, None)
+    assert claim_due_tweet("b", LEASE) is None
@@ -0,0 +1,47 @@
+import pytest
+
+from db import MAX_MEDIA, add_tweet
+
+WHEN = "2031-01-06 09:00"
+
+@pytest.fixture
+def files(tmp_path):
+    def make(*names):
+        paths = []
+        for name in names:
+            path = tmp_path / name
+            path.write_bytes(b"\0")
+            paths.append(str(path))
+        return paths
+    return make
+
+def scheduled(database):
+    return database.execute("SELECT COUNT(*) FROM scheduled_tweets").fetchone()[0]
+
+@pytest.mark.parametrize("names", [
+    ["a.png"],
+    ["a.jpg", "b.jpeg", "c.webp", "d.png"],
+    ["clip.mp4"],
+    ["clip.mov"],
+    ["loop.gif"],
+])
+def test_accepted_media(database, files, names):
+    assert add_tweet(["Hello"], WHEN, media=files(*names))
+    assert scheduled(database) == 1
+
+@pytest.mark.parametrize("names, error", [
+    (["a.png", "clip.mp4"], "must be the only media file"),
+    (["clip.mp4", "other.mov"], "must be the only media file"),
+    (["a.png", "loop.gif"], "must be the only media file"),
+    ([f"{i}.png" for i in range(MAX_MEDIA + 1)], f"At most {MAX_MEDIA} images"),
+    (["notes.txt"], "Not an image, GIF or video"),
+    (["no_extension"], "Not an image, GIF or video"),
+])
+def test_rejected_media(database, files, capsys, names, error):
+    assert not add_tweet(["Hello"], WHEN, media=files(*names))
+    assert error in capsys.readouterr().out
+    assert scheduled(database) == 0
+
+def test_missing_media_file(database, tmp_path, capsys):
+    assert not add_tweet(["Hello"], WHEN, media=[str(tmp_path / "gone.png")])
+    assert "Media file not found" in capsys.readouterr().out
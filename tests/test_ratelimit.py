@@ -0,0 +1,44 @@
+import time
+
+from ratelimit import BURST, PROBE_POLL, PROBE_TIMEOUT, RateGovernor
+
+ENDPOINT = "default POST /2/tweets"
+
+def headers(limit, remaining, reset_in=900):
+    return {
+        'x-rate-limit-limit': str(limit),
+        'x-rate-limit-remaining': str(remaining),
+        'x-rate-limit-reset': str(int(time.time() + reset_in)),
+    }
+
+def test_cold_start_sends_one_request_until_headers_arrive(database):
+    governor = RateGovernor()
+    assert governor.delay(ENDPOINT) == 0
+    governor.acquire(ENDPOINT)
+
+    # The rest of the burst waits for the first response
+    assert governor.delay(ENDPOINT) == PROBE_POLL
+
+    governor.update(ENDPOINT, headers(100, 99))
+    for _ in range(BURST - 1):
+        assert governor.delay(ENDPOINT) == 0
+        governor.acquire(ENDPOINT)
+    assert governor.delay(ENDPOINT) > 0
+
+def test_response_without_headers_lets_the_next_request_probe(database):
+    governor = RateGovernor()
+    governor.acquire(ENDPOINT)
+    governor.update(ENDPOINT, {})
+    assert governor.delay(ENDPOINT) == 0
+
+def test_lost_probe_stops_blocking_after_a_timeout(database):
+    governor = RateGovernor()
+    governor.acquire(ENDPOINT)
+    assert governor.delay(ENDPOINT, now=time.time() + PROBE_TIMEOUT + 1) == 0
+
+def test_known_limits_survive_a_restart(database):
+    RateGovernor().update(ENDPOINT, headers(100, 0, reset_in=60))
+
+    # A new daemon goes straight to the persisted state: no probe, and it waits for the reset
+    delay = RateGovernor().delay(ENDPOINT)
+    assert 55 < delay <= 60
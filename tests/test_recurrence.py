@@ -0,0 +1,115 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from db import Status, add_series, fire_recurring, next_series_time
+from recurrence import is_rrule, next_occurrence, parse_cron
+
+def ts(*args):
+    """UTC epoch timestamp of a local time."""
+    return int(datetime(*args).timestamp())
+
+# Monday 6 January 2031
+MONDAY = ts(2031, 1, 6, 8, 0)
+
+def test_parse_cron_fields():
+    minutes, hours, days, months, weekdays, either_day = parse_cron("*/15 9-17 * jan,Jul mon-fri")
+    assert minutes == {0, 15, 30, 45}
+    assert hours == set(range(9, 18))
+    assert days == set(range(1, 32))
+    assert months == {1, 7}
+    assert weekdays == {1, 2, 3, 4, 5}
+    assert not either_day
+
+def test_parse_cron_macros_and_sunday():
+    assert parse_cron("@daily") == parse_cron("0 0 * * *")
+    assert parse_cron("0 0 * * 7")[4] == {0}
+    assert parse_cron("0 0 1 * 1")[5]
+
+@pytest.mark.parametrize("rule", [
+    "* * * *",
+    "60 * * * *",
+    "* 24 * * *",
+    "* * 0 * *",
+    "* * * foo *",
+    "5-1 * * * *",
+    "*/0 * * * *",
+])
+def test_parse_cron_rejects_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        parse_cron(rule)
+
+@pytest.mark.parametrize("rule, after, expected", [
+    ("0 9 * * *", MONDAY, ts(2031, 1, 6, 9, 0)),
+    ("0 9 * * *", ts(2031, 1, 6, 9, 0), ts(2031, 1, 7, 9, 0)),
+    ("30 8 * * 1-5", ts(2031, 1, 10, 9, 0), ts(2031, 1, 13, 8, 30)),
+    ("0 12 29 2 *", MONDAY, ts(2032, 2, 29, 12, 0)),
+    ("0 0 13 * 5", MONDAY, ts(2031, 1, 10, 0, 0)),
+    ("@monthly", MONDAY, ts(2031, 2, 1, 0, 0)),
+])
+def test_next_cron_occurrence(rule, after, expected):
+    assert next_occurrence(rule, MONDAY, after) == expected
+
+def test_cron_that_never_matches_has_no_occurrence():
+    assert next_occurrence("0 0 31 2 *", MONDAY, MONDAY) is None
+
+def test_occurrences_never_precede_the_start():
+    assert next_occurrence("0 9 * * *", ts(2031, 1, 8, 0, 0), MONDAY) == ts(2031, 1, 8, 9, 0)
+
+def test_rrule_repeats_from_the_start():
+    rule = "FREQ=WEEKLY;BYDAY=MO,TH"
+    assert is_rrule(rule) and is_rrule("RRULE:" + rule) and not is_rrule("0 9 * * *")
+    assert next_occurrence(rule, MONDAY, MONDAY) == ts(2031, 1, 9, 8, 0)
+    assert next_occurrence(rule, MONDAY, ts(2031, 1, 9, 8, 0)) == ts(2031, 1, 13, 8, 0)
+
+def test_rrule_count_and_until_end_the_series():
+    occurrences = []
+    after = MONDAY - 1
+    while (after := next_occurrence("FREQ=DAILY;COUNT=3", MONDAY, after)) is not None:
+        occurrences.append(after)
+    assert occurrences == [MONDAY, ts(2031, 1, 7, 8, 0), ts(2031, 1, 8, 8, 0)]
+
+    rule = "FREQ=DAILY;UNTIL=20310107T235959"
+    assert next_occurrence(rule, MONDAY, ts(2031, 1, 7, 8, 0)) is None
+
+def test_invalid_rrule():
+    with pytest.raises(ValueError):
+        next_occurrence("FREQ=SOMETIMES", MONDAY, MONDAY)
+
+def scheduled(conn):
+    return conn.execute("""
+        SELECT post, scheduled_time, series_id FROM scheduled_tweets ORDER BY id
+    """).fetchall()
+
+def test_fire_recurring_catches_up_once_after_downtime(database):
+    assert add_series(["Good morning"], "0 9 * * *", "2031-01-06 08:00")
+    assert next_series_time() == ts(2031, 1, 6, 9, 0)
+
+    # Nothing is due before the first occurrence
+    assert fire_recurring(ts(2031, 1, 6, 8, 59)) == 0
+
+    # Down for three days: the earliest missed occurrence is posted once, the
+    # others are skipped, and the series moves on to the next one after now
+    now = ts(2031, 1, 9, 12, 0)
+    assert fire_recurring(now) == 1
+    assert scheduled(database) == [(json.dumps(["Good morning"]), ts(2031, 1, 6, 9, 0), 1)]
+    assert next_series_time() == ts(2031, 1, 10, 9, 0)
+    assert fire_recurring(now) == 0
+
+def test_fire_recurring_ends_an_exhausted_series(database):
+    assert add_series(["Twice"], "FREQ=DAILY;COUNT=2", "2031-01-06 08:00")
+    assert fire_recurring(MONDAY) == 1
+    assert fire_recurring(ts(2031, 1, 7, 8, 0)) == 1
+    assert fire_recurring(ts(2031, 1, 20, 8, 0)) == 0
+
+    assert len(scheduled(database)) == 2
+    assert next_series_time() is None
+    status, = database.execute("SELECT status FROM recurring_tweets").fetchone()
+    assert status == Status.POSTED
+
+def test_add_series_rejects_bad_rules(database, capsys):
+    assert not add_series(["x"], "not a rule", "2031-01-06 08:00")
+    assert not add_series(["x"], "FREQ=DAILY;UNTIL=20300101T000000", "2031-01-06 08:00")
+    assert "no occurrences" in capsys.readouterr().out
+    assert next_series_time() is None
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from api import post_pending_tweets
+from db import Status, get_posted_segments, record_segment
+
+class FakeClient:
+    """Records each tweet with the ID it replies to."""
+
+    def __init__(self):
+        self.posted = []
+
+    async def create_tweet(self, text, in_reply_to_tweet_id=None, media_ids=None):
+        self.posted.append((text, in_reply_to_tweet_id))
+        return SimpleNamespace(data={'id': f"new{len(self.posted)}"})
+
+class FakePool:
+    def __init__(self):
+        self.client = FakeClient()
+
+    def get(self, account):
+        return self.client
+
+def schedule(conn, tweets):
+    with conn:
+        return conn.execute("""
+            INSERT INTO scheduled_tweets (post, scheduled_time, created_at, account)
+            VALUES (?, ?, ?, 'default')
+        """, (json.dumps(tweets), int(time.time()) - 10, int(time.time()))).lastrowid
+
+def test_posted_segments_stop_at_the_first_gap(database):
+    row_id = schedule(database, ["a", "b", "c", "d"])
+    assert get_posted_segments(row_id) == []
+
+    record_segment(row_id, 0, 100)
+    record_segment(row_id, 1, 101)
+    record_segment(row_id, 3, 103)
+    assert get_posted_segments(row_id) == ["100", "101"]
+
+    # Other threads' segments are not mixed in
+    other = schedule(database, ["x"])
+    record_segment(other, 0, 900)
+    assert get_posted_segments(row_id) == ["100", "101"]
+
+def test_interrupted_thread_resumes_at_the_first_missing_tweet(database):
+    row_id = schedule(database, ["one", "two", "three", "four"])
+    record_segment(row_id, 0, "100")
+    record_segment(row_id, 1, "101")
+
+    pool = FakePool()
+    asyncio.run(post_pending_tweets(pool, concurrency=1))
+
+    assert pool.client.posted == [("three", "101"), ("four", "new1")]
+    assert get_posted_segments(row_id) == ["100", "101", "new1", "new2"]
+    status, = database.execute("SELECT status FROM scheduled_tweets WHERE id = ?", (row_id,)).fetchone()
+    assert status == Status.POSTED
+
+def test_a_gap_is_filled_and_replies_to_the_tweet_before_it(database):
+    row_id = schedule(database, ["one", "two", "three"])
+    record_segment(row_id, 0, "100")
+    record_segment(row_id, 2, "stale")
+
+    pool = FakePool()
+    asyncio.run(post_pending_tweets(pool, concurrency=1))
+
+    assert pool.client.posted == [("two", "100"), ("three", "new1")]
+    assert get_posted_segments(row_id) == ["100", "new1", "new2"]
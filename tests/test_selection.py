@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+
+MAIN = Path(__file__).resolve().parents[1] / "src" / "xp" / "main.py"
+
+def xp(*args):
+    # Arguments and not stdin hold the command, so give it an empty stdin
+    return subprocess.run(
+        [sys.executable, str(MAIN), *args], input="", capture_output=True, text=True
+    )
+
+def test_selection_without_matches_is_not_an_error():
+    for args in (("cancel", "999999"), ("reschedule", "999999", "--shift", "+1h")):
+        result = xp(*args)
+        assert result.returncode == 0, result.stdout
+        assert "No matching tweets." in result.stdout
+
+    result = xp("cancel", "999999", "--recurring")
+    assert result.returncode == 0, result.stdout
+    assert "No matching recurring series." in result.stdout
+
+def test_invalid_filter_is_an_error():
+    result = xp("cancel", "--since", "not a time at all")
+    assert result.returncode == 1
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from bench_startup import HEAVY_MODULES
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "xp" / "main.py"
+
+# Runs xp in a fresh interpreter, then prints which heavy modules it loaded
+SCRIPT = """
+import runpy, sys
+sys.argv = [{main!r}] + {args!r}
+sys.path.insert(0, {source!r})
+try:
+    runpy.run_path({main!r}, run_name="__main__")
+except SystemExit:
+    pass
+print(" ".join(name for name in {heavy!r} if name in sys.modules), file=sys.stderr)
+"""
+
+def loaded_heavy_modules(args, home, stdin=""):
+    script = SCRIPT.format(main=str(MAIN), args=args, source=str(MAIN.parent), heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env={"HOME": str(home), "PATH": ""},
+        input=stdin,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stderr.strip().splitlines()[-1].split() if result.stderr.strip() else []
+
+@pytest.mark.parametrize("args", [["list"], ["list", "--format", "ndjson"], ["list", "--recurring"]])
+def test_local_commands_skip_network_and_date_parsing(args, tmp_path):
+    assert loaded_heavy_modules(args, tmp_path) == []
+
+def test_check_sees_lazily_imported_modules(tmp_path):
+    # Guards the test above against passing because nothing is ever recorded:
+    # a time only dateparser understands has to load it
+    args = ["schedule", "--time", "a fortnight from now"]
+    assert "dateparser" in loaded_heavy_modules(args, tmp_path, stdin="Hello\n")
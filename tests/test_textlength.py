@@ -0,0 +1,92 @@
+import pytest
+
+from textlength import MAX_WEIGHTED_LENGTH, URL_LENGTH, split_text, too_long, weighted_length
+
+@pytest.mark.parametrize("text, expected", [
+    ("", 0),
+    ("hello", 5),
+    ("café", 4),
+    ("café", 4),
+    ("こんにちは", 10),
+    ("漢字 and ascii", 14),
+    ("👍", 2),
+    ("👍🏽", 2),
+    ("👨‍👩‍👧‍👦", 2),
+    ("🇳🇱", 2),
+    ("1️⃣", 2),
+    ("“quoted” — dash", 15),
+    ("#1 and 1️⃣", 9),
+])
+def test_character_weights(text, expected):
+    assert weighted_length(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("https://example.com", URL_LENGTH),
+    ("https://example.com/" + "a" * 100, URL_LENGTH),
+    ("http://t.co/abc", URL_LENGTH),
+    ("www.example.org/path", URL_LENGTH),
+    ("example.com", URL_LENGTH),
+    ("see https://example.com.", 4 + URL_LENGTH + 1),
+    ("(https://example.com/x)", 1 + URL_LENGTH + 1),
+    ("a https://x.io b https://y.io", 2 + URL_LENGTH + 3 + URL_LENGTH),
+    ("e.g. not a url", 14),
+])
+def test_urls_count_as_tco_links(text, expected):
+    assert weighted_length(text) == expected
+
+def test_too_long_reports_tweets_over_the_limit():
+    tweets = ["a" * 280, "a" * 281, "漢" * 140, "漢" * 141]
+    assert too_long(tweets) == [(2, 281), (4, 282)]
+
+def test_short_text_is_one_tweet():
+    assert list(split_text("  Just one tweet.  ")) == ["Just one tweet."]
+    assert list(split_text("")) == []
+
+def test_exactly_the_limit_is_not_split():
+    text = "a" * MAX_WEIGHTED_LENGTH
+    assert list(split_text(text)) == [text]
+
+    words = "abcd " * 55
+    assert weighted_length(words + "abcde") == MAX_WEIGHTED_LENGTH
+    assert list(split_text(words + "abcde")) == [words + "abcde"]
+    assert list(split_text(words + "abcdef")) == [words.strip(), "abcdef"]
+
+def test_splits_at_a_sentence_end_in_the_second_half():
+    first = "First sentence goes here. " * 8
+    text = first + "And then a sentence that does not fit in the rest of the tweet at all " * 3
+    tweets = list(split_text(text))
+    assert tweets[0] == first.strip()
+    assert all(weighted_length(tweet) <= MAX_WEIGHTED_LENGTH for tweet in tweets)
+
+def test_urls_are_never_broken():
+    url = "https://example.com/" + "x" * 300
+    tweets = list(split_text("word " * 60 + url + " tail"))
+    assert any(url in tweet for tweet in tweets)
+    assert all(weighted_length(tweet) <= MAX_WEIGHTED_LENGTH for tweet in tweets)
+
+def test_overlong_word_is_broken_between_characters():
+    word = "x" * 700
+    assert list(split_text(word)) == ["x" * 280, "x" * 280, "x" * 140]
+
+@pytest.mark.parametrize("text", [
+    "The quick brown fox jumps over the lazy dog. " * 40,
+    "Paragraph one.\n\nParagraph two has more words in it. " * 25,
+    "Emoji 👍🏽 and 👨‍👩‍👧‍👦 mixed with text, " * 30,
+    "Links https://example.com/page and more words " * 20,
+])
+def test_split_round_trips_and_fits(text):
+    tweets = list(split_text(text))
+    assert len(tweets) > 1
+    assert all(0 < weighted_length(tweet) <= MAX_WEIGHTED_LENGTH for tweet in tweets)
+    # Only whitespace at the breaks is lost
+    assert " ".join(tweets).split() == text.split()
+
+def test_text_without_spaces_splits_between_characters():
+    text = "日本語の文章です。" * 60
+    tweets = list(split_text(text))
+    assert [weighted_length(tweet) for tweet in tweets] == [280, 280, 280, 240]
+    assert "".join(tweets) == text
+
+def test_split_with_a_smaller_limit():
+    tweets = list(split_text("one two three four five six", limit=10))
+    assert tweets == ["one two", "three four", "five six"]
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from timeparse import _parse_with_dateparser, parse_time
+
+NOW = datetime(2030, 3, 14, 9, 26, 53)
+
+@pytest.mark.parametrize("text, expected", [
+    ("2030-12-25", datetime(2030, 12, 25)),
+    ("2030-12-25 15:30", datetime(2030, 12, 25, 15, 30)),
+    ("2030-12-25T15:30:00", datetime(2030, 12, 25, 15, 30)),
+    ("2030-12-25T15:30:00Z", datetime(2030, 12, 25, 15, 30, tzinfo=timezone.utc)),
+    ("2030-12-25 15:30:00+0200", datetime(2030, 12, 25, 15, 30, tzinfo=timezone(timedelta(hours=2)))),
+    ("now", NOW),
+    ("tomorrow", NOW + timedelta(days=1)),
+    ("tomorrow at 3pm", datetime(2030, 3, 15, 15, 0)),
+    ("Tomorrow  at 3:30 PM", datetime(2030, 3, 15, 15, 30)),
+    ("today at noon", datetime(2030, 3, 14, 12, 0)),
+    ("tonight", datetime(2030, 3, 14, 20, 0)),
+    ("10am tomorrow", datetime(2030, 3, 15, 10, 0)),
+    ("tomorrow at midnight", datetime(2030, 3, 15, 0, 0)),
+    ("today at 17:45", datetime(2030, 3, 14, 17, 45)),
+])
+def test_fast_path_formats(text, expected):
+    assert parse_time(text, NOW, fast_only=True) == expected
+
+@pytest.mark.parametrize("text, delta", [
+    ("in 2 hours", timedelta(hours=2)),
+    ("in 1 hour", timedelta(hours=1)),
+    ("in 90 minutes", timedelta(minutes=90)),
+    ("in 30m", timedelta(minutes=30)),
+    ("in 45 secs", timedelta(seconds=45)),
+    ("in 3 days", timedelta(days=3)),
+    ("in 2 wks", timedelta(weeks=2)),
+])
+def test_relative_offsets(text, delta):
+    assert parse_time(text, NOW, fast_only=True) == NOW + delta
+
+def test_relative_offsets_are_resolved_against_each_now():
+    # The cache holds resolvers, not datetimes, so a later "now" moves the result
+    later = NOW + timedelta(hours=5)
+    assert parse_time("in 2 hours", NOW) == NOW + timedelta(hours=2)
+    assert parse_time("in 2 hours", later) == later + timedelta(hours=2)
+
+@pytest.mark.parametrize("text", ["tomorrow at 13pm", "today at 25:00", "2030-02-30"])
+def test_invalid_fast_path_input_is_not_guessed(text):
+    assert parse_time(text, NOW, fast_only=True) is None
+
+def test_empty_input():
+    assert parse_time("", NOW) is None
+    assert parse_time(None, NOW) is None
+
+def test_other_strings_fall_through_to_dateparser():
+    assert parse_time("3 days ago", NOW, fast_only=True) is None
+
+    _parse_with_dateparser.cache_clear()
+    assert parse_time("3 days ago", NOW) == NOW - timedelta(days=3)
+    assert _parse_with_dateparser.cache_info().misses == 1
+
+    # The same text and base is answered from the cache
+    assert parse_time("3 days ago", NOW) == NOW - timedelta(days=3)
+    assert _parse_with_dateparser.cache_info().hits == 1
+
+def test_unparseable_text():
+    assert parse_time("not a time at all", NOW) is None
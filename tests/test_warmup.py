@@ -0,0 +1,44 @@
+import asyncio
+
+from aiohttp import web
+
+import setup
+from api import API_URL_VARIABLE, ClientPool
+from fake_x_api import FakeXAPI
+from ratelimit import RateGovernor
+
+def test_a_post_reuses_the_warmed_up_connection(database, tmp_path, monkeypatch):
+    credentials = tmp_path / "credentials.txt"
+    credentials.write_text("".join(
+        f"{key}=test\n" for key in ("consumer_key", "consumer_secret", "access_token", "access_token_secret")
+    ))
+    monkeypatch.setattr(setup, "CREDENTIALS_FILE", str(credentials))
+
+    async def run():
+        fake = FakeXAPI(latency_ms=0)
+        runner = web.AppRunner(fake.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        api_url = "http://127.0.0.1:%d" % runner.addresses[0][1]
+        monkeypatch.setenv(API_URL_VARIABLE, api_url)
+
+        clients = ClientPool(RateGovernor())
+        try:
+            await clients.warm([setup.DEFAULT_ACCOUNT])
+            assert fake.counts["connections"] == 1
+
+            client = clients.get(setup.DEFAULT_ACCOUNT)
+            response = await client.create_tweet(text="Hello", user_auth=True)
+            assert response.data["id"]
+
+            # Asked over the same session, so a new connection would show up here
+            async with client.session.get(f"{api_url}/_stats") as stats:
+                return await stats.json()
+        finally:
+            await clients.close()
+            await runner.cleanup()
+
+    stats = asyncio.run(run())
+    assert stats["created"] == 1
+    assert stats["connections"] == 1